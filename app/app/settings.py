@@ -24,9 +24,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-drb4o22kbp493an^(*hoqzy6=(xrmp12)zk=*rstn79_srm51c'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Off unless DEBUG=1, docker-compose turns it on for development
+DEBUG = os.environ.get('DEBUG', '0') == '1'
 
-ALLOWED_HOSTS = []
+# Comma separated, required when DEBUG is off
+ALLOWED_HOSTS = [host.strip()
+                 for host in os.environ.get('ALLOWED_HOSTS', '').split(',')
+                 if host.strip()]
 
 
 # Application definition
@@ -38,6 +42,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # trigram lookups of the medication SKU search, inert on other databases
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -47,6 +53,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so the whole middleware stack is measured
+    'core.instrumentation.PerformanceMiddleware',
+    'core.query_analysis.QueryAnalysisMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,16 +89,68 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections are kept open DB_CONN_MAX_AGE seconds and checked before
+# being reused. DB_POOL=1 borrows them from a psycopg pool shared by the
+# threads of a process instead (core.backends.postgresql), use it with
+# the uvicorn workers. Without the pool they close their connections
+# after each request: every sync_to_async call runs in a thread of its
+# own and persistent connections would pile up until the server's limit.
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+SERVER_ASGI = os.environ.get('SERVER_WORKER_CLASS', 'gthread') == 'uvicorn'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOL or SERVER_ASGI else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS',
+                                             '1') == '1',
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# SQLite stand-in for development and benchmarks without Postgres
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+        # benchmark writers wait for the database lock instead of failing
+        'OPTIONS': {'timeout': 20},
+    }
+
+# Read replicas, comma separated hosts sharing the credentials of the
+# primary. Safe requests of the SKU and tag APIs read a random replica,
+# users who wrote in the last REPLICA_STICKY_SECONDS read the primary.
+# REPLICA_STICKY_CACHE must name a cache shared between processes (e.g.
+# `responses` with RESPONSE_CACHE_BACKEND=redis), the system checks refuse
+# a local memory one as the next request usually reaches another worker.
+REPLICA_DATABASES = []
+for index, host in enumerate(
+    host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+    if host.strip()
+):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['core.routers.ReadReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+REPLICA_STICKY_CACHE = os.environ.get('REPLICA_STICKY_CACHE', 'default')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -138,4 +199,93 @@ AUTH_USER_MODEL = 'core.User'
 # Configure the drf to use drf_spectacular.openapi.AutoSchema to generate the schema
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-}
\ No newline at end of file
+}
+
+# Caches, `responses` holds the serialized SKU API responses. The response
+# cache is off by default and can only be enabled with a backend shared
+# between processes (file, redis): writes bump the generation key in the
+# cache, a local memory one is only bumped in the worker handling the
+# write (see core.checks). redis requires the redis package.
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '0') == '1'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': RESPONSE_CACHE_BACKENDS[
+            os.environ.get('RESPONSE_CACHE_BACKEND', 'locmem')
+        ],
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+    },
+}
+
+# In-process LRU caching token -> user resolution of the API
+# authentication. Set TOKEN_AUTH_CACHE_BACKEND to a CACHES alias shared
+# between processes to share resolutions and invalidations, every hit then
+# checks the token's version there. Without it entries only live LOCAL_TTL
+# seconds as invalidations only reach the process handling the change.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 300)),
+    'LOCAL_TTL': int(os.environ.get('TOKEN_AUTH_CACHE_LOCAL_TTL', 5)),
+    'BACKEND': os.environ.get('TOKEN_AUTH_CACHE_BACKEND') or None,
+}
+
+# Share of the requests instrumented by PerformanceMiddleware (0 to 1),
+# their timings are returned in a Server-Timing header and aggregated in
+# the /internal/metrics/ histograms. The endpoint is open to staff users
+# and to scrapers sending `Authorization: Bearer <PERF_METRICS_TOKEN>`.
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', 0))
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN') or None
+# Histograms are kept per worker process. PERF_METRICS_DIR, a directory
+# writable by every worker (a tmpfs), lets the endpoint serve the sum of
+# all of them; without it each series has a `pid` label and every worker
+# must be scraped.
+PERF_METRICS_DIR = os.environ.get('PERF_METRICS_DIR') or None
+
+# Repeated (N+1) and slow query detection of core.query_analysis, meant
+# for staging: offenders are logged. The test runner enables it with RAISE
+# so that tests fail when a request repeats a query shape more than
+# REPEAT_THRESHOLD times.
+QUERY_ANALYSIS = {
+    'ENABLED': os.environ.get('QUERY_ANALYSIS_ENABLED', '0') == '1',
+    'REPEAT_THRESHOLD': int(
+        os.environ.get('QUERY_ANALYSIS_REPEAT_THRESHOLD', 5)
+    ),
+    'SLOW_MS': float(os.environ.get('QUERY_ANALYSIS_SLOW_MS', 100)),
+    'RAISE': False,
+}
+TEST_RUNNER = 'core.test_runner.QueryAnalysisTestRunner'
+
+# Running bulk jobs record a heartbeat after every chunk, jobs without one
+# for BULK_JOB_LEASE_SECONDS are taken back by the other workers, their
+# worker is assumed dead. Keep it well above the time of one chunk.
+BULK_JOB_LEASE_SECONDS = int(os.environ.get('BULK_JOB_LEASE_SECONDS', 300))
+
+# In-process prefix index of the SKU names serving the autocomplete
+# endpoint, rebuilt in the background once older than MAX_AGE seconds to
+# pick up the writes of other processes (0 never rebuilds it). Every
+# worker holds a copy of about 300 MB per million SKUs, it isn't built
+# above MAX_SKUS SKUs (0 for no limit) and lookups query the database.
+AUTOCOMPLETE_INDEX_ENABLED = os.environ.get('AUTOCOMPLETE_INDEX_ENABLED',
+                                            '1') == '1'
+AUTOCOMPLETE_INDEX_MAX_AGE = int(
+    os.environ.get('AUTOCOMPLETE_INDEX_MAX_AGE', 300)
+)
+AUTOCOMPLETE_INDEX_MAX_SKUS = int(
+    os.environ.get('AUTOCOMPLETE_INDEX_MAX_SKUS', 1_000_000)
+)
+
+# Page size of the cursor paginated list endpoints,
+# clients can ask for up to PAGINATION_MAX_PAGE_SIZE items with ?page_size=
+PAGINATION_PAGE_SIZE = int(os.environ.get('PAGINATION_PAGE_SIZE', 100))
+PAGINATION_MAX_PAGE_SIZE = int(
+    os.environ.get('PAGINATION_MAX_PAGE_SIZE', 1000)
+)
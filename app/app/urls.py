@@ -22,6 +22,8 @@ from drf_spectacular.views import (
 from django.contrib import admin
 from django.urls import path, include
 
+from core.instrumentation import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
@@ -32,4 +34,5 @@ urlpatterns = [
     path('api/user/', include('user.urls')),
     path('api/medication_sku/', include('medication_sku.urls',
                                         namespace='medication_sku')),
+    path('internal/metrics/', metrics_view, name='metrics'),
 ]
@@ -50,3 +50,4 @@ class UserAdmin(BaseUserAdmin):
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.MedicationSKU)
 admin.site.register(models.Tag)
+admin.site.register(models.BulkJob)
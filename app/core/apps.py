@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # count the queries of the sampled requests on every connection
+        from core import instrumentation  # noqa: F401
+        from core import checks  # noqa: F401
@@ -0,0 +1,96 @@
+"""
+PostgreSQL backend with an optional psycopg connection pool
+
+Django 4.2 only knows persistent connections (CONN_MAX_AGE), one per
+thread. With OPTIONS['pool'] set connections are instead borrowed from a
+psycopg_pool.ConnectionPool shared by the threads of the process and
+returned to it when Django closes them at the end of a request. The pool
+options (min_size, max_size, timeout, ...) are passed to the pool, `True`
+uses its defaults. Without OPTIONS['pool'] this is the stock backend.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # one pool per alias and database, the test runner switches NAME
+    _connection_pools = {}
+
+    @property
+    def pool(self):
+        """Return the pool of this connection, None when not pooling"""
+        pool_options = self.settings_dict['OPTIONS'].get('pool')
+        if self.alias == NO_DB_ALIAS or not pool_options:
+            return None
+
+        key = (self.alias, self.settings_dict['NAME'])
+        if key not in self._connection_pools:
+            if self.settings_dict['CONN_MAX_AGE'] != 0:
+                raise ImproperlyConfigured(
+                    'Pooled connections are returned to the pool after '
+                    'each request, set CONN_MAX_AGE to 0.'
+                )
+            if pool_options is True:
+                pool_options = {}
+
+            from psycopg_pool import ConnectionPool
+
+            connect_kwargs = self.get_connection_params()
+            # Django sets autocommit itself once the connection is borrowed
+            connect_kwargs['autocommit'] = True
+            check = None
+            if self.settings_dict['CONN_HEALTH_CHECKS']:
+                check = ConnectionPool.check_connection
+            pool = ConnectionPool(
+                kwargs=connect_kwargs,
+                open=False,
+                check=check,
+                name=self.alias,
+                **pool_options,
+            )
+            # threads racing here build several pools, none of them is
+            # open yet and only the first one stored is ever used
+            self._connection_pools.setdefault(key, pool)
+
+        return self._connection_pools[key]
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+
+        return conn_params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        try:
+            self.isolation_level = base.IsolationLevel(
+                isolation_level or base.IsolationLevel.READ_COMMITTED
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f'Invalid transaction isolation level {isolation_level} '
+                f'specified. Use one of the psycopg.IsolationLevel values.'
+            )
+
+        # opening an open pool does nothing
+        pool.open()
+        connection = pool.getconn()
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if self.connection is None or pool is None:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
@@ -0,0 +1,64 @@
+"""
+System checks of the settings that only work across worker processes
+with a cache they share
+"""
+from django.conf import settings
+from django.core.checks import (Error,
+                                register)
+
+# backends keeping their entries in the memory of each process
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_shared(alias):
+    """Return whether the cache `alias` is shared between processes"""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+@register()
+def check_response_cache(app_configs, **kwargs):
+    if settings.RESPONSE_CACHE_ENABLED and not is_shared('responses'):
+        return [Error(
+            'The response cache needs a cache shared between processes.',
+            hint='Set RESPONSE_CACHE_BACKEND to file or redis, or '
+                 'RESPONSE_CACHE_ENABLED=0. Writes only invalidate a local '
+                 'memory cache in the worker handling them.',
+            id='core.E001',
+        )]
+
+    return []
+
+
+@register()
+def check_token_auth_cache(app_configs, **kwargs):
+    backend = settings.TOKEN_AUTH_CACHE['BACKEND']
+    if backend is not None and not is_shared(backend):
+        return [Error(
+            'TOKEN_AUTH_CACHE_BACKEND must be a cache shared between '
+            'processes.',
+            hint='Use a file or redis cache, or leave it unset to only '
+                 'cache token resolutions for LOCAL_TTL seconds.',
+            id='core.E002',
+        )]
+
+    return []
+
+
+@register()
+def check_replica_sticky_cache(app_configs, **kwargs):
+    if settings.REPLICA_DATABASES \
+            and not is_shared(settings.REPLICA_STICKY_CACHE):
+        return [Error(
+            'REPLICA_STICKY_CACHE must be a cache shared between processes '
+            'when read replicas are configured.',
+            hint='The next request of a user who wrote usually reaches '
+                 'another worker, which must see the user is sticky. Point '
+                 'it to a file or redis cache, e.g. responses with '
+                 'RESPONSE_CACHE_BACKEND=redis.',
+            id='core.E003',
+        )]
+
+    return []
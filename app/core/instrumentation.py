@@ -0,0 +1,333 @@
+"""
+Per-request performance instrumentation
+
+PerformanceMiddleware samples PERF_SAMPLE_RATE of the requests. For a
+sampled request it records the wall time, the number and duration of the
+database queries, the time spent serializing and the response size,
+returns them in a Server-Timing header and adds them to per-route
+histograms served in the Prometheus text format by `metrics_view`.
+
+Queries are counted by an execute wrapper installed on every database
+connection when it is created, serializers report through
+`timed_serialization`. Both only look up a context variable when the
+request isn't sampled.
+
+Histograms are kept per process. With PERF_METRICS_DIR set, every worker
+also writes its histograms to a file of its own in that directory after
+each sampled request and `metrics_view` serves the sum of the files, so a
+single scrape through the load balancer sees every worker, including the
+ones replaced since the server started. Otherwise each series carries a
+`pid` label and every worker has to be scraped on its own.
+"""
+import functools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from asgiref.sync import (iscoroutinefunction,
+                          markcoroutinefunction)
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import (HttpResponse,
+                         HttpResponseForbidden)
+from django.utils.crypto import constant_time_compare
+
+# seconds, upper bounds of the latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Measurements of one sampled request"""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Count the queries of sampled requests on every connection"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def timed_serialization(to_representation):
+    """
+    Decorate Serializer.to_representation to add its duration to the
+    sampled request, nested serializers are counted once.
+    """
+
+    @functools.wraps(to_representation)
+    def wrapper(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return to_representation(self, instance)
+
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return to_representation(self, instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics.serializing = False
+
+    return wrapper
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with one series per label set"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # labels -> ([count per bucket], sum, count)
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts, total, count = self.series.get(
+            labels, ([0] * len(self.buckets), 0, 0)
+        )
+        counts = [bucket_count + (value <= bound)
+                  for bucket_count, bound in zip(counts, self.buckets)]
+        self.series[labels] = (counts, total + value, count + 1)
+
+    def merge(self, series):
+        """Add series of another process, a list of [labels, counts, sum,
+        count]"""
+        for labels, counts, total, count in series:
+            labels = tuple(tuple(label) for label in labels)
+            own_counts, own_total, own_count = self.series.get(
+                labels, ([0] * len(self.buckets), 0, 0)
+            )
+            self.series[labels] = (
+                [own + other for own, other in zip(own_counts, counts)],
+                own_total + total, own_count + count,
+            )
+
+    def dump(self):
+        return [[labels, counts, total, count]
+                for labels, (counts, total, count) in self.series.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}',
+                 f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            label_text = ','.join(f'{key}="{_escape(value)}"'
+                                  for key, value in labels)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label_text},'
+                             f'le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} '
+                         f'{count}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"')
+
+
+class MetricsRegistry:
+    """Per-route histograms of the sampled requests of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self.reset()
+
+    @staticmethod
+    def _histograms():
+        return {
+            'duration': Histogram(
+                'http_request_duration_seconds',
+                'Wall time of the sampled requests.', DURATION_BUCKETS,
+            ),
+            'db_time': Histogram(
+                'http_request_db_seconds',
+                'Database time of the sampled requests.',
+                DURATION_BUCKETS,
+            ),
+            'db_queries': Histogram(
+                'http_request_db_queries',
+                'Database queries of the sampled requests.',
+                QUERY_BUCKETS,
+            ),
+            'serializer_time': Histogram(
+                'http_request_serializer_seconds',
+                'Serialization time of the sampled requests.',
+                DURATION_BUCKETS,
+            ),
+            'response_size': Histogram(
+                'http_response_size_bytes',
+                'Body size of the sampled responses.', SIZE_BUCKETS,
+            ),
+        }
+
+    def reset(self):
+        with self._lock:
+            self.histograms = self._histograms()
+
+    def observe(self, labels, **values):
+        directory = settings.PERF_METRICS_DIR
+        if not directory:
+            labels = {**labels, 'pid': os.getpid()}
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            for name, value in values.items():
+                self.histograms[name].observe(labels, value)
+            if directory:
+                self._write(directory)
+
+    def _write(self, directory):
+        """Replace the file of this process, readers never see it half
+        written"""
+        # a worker replacing a dead one can reuse its pid
+        if self._file is None or self._file[0] != os.getpid():
+            self._file = (os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex}')
+        path = os.path.join(directory, f'{self._file[1]}.json')
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump({name: histogram.dump()
+                       for name, histogram in self.histograms.items()}, file)
+        os.replace(f'{path}.tmp', path)
+
+    def _read(self, directory):
+        """Return histograms summing the files of every process"""
+        histograms = self._histograms()
+        for entry in os.scandir(directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                with open(entry.path) as file:
+                    dumped = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, series in dumped.items():
+                histograms[name].merge(series)
+
+        return histograms
+
+    def render(self):
+        directory = settings.PERF_METRICS_DIR
+        with self._lock:
+            histograms = self._read(directory) if directory \
+                else self.histograms
+            lines = [line for histogram in histograms.values()
+                     for line in histogram.render()]
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class PerformanceMiddleware:
+    """Instrument a sample of the requests, see the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _sampled():
+        rate = settings.PERF_SAMPLE_RATE
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self._finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self._finish(request, response, metrics, started)
+
+    @staticmethod
+    def _finish(request, response, metrics, started):
+        duration = time.perf_counter() - started
+        size = 0 if response.streaming else len(response.content)
+        match = request.resolver_match
+        registry.observe(
+            {'route': match.route if match else 'unmatched',
+             'method': request.method},
+            duration=duration,
+            db_time=metrics.db_time,
+            db_queries=metrics.db_queries,
+            serializer_time=metrics.serializer_time,
+            response_size=size,
+        )
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={duration * 1000:.1f}',
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.db_queries} queries"',
+            f'serialize;dur={metrics.serializer_time * 1000:.1f}',
+        ])
+
+        return response
+
+
+def metrics_view(request):
+    """
+    Serve the histograms in the Prometheus text format to scrapers sending
+    `Authorization: Bearer <PERF_METRICS_TOKEN>` or to staff users.
+    """
+    token = settings.PERF_METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (token and constant_time_compare(authorization,
+                                            f'Bearer {token}')
+            or request.user.is_staff):
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,131 @@
+"""
+Django command running the API load benchmark
+"""
+import json
+import random
+import subprocess
+from datetime import (datetime,
+                      timezone)
+
+from django.conf import settings
+from django.core.management.base import (BaseCommand,
+                                         CommandError)
+from django.db import connection
+from django.test import override_settings
+
+from medication_sku import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Django command seeding benchmark users and driving the SKU and tag
+    endpoints at a fixed concurrency
+
+    The report is JSON with the commit, database and parameters of the run
+    so that runs of different commits can be diffed. Requests are made in
+    process, without sockets, and every request is instrumented.
+    """
+    help = ('Seed synthetic data and benchmark the SKU and tag endpoints, '
+            'reporting throughput, latency percentiles and query counts '
+            'as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5,
+                            help='Benchmark users to seed')
+        parser.add_argument('--skus-per-user', type=int, default=200,
+                            help='Medication SKUs seeded per user')
+        parser.add_argument('--tags-per-user', type=int, default=20,
+                            help='Tags seeded per user')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Threads sending requests')
+        parser.add_argument('--bulk-size', type=int, default=100,
+                            help='Items per bulk_create request')
+        parser.add_argument('--scenarios',
+                            default=','.join(benchmark.SCENARIOS),
+                            help='Comma separated scenarios to run')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the data and request generators')
+        parser.add_argument('--cache', action='store_true',
+                            help='Keep the response cache enabled')
+        parser.add_argument('--keep', action='store_true',
+                            help="Don't delete the benchmark users after")
+        parser.add_argument('--output',
+                            help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        scenarios = [name.strip() for name in options['scenarios'].split(',')
+                     if name.strip()]
+        unknown = set(scenarios) - set(benchmark.SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f"Unknown scenarios {', '.join(sorted(unknown))}, choose "
+                f"from {', '.join(benchmark.SCENARIOS)}."
+            )
+        if options['users'] < 1 or options['skus_per_user'] < 1:
+            raise CommandError('Seed at least one user and SKU.')
+
+        self.stderr.write('Seeding benchmark data...')
+        catalog = benchmark.seed(
+            random.Random(options['seed']), options['users'],
+            options['skus_per_user'], options['tags_per_user'],
+        )
+
+        report = {'meta': self._meta(options, scenarios), 'scenarios': {}}
+        query_analysis = {**settings.QUERY_ANALYSIS, 'ENABLED': False}
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                                   PERF_SAMPLE_RATE=1,
+                                   RESPONSE_CACHE_ENABLED=options['cache'],
+                                   QUERY_ANALYSIS=query_analysis):
+                for scenario in scenarios:
+                    self.stderr.write(f'Running {scenario}...')
+                    report['scenarios'][scenario] = benchmark.summarize(
+                        benchmark.run(
+                            scenario, catalog, options['requests'],
+                            options['concurrency'], options['bulk_size'],
+                            options['seed'],
+                        )
+                    )
+        finally:
+            if not options['keep']:
+                benchmark.remove()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def _meta(options, scenarios):
+        """Return what identifies the run"""
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        return {
+            'commit': commit,
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'parameters': {
+                'users': options['users'],
+                'skus_per_user': options['skus_per_user'],
+                'tags_per_user': options['tags_per_user'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'bulk_size': options['bulk_size'],
+                'scenarios': scenarios,
+                'seed': options['seed'],
+                'cache': options['cache'],
+            },
+        }
@@ -0,0 +1,142 @@
+"""
+Django command comparing the WSGI and ASGI read path throughput
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (BaseCommand,
+                                         CommandError)
+from django.test import (AsyncClient,
+                         Client,
+                         override_settings)
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import MedicationSKU
+from medication_sku.benchmark import percentile
+
+
+class Command(BaseCommand):
+    """
+    Django command sending the same requests to the sync viewsets through
+    the WSGI and the ASGI handler, and to their async variants through the
+    ASGI handler
+
+    The viewset rows compare both handlers on the same code. The async
+    views do less work than the viewsets: no DRF permissions, no ETag or
+    Last-Modified (and their page query) and no replica routing, so
+    their row isn't the same request served differently. Requests are made
+    in process, without sockets, on this database. The response cache is
+    disabled to measure the views rather than the cache.
+    """
+    help = 'Benchmark the SKU and tag read endpoints under WSGI and ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True,
+                            help='Email of the user making the requests')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Requests per endpoint and server')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Requests in flight at once')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {'Authorization': f'Token {token.key}'}
+
+        endpoints = [
+            ('medication SKU list',
+             reverse('medication_sku:medication_skus-list'),
+             reverse('medication_sku:async-medication-skus-list')),
+            ('tag list',
+             reverse('medication_sku:tag-list'),
+             reverse('medication_sku:async-tags-list')),
+        ]
+        sku_id = MedicationSKU.objects.values_list('id', flat=True).first()
+        if sku_id is not None:
+            endpoints.append((
+                'medication SKU detail',
+                reverse('medication_sku:medication_skus-detail',
+                        args=[sku_id]),
+                reverse('medication_sku:async-medication-skus-detail',
+                        args=[sku_id]),
+            ))
+
+        self.stdout.write(f"{'endpoint':<24}{'server':<8}{'view':<10}"
+                          f"{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+                          f"{'errors':>8}")
+        requests, concurrency = options['requests'], options['concurrency']
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                               RESPONSE_CACHE_ENABLED=False):
+            for name, sync_url, async_url in endpoints:
+                self._report(name, 'wsgi', 'viewset', self._run_wsgi(
+                    sync_url, headers, requests, concurrency,
+                ))
+                self._report(name, 'asgi', 'viewset', asyncio.run(
+                    self._run_asgi(sync_url, headers, requests, concurrency)
+                ))
+                self._report(name, 'asgi', 'async', asyncio.run(
+                    self._run_asgi(async_url, headers, requests, concurrency)
+                ))
+
+        self.stdout.write(
+            'viewset: the DRF viewsets, with permissions, ETag and '
+            'Last-Modified and replica routing.\n'
+            'async: the async views, which skip all of these. Compare the '
+            'viewset rows to compare the handlers alone.'
+        )
+
+    @staticmethod
+    def _run_wsgi(url, headers, requests, concurrency):
+        """Return the elapsed time, latencies and errors of the requests"""
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(url, headers=headers)
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(request, range(requests)))
+
+        return time.perf_counter() - started, results
+
+    @staticmethod
+    async def _run_asgi(url, headers, requests, concurrency):
+        """Return the elapsed time, latencies and errors of the requests"""
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[request() for _ in range(requests)])
+
+        return time.perf_counter() - started, results
+
+    def _report(self, name, server, view, run):
+        elapsed, results = run
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(status != 200 for _, status in results)
+        p50 = percentile(latencies, 0.50) or 0
+        p95 = percentile(latencies, 0.95) or 0
+
+        self.stdout.write(
+            f'{name:<24}{server:<8}{view:<10}{len(results) / elapsed:>10.1f}'
+            f'{p50 * 1000:>10.1f}{p95 * 1000:>10.1f}{errors:>8}'
+        )
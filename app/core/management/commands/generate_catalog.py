@@ -0,0 +1,150 @@
+"""
+Django command generating a synthetic medication SKU catalog
+"""
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (BaseCommand,
+                                         CommandError)
+from django.db import (connection,
+                       transaction)
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import MedicationSKU
+from medication_sku import (bulk,
+                            pgcopy,
+                            synthetic)
+from medication_sku.signals import medication_skus_loaded
+
+CATALOG_EMAIL = 'catalog-{}@example.com'
+
+SKU_COLUMNS = ['id', 'user_id', 'medication_name', 'presentation', 'dose',
+               'unit', 'updated_at']
+
+
+class Command(BaseCommand):
+    """
+    Django command loading millions of realistic medication SKUs for
+    scale testing
+
+    SKUs are spread over catalog-<n>@example.com users, which are created
+    when missing, and tagged with the tags of their owner. Users, tags and
+    name stems are ranked by Zipf's law. On PostgreSQL every chunk is
+    loaded with COPY and the search vectors of the whole run are computed
+    by one UPDATE at the end, on other databases with the bulk_create
+    helpers.
+    Names are numbered after the highest SKU id so that runs can be added
+    to an existing catalog.
+    """
+    help = 'Generate a synthetic medication SKU catalog for scale testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skus', type=int, default=100_000,
+                            help='Medication SKUs to generate')
+        parser.add_argument('--users', type=int, default=100,
+                            help='Users owning the SKUs')
+        parser.add_argument('--tags-per-user', type=int, default=50,
+                            help='Tags of every user')
+        parser.add_argument('--tags-per-sku', type=int, default=3,
+                            help='Most tags picked per SKU')
+        parser.add_argument('--zipf-exponent', type=float, default=1.1,
+                            help='Skew of the user, tag and name '
+                                 'popularity, 0 is uniform')
+        parser.add_argument('--chunk-size', type=int, default=50_000,
+                            help='SKUs loaded per transaction')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the generator')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options['skus'] < 0 or options['users'] < 1 \
+                or options['tags_per_user'] < 1 or options['chunk_size'] < 1:
+            raise CommandError(
+                'Generate zero or more SKUs, for at least one user with '
+                'one tag, in chunks of at least one SKU.'
+            )
+
+        users = self._users(options['users'])
+        names = synthetic.tag_names(options['tags_per_user'])
+        tags = [{name: tag.pk for name, tag in bulk.resolve_tags(
+            user, names).items()} for user in users]
+        offset = (MedicationSKU.objects.aggregate(Max('id'))['id__max']
+                  or 0) + 1
+        load = self._copy if pgcopy.supported() else self._bulk_create
+
+        rows = synthetic.catalog(
+            random.Random(options['seed']), options['skus'], len(users),
+            names, offset, options['tags_per_sku'],
+            options['zipf_exponent'],
+        )
+        started = time.perf_counter()
+        loaded = 0
+        for chunk in bulk.chunked(rows, options['chunk_size']):
+            with transaction.atomic():
+                load(chunk, users, tags)
+            loaded += len(chunk)
+            self.stdout.write(
+                f"{loaded}/{options['skus']} SKUs "
+                f'({loaded / (time.perf_counter() - started):.0f}/s)'
+            )
+
+        if pgcopy.supported():
+            medication_skus_loaded.send(
+                sender=MedicationSKU,
+                queryset=MedicationSKU.objects.filter(
+                    search_vector__isnull=True,
+                ),
+            )
+            # fresh statistics for the planner, autovacuum lags behind
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'ANALYZE {MedicationSKU._meta.db_table}, '
+                    f'{MedicationSKU.tags.through._meta.db_table}'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {loaded} SKUs in '
+            f'{time.perf_counter() - started:.1f}s.'
+        ))
+
+    @staticmethod
+    def _users(count):
+        """Return the catalog users, creating the missing ones"""
+        emails = [CATALOG_EMAIL.format(index) for index in range(count)]
+        users = get_user_model().objects.in_bulk(emails, field_name='email')
+        for email in emails:
+            if email not in users:
+                users[email] = get_user_model().objects.create_user(
+                    email=email,
+                )
+
+        return [users[email] for email in emails]
+
+    @staticmethod
+    def _copy(chunk, users, tags):
+        """Load `chunk` with COPY, without search vectors"""
+        ids = pgcopy.reserve_ids(MedicationSKU, len(chunk))
+        now = timezone.now()
+        pgcopy.copy_rows(MedicationSKU._meta.db_table, SKU_COLUMNS, (
+            (sku_id, users[user].pk, item['medication_name'],
+             item['presentation'], item['dose'], item['unit'], now)
+            for sku_id, (user, item) in zip(ids, chunk)
+        ))
+        pgcopy.copy_rows(
+            MedicationSKU.tags.through._meta.db_table,
+            ['medicationsku_id', 'tag_id'],
+            ((sku_id, tags[user][tag['name']])
+             for sku_id, (user, item) in zip(ids, chunk)
+             for tag in item['tags']),
+        )
+
+    @staticmethod
+    def _bulk_create(chunk, users, tags):
+        """Load `chunk` with bulk_create, which sends its own signals"""
+        items = {}
+        for user, item in chunk:
+            items.setdefault(user, []).append(item)
+
+        for user, user_items in items.items():
+            bulk.create_medication_skus(users[user], user_items)
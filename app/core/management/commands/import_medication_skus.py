@@ -0,0 +1,89 @@
+"""
+Django command to import medication SKUs from an NDJSON or CSV file
+"""
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (BaseCommand,
+                                         CommandError)
+
+from medication_sku import (bulk,
+                            importer)
+
+
+class Command(BaseCommand):
+    """
+    Django command streaming a supplier feed into the catalog
+    """
+    help = 'Import medication SKUs from an NDJSON or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, '-' for stdin")
+        parser.add_argument('--user', required=True,
+                            help='Email of the user owning the SKUs')
+        parser.add_argument('--format', choices=list(importer.PARSERS),
+                            dest='import_format',
+                            help='File format, guessed from the extension '
+                                 'by default')
+        parser.add_argument('--upsert', action='store_true',
+                            help='Update SKUs of the user with an existing '
+                                 'name instead of rejecting them')
+        parser.add_argument('--chunk-size', type=int,
+                            default=bulk.BATCH_SIZE,
+                            help='Rows validated and inserted per '
+                                 'transaction')
+        parser.add_argument('--copy', action='store_true',
+                            help='Load the file in one transaction through '
+                                 'a staging table with COPY, for full '
+                                 'catalog reloads on PostgreSQL')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        path = options['path']
+        import_format = options['import_format']
+        if import_format is None:
+            import_format = 'csv' if path.endswith('.csv') else 'ndjson'
+
+        if path == '-':
+            report = self._import(user, sys.stdin.buffer, import_format,
+                                  options)
+        else:
+            with open(path, 'rb') as stream:
+                report = self._import(user, stream, import_format, options)
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report.failed > len(report.errors):
+            self.stderr.write(
+                f'... {report.failed - len(report.errors)} more errors'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {report.created} and updated {report.updated} '
+            f'medication SKUs, {report.failed} rows failed.'
+        ))
+
+    def _import(self, user, stream, import_format, options):
+        report = importer.ImportReport()
+        rows = importer.parse(stream, import_format)
+        try:
+            if options['copy']:
+                importer.copy_import_medication_skus(
+                    user, rows, report=report, upsert=options['upsert'],
+                )
+            else:
+                importer.import_medication_skus(
+                    user, rows, chunk_size=options['chunk_size'],
+                    report=report, upsert=options['upsert'],
+                )
+        except UnicodeDecodeError:
+            report.add_error(None, {
+                'non_field_errors': ['The file is not valid UTF-8.'],
+            })
+
+        return report
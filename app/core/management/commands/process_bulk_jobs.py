@@ -0,0 +1,49 @@
+"""
+Django command processing the queued bulk medication SKU jobs
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from medication_sku import (bulk,
+                            jobs)
+
+
+class Command(BaseCommand):
+    """
+    Django command running queued bulk jobs, start several to process
+    jobs in parallel
+    """
+    help = 'Process queued bulk medication SKU jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty instead of '
+                                 'waiting for new jobs')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--chunk-size', type=int,
+                            default=bulk.BATCH_SIZE,
+                            help='Rows validated and inserted per '
+                                 'transaction')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        while True:
+            job = jobs.claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Processing bulk job {job.pk} '
+                              f'({job.total} rows)...')
+            job = jobs.run_job(job, chunk_size=options['chunk_size'])
+            message = (f'Bulk job {job.pk} {job.status}: created '
+                       f'{job.created}, updated {job.updated}, '
+                       f'{job.failed} rows failed.')
+            if job.detail:
+                self.stderr.write(f'{message} {job.detail}')
+            else:
+                self.stdout.write(self.style.SUCCESS(message))
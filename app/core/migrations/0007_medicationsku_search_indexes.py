@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:49
+
+from django.db import migrations, models
+
+# Django compiles icontains/istartswith on PostgreSQL to
+# UPPER("medication_name"::text) LIKE UPPER(%s), the expression
+# indexes below match it exactly.
+SEARCH_INDEXES = [
+    # substring search, any LIKE '%...%' pattern of 3+ characters
+    'CREATE INDEX IF NOT EXISTS core_medicationsku_name_trgm '
+    'ON core_medicationsku '
+    'USING gin ((UPPER(medication_name::text)) gin_trgm_ops)',
+    # prefix search, LIKE '...%' including 1-2 character prefixes
+    'CREATE INDEX IF NOT EXISTS core_medicationsku_name_prefix '
+    'ON core_medicationsku '
+    '((UPPER(medication_name::text)) text_pattern_ops)',
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    """Create the PostgreSQL only name search indexes"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for sql in SEARCH_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    """Drop the PostgreSQL only name search indexes"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS core_medicationsku_name_trgm')
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS core_medicationsku_name_prefix'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_tag_core_tag_name_102daa_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicationsku',
+            index=models.Index(fields=['presentation', 'unit', 'dose'], name='core_medica_present_5d2185_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
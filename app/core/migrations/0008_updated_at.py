@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_medicationsku_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationsku',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
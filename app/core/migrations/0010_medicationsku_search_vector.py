@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:49
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Same vector as medication_sku.search.search_vector()
+BACKFILL = (
+    "UPDATE core_medicationsku m SET search_vector = "
+    "setweight(to_tsvector('simple', m.medication_name), 'A') || "
+    "setweight(to_tsvector('simple', m.presentation), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE(("
+    " SELECT string_agg(t.name, ' ') FROM core_tag t"
+    " JOIN core_medicationsku_tags l ON l.tag_id = t.id"
+    " WHERE l.medicationsku_id = m.id"
+    "), '')), 'C')"
+)
+
+
+def create_search_vectors(apps, schema_editor):
+    """Fill and index the search vectors on PostgreSQL"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(BACKFILL)
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS core_medicationsku_search '
+        'ON core_medicationsku USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    """Drop the PostgreSQL only search vector index"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS core_medicationsku_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_bulkjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationsku',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_vectors, drop_search_index),
+    ]
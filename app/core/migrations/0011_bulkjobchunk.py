@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+CHUNK_SIZE = 1000
+
+
+def move_payloads(apps, schema_editor):
+    """Split the payloads of the unfinished jobs into chunks"""
+    BulkJob = apps.get_model('core', 'BulkJob')
+    BulkJobChunk = apps.get_model('core', 'BulkJobChunk')
+    jobs = BulkJob.objects.using(schema_editor.connection.alias).filter(
+        status__in=['queued', 'running'],
+    )
+    for job in jobs.iterator(chunk_size=1):
+        BulkJobChunk.objects.using(schema_editor.connection.alias).bulk_create(
+            BulkJobChunk(job=job, index=index,
+                         rows=job.payload[start:start + CHUNK_SIZE])
+            for index, start in enumerate(
+                range(0, len(job.payload), CHUNK_SIZE)
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_medicationsku_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkJobChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('rows', models.JSONField(default=list)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='core.bulkjob')),
+            ],
+            options={
+                'unique_together': {('job', 'index')},
+            },
+        ),
+        migrations.RunPython(move_payloads, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='bulkjob',
+            name='payload',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_bulkjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_name_102daa_idx',
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['name', 'id'], name='core_tag_name_c1ff8f_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:58
+
+from django.db import migrations
+
+# medication_sku.autocomplete.suggest() reads names starting with a prefix
+# in name order on PostgreSQL with
+# UPPER("medication_name") COLLATE "C" >= %s AND ... < %s
+# ORDER BY UPPER("medication_name") COLLATE "C", "id", the index below
+# matches it exactly. The text_pattern_ops index of 0007 serves LIKE but
+# can't return the rows sorted.
+NAME_ORDER_INDEX = (
+    'CREATE INDEX IF NOT EXISTS core_medicationsku_name_order '
+    'ON core_medicationsku '
+    '((UPPER(medication_name) COLLATE "C"), id)'
+)
+
+
+def create_name_order_index(apps, schema_editor):
+    """Create the PostgreSQL only name order index"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(NAME_ORDER_INDEX)
+
+
+def drop_name_order_index(apps, schema_editor):
+    """Drop the PostgreSQL only name order index"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS core_medicationsku_name_order')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_tag_name_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_name_order_index, drop_name_order_index),
+    ]
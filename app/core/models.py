@@ -5,6 +5,7 @@ from django.conf import settings
 from django.contrib.auth.models import (AbstractBaseUser,
                                         BaseUserManager,
                                         PermissionsMixin)
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
@@ -72,6 +73,10 @@ class MedicationSKU(models.Model):
     dose = models.PositiveIntegerField()
     unit = models.CharField(max_length=50)
     tags = models.ManyToManyField("Tag")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # name, presentation and tag names, GIN indexed on PostgreSQL by
+    # migration 0010 and kept up to date by medication_sku.signals
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         unique_together = (
@@ -82,6 +87,12 @@ class MedicationSKU(models.Model):
                 'unit'
             ),
         )
+        # filtering by presentation and unit, optionally by dose range.
+        # Substring and prefix search on the name use a trigram index
+        # created by migration 0007 on PostgreSQL.
+        indexes = [
+            models.Index(fields=['presentation', 'unit', 'dose']),
+        ]
         verbose_name = 'Medication SKU'
         verbose_name_plural = 'Medication SKUs'
 
@@ -96,6 +107,82 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # tags are resolved by (user, name) when assigning them in bulk
+        # and the tag list is paginated by (name, id), scanned backwards
+        indexes = [
+            models.Index(fields=['user', 'name']),
+            models.Index(fields=['name', 'id']),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class BulkJob(models.Model):
+    """
+    Bulk write queued to run in the background
+
+    The (line, row, error) triples to import are stored in BulkJobChunks,
+    a worker (manage.py process_bulk_jobs) claims queued jobs and records
+    the progress and the errors of the rows as it goes. `heartbeat_at` is
+    refreshed after every chunk, a running job without a recent one is
+    taken back by another worker.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES,
+                              default=QUEUED)
+    upsert = models.BooleanField(default=False)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list)
+    detail = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # workers claim the oldest queued job
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'Bulk job {self.pk} ({self.status})'
+
+
+class BulkJobChunk(models.Model):
+    """
+    Rows of a bulk job, stored in chunks so that neither enqueuing nor
+    running a job holds more than one chunk in memory
+    """
+    job = models.ForeignKey(BulkJob, on_delete=models.CASCADE,
+                            related_name='chunks')
+    index = models.PositiveIntegerField()
+    rows = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('job', 'index')
+
+    def __str__(self):
+        return f'Chunk {self.index} of bulk job {self.job_id}'
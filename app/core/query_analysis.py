@@ -0,0 +1,173 @@
+"""
+Detection of repeated (N+1) and slow queries
+
+QueryAnalyzer captures the statements executed on every database
+connection of the current thread with `connection.execute_wrapper` and
+groups them by shape, the SQL with its literals and parameter lists
+replaced by `?`. A shape executed more than REPEAT_THRESHOLD times is
+usually a query per object, e.g. per-SKU tag lookups during serialization.
+
+QueryAnalysisMiddleware analyzes every request of the sync stack when
+settings.QUERY_ANALYSIS['ENABLED'] is set: offenders are logged, or raised
+as RepeatedQueriesError with RAISE, which the test runner turns on.
+"""
+import logging
+import re
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import (iscoroutinefunction,
+                          markcoroutinefunction)
+from django.conf import settings
+from django.db import connections
+
+from core import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# execute wrappers, never the origin of a query
+_WRAPPER_FILES = {__file__, instrumentation.__file__}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_VALUES_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS_LIST = re.compile(r'\(\?\)(?:\s*,\s*\(\?\))+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Return the shape of `sql`, literals and value lists as `?`"""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _VALUES_LIST.sub('(?)', shape)
+    shape = _ROWS_LIST.sub('(?)', shape)
+
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class RepeatedQueriesError(AssertionError):
+    """Queries of the same shape were executed too many times"""
+
+
+def _origin():
+    """Return 'file:line in function' of the innermost project frame"""
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(base_dir)
+                and filename not in _WRAPPER_FILES
+                and 'site-packages' not in filename):
+            path = Path(filename).relative_to(base_dir)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+
+    return 'unknown'
+
+
+class QueryShape:
+    """Executions of one query shape"""
+
+    def __init__(self, shape, origin):
+        self.shape = shape
+        self.origin = origin
+        self.count = 0
+        self.duration = 0.0
+
+    def __str__(self):
+        return (f'{self.count}x ({self.duration * 1000:.1f} ms) from '
+                f'{self.origin}: {self.shape}')
+
+
+class QueryAnalyzer:
+    """Context manager capturing the queries run on every connection"""
+
+    def __init__(self):
+        self.shapes = {}
+        self.slow = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            shape = normalize(sql)
+            query = self.shapes.get(shape)
+            if query is None:
+                # the stack is only walked once per shape
+                query = self.shapes[shape] = QueryShape(shape, _origin())
+            query.count += 1
+            query.duration += duration
+            if duration * 1000 > settings.QUERY_ANALYSIS['SLOW_MS']:
+                self.slow.append((duration, sql))
+
+    def repeated(self, threshold=None):
+        """Return the shapes executed more than `threshold` times"""
+        if threshold is None:
+            threshold = settings.QUERY_ANALYSIS['REPEAT_THRESHOLD']
+
+        return sorted(
+            (query for query in self.shapes.values()
+             if query.count > threshold),
+            key=lambda query: query.count,
+            reverse=True,
+        )
+
+    def total(self):
+        return sum(query.count for query in self.shapes.values())
+
+
+def report(analyzer, label):
+    """Log the offenders of `analyzer`, raise when configured to"""
+    repeated = analyzer.repeated()
+    for duration, sql in analyzer.slow:
+        logger.warning('Slow query (%.1f ms) in %s: %s',
+                       duration * 1000, label, sql)
+    if not repeated:
+        return
+
+    message = (f'{label} ran {analyzer.total()} queries, repeated shapes:\n'
+               + '\n'.join(str(query) for query in repeated))
+    if settings.QUERY_ANALYSIS['RAISE']:
+        raise RepeatedQueriesError(message)
+    logger.warning(message)
+
+
+class QueryAnalysisMiddleware:
+    """Analyze the queries of each request, see the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            # the async ORM runs queries on other threads, whose
+            # connections aren't wrapped here
+            return self.get_response(request)
+        if not settings.QUERY_ANALYSIS['ENABLED']:
+            return self.get_response(request)
+
+        with QueryAnalyzer() as analyzer:
+            response = self.get_response(request)
+        report(analyzer, f'{request.method} {request.path}')
+
+        return response
@@ -0,0 +1,75 @@
+"""
+Database router sending reads to the replicas when a view allows it
+
+Reads only go to one of settings.REPLICA_DATABASES inside `replica_reads()`,
+everything else (writes, migrations, reads of other code) uses `default`.
+The first write inside `replica_reads()` pins the rest of it to the
+primary so a request reads its own writes. Users who just wrote are kept
+on the primary for REPLICA_STICKY_SECONDS, the time replicas need to
+catch up.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Let the reads of the enclosed code go to a replica"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def reads_replica():
+    """Return whether the reads of the current code go to a replica"""
+    return _use_replica.get() and bool(settings.REPLICA_DATABASES)
+
+
+def _sticky_key(user):
+    return f'replica-sticky:{user.pk}'
+
+
+def mark_sticky(user):
+    """Keep the reads of `user` on the primary for a while"""
+    if settings.REPLICA_DATABASES and settings.REPLICA_STICKY_SECONDS:
+        caches[settings.REPLICA_STICKY_CACHE].set(
+            _sticky_key(user), True, settings.REPLICA_STICKY_SECONDS,
+        )
+
+
+def is_sticky(user):
+    """Return whether `user` wrote recently"""
+    return bool(settings.REPLICA_DATABASES) and caches[
+        settings.REPLICA_STICKY_CACHE
+    ].get(_sticky_key(user), False)
+
+
+class ReadReplicaRouter:
+    """Route the reads allowed by `replica_reads()` to a random replica"""
+
+    def db_for_read(self, model, **hints):
+        if reads_replica():
+            return random.choice(settings.REPLICA_DATABASES)
+
+        return None
+
+    def db_for_write(self, model, **hints):
+        # read your own writes until the end of the request
+        _use_replica.set(False)
+
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas mirror the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
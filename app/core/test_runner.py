@@ -0,0 +1,23 @@
+"""
+Test runner of the project
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryAnalysisTestRunner(DiscoverRunner):
+    """
+    Run the tests with the query analysis of every request enabled, a
+    request repeating a query shape more than REPEAT_THRESHOLD times
+    fails its test with RepeatedQueriesError.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._query_analysis = settings.QUERY_ANALYSIS
+        settings.QUERY_ANALYSIS = {**settings.QUERY_ANALYSIS,
+                                   'ENABLED': True, 'RAISE': True}
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_ANALYSIS = self._query_analysis
+        super().teardown_test_environment(**kwargs)
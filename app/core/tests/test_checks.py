@@ -0,0 +1,54 @@
+"""
+Tests for the system checks
+"""
+from django.test import (SimpleTestCase,
+                         override_settings)
+
+from core import checks
+
+LOCMEM = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+FILE = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/responses'}
+
+
+class SharedCacheChecksTests(SimpleTestCase):
+    """Test features needing a shared cache refuse a local one"""
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True,
+                       CACHES={'default': LOCMEM, 'responses': LOCMEM})
+    def test_response_cache_local_memory(self):
+        """Test the response cache can't use a local memory cache"""
+        errors = checks.check_response_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True,
+                       CACHES={'default': LOCMEM, 'responses': FILE})
+    def test_response_cache_shared(self):
+        """Test a shared backend passes"""
+        self.assertEqual(checks.check_response_cache(None), [])
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False,
+                       CACHES={'default': LOCMEM, 'responses': LOCMEM})
+    def test_response_cache_disabled(self):
+        """Test a disabled response cache passes"""
+        self.assertEqual(checks.check_response_cache(None), [])
+
+    @override_settings(TOKEN_AUTH_CACHE={'BACKEND': 'default'},
+                       CACHES={'default': LOCMEM})
+    def test_token_auth_cache_local_memory(self):
+        """Test the token cache can't share through a local memory cache"""
+        errors = checks.check_token_auth_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E002'])
+
+    @override_settings(REPLICA_DATABASES=['replica_0'],
+                       REPLICA_STICKY_CACHE='default',
+                       CACHES={'default': LOCMEM, 'responses': FILE})
+    def test_replica_sticky_cache(self):
+        """Test replicas need a shared cache of the sticky users"""
+        errors = checks.check_replica_sticky_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E003'])
+
+        with self.settings(REPLICA_STICKY_CACHE='responses'):
+            self.assertEqual(checks.check_replica_sticky_cache(None), [])
@@ -2,13 +2,27 @@
 Test custom django management commands
 """
 
+import io
+import json
+import os
+import tempfile
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.management import (CommandError,
+                                    call_command)
+from django.db.models import F
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (SimpleTestCase,
+                         TestCase,
+                         TransactionTestCase)
 from psycopg import OperationalError as PsycopgError
 
+from core.models import (BulkJob,
+                         MedicationSKU,
+                         Tag)
+from medication_sku import jobs
+
 
 @patch('core.management.commands.wait_for_db.Command.check')
 class CommandTests(SimpleTestCase):
@@ -42,3 +56,128 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class ImportMedicationSKUsCommandTests(TestCase):
+    """Test the import_medication_skus command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def _write(self, suffix, content):
+        """Write `content` to a temporary file and return its path"""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+
+        return path
+
+    def test_import_csv_file(self):
+        """Test importing a CSV file, format guessed from the extension"""
+        path = self._write('.csv', (
+            'medication_name,presentation,dose,unit,tags\n'
+            'Aspirin,Tablet,50,mg,Analgesic\n'
+            'Ibuprofen,Tablet,200,mg,Analgesic\n'
+        ))
+
+        call_command('import_medication_skus', path,
+                     user='user@example.com', chunk_size=1,
+                     stdout=io.StringIO())
+
+        self.assertEqual(
+            MedicationSKU.objects.filter(user=self.user).count(), 2
+        )
+
+    def test_import_unknown_user(self):
+        """Test importing for an unknown user fails"""
+        path = self._write('.ndjson', '')
+
+        with self.assertRaises(CommandError):
+            call_command('import_medication_skus', path,
+                         user='nobody@example.com')
+
+
+class ProcessBulkJobsCommandTests(TestCase):
+    """Test the process_bulk_jobs command"""
+
+    def test_process_queued_jobs(self):
+        """Test --once runs the queued jobs and exits"""
+        user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        row = {'medication_name': 'Aspirin', 'presentation': 'Tablet',
+               'dose': 50, 'unit': 'mg'}
+        job = jobs.enqueue(user, [(1, row, None)])
+
+        call_command('process_bulk_jobs', once=True, stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, BulkJob.SUCCEEDED)
+        self.assertTrue(
+            MedicationSKU.objects.filter(medication_name='Aspirin').exists()
+        )
+
+
+class BenchmarkReadPathCommandTests(TestCase):
+    """Test the benchmark_read_path command"""
+
+    def test_unknown_user(self):
+        """Test benchmarking as an unknown user fails"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_read_path', user='nobody@example.com')
+
+
+class GenerateCatalogCommandTests(TestCase):
+    """Test the generate_catalog command"""
+
+    def test_generate_catalog(self):
+        """Test SKUs are spread over the catalog users with their tags"""
+        call_command('generate_catalog', skus=120, users=3, tags_per_user=4,
+                     chunk_size=50, stdout=io.StringIO())
+
+        self.assertEqual(MedicationSKU.objects.count(), 120)
+        self.assertEqual(Tag.objects.count(), 12)
+        self.assertFalse(MedicationSKU.tags.through.objects.exclude(
+            tag__user=F('medicationsku__user'),
+        ).exists())
+
+    def test_generate_more(self):
+        """Test a second run adds SKUs with new names"""
+        for _ in range(2):
+            call_command('generate_catalog', skus=30, users=2,
+                         stdout=io.StringIO())
+
+        self.assertEqual(MedicationSKU.objects.count(), 60)
+        self.assertEqual(get_user_model().objects.count(), 2)
+
+
+class BenchmarkApiCommandTests(TransactionTestCase):
+    """Test the benchmark_api command"""
+
+    def test_report(self):
+        """Test every scenario is reported and the data removed"""
+        out = io.StringIO()
+
+        call_command('benchmark_api', users=1, skus_per_user=5,
+                     tags_per_user=3, requests=3, concurrency=1,
+                     bulk_size=2, stdout=out, stderr=io.StringIO())
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['parameters']['requests'], 3)
+        for scenario in ['list', 'detail', 'tags', 'create', 'bulk_create']:
+            result = report['scenarios'][scenario]
+            self.assertEqual(result['requests'], 3)
+            self.assertEqual(result['errors'], 0)
+            self.assertIsNotNone(result['latency_ms']['p99'])
+            self.assertGreater(result['queries_per_request']['mean'], 0)
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_unknown_scenario(self):
+        """Test benchmarking an unknown scenario fails"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', scenarios='list,upload')
@@ -0,0 +1,93 @@
+"""
+Tests for the pooled PostgreSQL backend
+"""
+from unittest.mock import (MagicMock,
+                           patch)
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from core.backends.postgresql.base import DatabaseWrapper
+
+
+def make_wrapper(alias='pooled', **settings):
+    """Return a backend connection for a test settings dict"""
+    settings_dict = {
+        'ENGINE': 'core.backends.postgresql',
+        'NAME': 'testdb',
+        'USER': 'user',
+        'PASSWORD': 'secret',
+        'HOST': 'db',
+        'PORT': '',
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+        'AUTOCOMMIT': True,
+        'ATOMIC_REQUESTS': False,
+        'TIME_ZONE': None,
+        'TEST': {},
+    }
+    settings_dict.update(settings)
+
+    return DatabaseWrapper(settings_dict, alias)
+
+
+@patch('psycopg_pool.ConnectionPool')
+class PooledBackendTests(SimpleTestCase):
+    """Test borrowing connections from the psycopg pool"""
+
+    def tearDown(self):
+        DatabaseWrapper._connection_pools.clear()
+
+    def test_no_pool_by_default(self, pool_class):
+        """Test connections aren't pooled without OPTIONS['pool']"""
+        self.assertIsNone(make_wrapper().pool)
+        pool_class.assert_not_called()
+
+    def test_pool_options(self, pool_class):
+        """Test the pool is built from the connection settings"""
+        wrapper = make_wrapper(OPTIONS={'pool': {'max_size': 5}})
+
+        self.assertIs(wrapper.pool, pool_class.return_value)
+        kwargs = pool_class.call_args.kwargs
+        self.assertEqual(kwargs['max_size'], 5)
+        self.assertEqual(kwargs['check'], pool_class.check_connection)
+        self.assertFalse(kwargs['open'])
+        self.assertEqual(kwargs['kwargs']['dbname'], 'testdb')
+        self.assertTrue(kwargs['kwargs']['autocommit'])
+        self.assertNotIn('pool', kwargs['kwargs'])
+
+    def test_pool_shared_by_connections(self, pool_class):
+        """Test the connections of an alias share one pool"""
+        first = make_wrapper(OPTIONS={'pool': True})
+        second = make_wrapper(OPTIONS={'pool': True})
+
+        self.assertIs(first.pool, second.pool)
+        pool_class.assert_called_once()
+
+    def test_health_checks_disabled(self, pool_class):
+        """Test the pool doesn't check connections without health checks"""
+        make_wrapper(OPTIONS={'pool': True}, CONN_HEALTH_CHECKS=False).pool
+
+        self.assertIsNone(pool_class.call_args.kwargs['check'])
+
+    def test_persistent_connections_rejected(self, pool_class):
+        """Test pooling can't be combined with CONN_MAX_AGE"""
+        wrapper = make_wrapper(OPTIONS={'pool': True}, CONN_MAX_AGE=60)
+
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.pool
+
+    def test_connection_returned_to_pool(self, pool_class):
+        """Test closing a connection puts it back into the pool"""
+        pool = pool_class.return_value
+        pool.getconn.return_value = MagicMock()
+        wrapper = make_wrapper(OPTIONS={'pool': True})
+
+        connection = wrapper.get_new_connection({})
+        wrapper.connection = connection
+        wrapper.close()
+
+        pool.open.assert_called_once()
+        pool.putconn.assert_called_once_with(connection)
+        self.assertIsNone(wrapper.connection)
@@ -0,0 +1,107 @@
+"""
+Tests for the request performance instrumentation
+"""
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import (TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.instrumentation import registry
+from core.models import MedicationSKU
+
+MEDICATION_SKU_LIST_URL = reverse('medication_sku:medication_skus-list')
+METRICS_URL = reverse('metrics')
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Test sampling requests and exporting their histograms"""
+
+    def setUp(self):
+        registry.reset()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        MedicationSKU.objects.create(
+            user=self.user, medication_name='Aspirin',
+            presentation='Tablet', dose=50, unit='mg',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(PERF_SAMPLE_RATE=0, RESPONSE_CACHE_ENABLED=False)
+    def test_not_sampled(self):
+        """Test requests aren't instrumented when sampling is off"""
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertNotIn('http_request_duration_seconds_count',
+                         registry.render())
+
+    @override_settings(PERF_SAMPLE_RATE=1, RESPONSE_CACHE_ENABLED=False)
+    def test_server_timing(self):
+        """Test sampled responses report their timings"""
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+
+        timing = res['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('serialize;dur=', timing)
+
+    @override_settings(PERF_SAMPLE_RATE=1, RESPONSE_CACHE_ENABLED=False,
+                       PERF_METRICS_TOKEN='scrape-secret')
+    def test_metrics_export(self):
+        """Test the histograms are exported per route"""
+        self.client.get(MEDICATION_SKU_LIST_URL)
+        self.client.get(MEDICATION_SKU_LIST_URL)
+
+        res = APIClient().get(METRICS_URL,
+                              HTTP_AUTHORIZATION='Bearer scrape-secret')
+
+        body = res.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertRegex(
+            body,
+            r'http_request_duration_seconds_count\{method="GET",'
+            rf'pid="{os.getpid()}",'
+            r'route="api/medication_sku/[^"]*medication_skus[^"]*"\} 2',
+        )
+        self.assertIn('http_response_size_bytes_bucket', body)
+
+    @override_settings(PERF_SAMPLE_RATE=1, RESPONSE_CACHE_ENABLED=False,
+                       PERF_METRICS_TOKEN='scrape-secret')
+    def test_metrics_export_every_worker(self):
+        """Test the histograms of every worker are summed from their files"""
+        with tempfile.TemporaryDirectory() as directory, \
+                self.settings(PERF_METRICS_DIR=directory):
+            self.client.get(MEDICATION_SKU_LIST_URL)
+            route = registry.histograms['duration'].series.copy().popitem()
+            labels, (counts, total, count) = route
+            # the file of another worker, which served 3 requests
+            with open(os.path.join(directory, 'other.json'), 'w') as file:
+                json.dump({'duration': [[labels, counts, total, 3]]}, file)
+
+            res = APIClient().get(METRICS_URL,
+                                  HTTP_AUTHORIZATION='Bearer scrape-secret')
+
+        body = res.content.decode()
+        self.assertNotIn('pid=', body)
+        self.assertRegex(
+            body,
+            r'http_request_duration_seconds_count\{method="GET",'
+            r'route="api/medication_sku/[^"]*medication_skus[^"]*"\} 4',
+        )
+        self.assertRegex(body, r'http_request_db_queries_count\{[^}]*\} 1')
+
+    @override_settings(PERF_METRICS_TOKEN='scrape-secret')
+    def test_metrics_forbidden(self):
+        """Test the metrics need the token or a staff user"""
+        res = APIClient().get(METRICS_URL, HTTP_AUTHORIZATION='Bearer nope')
+
+        self.assertEqual(res.status_code, 403)
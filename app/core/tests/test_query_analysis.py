@@ -0,0 +1,102 @@
+"""
+Tests for the repeated and slow query detection
+"""
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import (SimpleTestCase,
+                         TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import (MedicationSKU,
+                         Tag)
+from core.query_analysis import (QueryAnalyzer,
+                                 RepeatedQueriesError,
+                                 normalize)
+
+MEDICATION_SKU_LIST_URL = reverse('medication_sku:medication_skus-list')
+
+
+class NormalizeTests(SimpleTestCase):
+    """Test grouping statements by shape"""
+
+    def test_literals_and_lists(self):
+        """Test literals, parameters and IN lists are replaced"""
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s, %s)"
+                      "   AND c = 12"),
+            'SELECT * FROM t WHERE a = ? AND b IN (?) AND c = ?',
+        )
+        self.assertEqual(normalize('WHERE id IN (%s)'),
+                         normalize('WHERE id IN (%s, %s)'))
+
+
+class QueryAnalysisTests(TestCase):
+    """Test flagging requests that run a query per object"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        tag = Tag.objects.create(user=self.user, name='Analgesic')
+        for i in range(10):
+            medication_sku = MedicationSKU.objects.create(
+                user=self.user, medication_name=f'Medication {i}',
+                presentation='Tablet', dose=50, unit='mg',
+            )
+            medication_sku.tags.add(tag)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _list_without_prefetch(self):
+        """List the SKUs with the tags of each one looked up separately"""
+        with patch('medication_sku.views.MedicationSKUViewSet.get_queryset',
+                   return_value=MedicationSKU.objects.all()):
+            return self.client.get(MEDICATION_SKU_LIST_URL)
+
+    def test_analyzer_counts_shapes(self):
+        """Test the analyzer groups a query per object"""
+        with QueryAnalyzer() as analyzer:
+            for medication_sku in MedicationSKU.objects.all():
+                list(medication_sku.tags.all())
+
+        repeated = analyzer.repeated(threshold=5)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0].count, 10)
+        self.assertIn('core/tests/test_query_analysis.py',
+                      repeated[0].origin)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_repeated_queries_fail_tests(self):
+        """Test the test runner fails requests with N+1 queries"""
+        self.assertTrue(settings.QUERY_ANALYSIS['RAISE'])
+
+        with self.assertRaises(RepeatedQueriesError) as context:
+            self._list_without_prefetch()
+
+        self.assertIn('medication_sku/serializers.py',
+                      str(context.exception))
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_repeated_queries_logged(self):
+        """Test offenders are logged when not raising"""
+        query_analysis = {**settings.QUERY_ANALYSIS, 'RAISE': False}
+
+        with override_settings(QUERY_ANALYSIS=query_analysis), \
+                self.assertLogs('core.query_analysis', 'WARNING') as logs:
+            res = self._list_without_prefetch()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('repeated shapes', logs.output[0])
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_prefetched_list_passes(self):
+        """Test the list endpoint doesn't repeat queries"""
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+
+        self.assertEqual(res.status_code, 200)
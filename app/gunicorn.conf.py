@@ -0,0 +1,68 @@
+"""
+Gunicorn configuration of the production application server
+
+Every setting is read from the environment:
+
+- SERVER_WORKER_CLASS: `gthread` (default) serves app.wsgi with threaded
+  workers, `uvicorn` serves app.asgi with asyncio workers.
+- SERVER_WORKERS: worker processes, 2 * CPUs + 1 by default.
+- SERVER_THREADS: threads per gthread worker.
+- SERVER_KEEPALIVE, SERVER_TIMEOUT, SERVER_GRACEFUL_TIMEOUT: seconds.
+- SERVER_MAX_REQUESTS, SERVER_MAX_REQUESTS_JITTER: restart a worker after
+  that many requests, 0 (default) disables it. A restarted worker starts
+  with empty local caches and rebuilds the autocomplete index, only set it
+  to contain a memory leak.
+
+Workers start building the in-process autocomplete index of the
+medication SKU names as soon as they are ready, see post_worker_init().
+
+The per-worker metrics files of PERF_METRICS_DIR are removed when the
+server starts, see on_starting().
+
+Send SIGHUP to the master process to reload the configuration and replace
+the workers gracefully, in-flight requests are finished first.
+"""
+import multiprocessing
+import os
+
+WORKER_CLASSES = {
+    'gthread': ('gthread', 'app.wsgi:application'),
+    'uvicorn': ('uvicorn_worker.UvicornWorker', 'app.asgi:application'),
+}
+
+worker_class, wsgi_app = WORKER_CLASSES[
+    os.environ.get('SERVER_WORKER_CLASS', 'gthread')
+]
+
+bind = os.environ.get('SERVER_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('SERVER_WORKERS',
+                             multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('SERVER_THREADS', 4))
+keepalive = int(os.environ.get('SERVER_KEEPALIVE', 5))
+timeout = int(os.environ.get('SERVER_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+max_requests = int(os.environ.get('SERVER_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', 0))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Start the metrics of PERF_METRICS_DIR over, see core.instrumentation"""
+    directory = os.environ.get('PERF_METRICS_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for entry in os.scandir(directory):
+            if entry.name.endswith(('.json', '.tmp')):
+                os.remove(entry.path)
+
+
+def post_worker_init(worker):
+    """Warm the autocomplete index before the first keystroke"""
+    from django.conf import settings
+
+    from medication_sku.autocomplete import index
+
+    if settings.AUTOCOMPLETE_INDEX_ENABLED:
+        index.warm()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MedicationSkuConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'medication_sku'
+
+    def ready(self):
+        # keep validators and caches in sync with writes
+        from medication_sku import signals  # noqa: F401
@@ -0,0 +1,198 @@
+"""
+Async views for the read path of the medication SKU APIs
+
+Served through ASGI (app.asgi) these views don't hold a thread while
+waiting on the client or the database, so one process can keep many slow
+connections open. They answer like the list and retrieve actions of the
+viewsets, lists are paginated forward only with an opaque keyset cursor.
+"""
+import base64
+import binascii
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.views import View
+
+from rest_framework import exceptions
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku import serializers
+from medication_sku.filters import filter_medication_skus
+from medication_sku.pagination import keyset_condition
+from user.authentication import CachedTokenAuthentication
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise exceptions.NotFound('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise exceptions.NotFound('Invalid cursor')
+
+    return values
+
+
+class AsyncReadView(View):
+    """
+    Read only (GET/HEAD) async view authenticated and erroring like the
+    viewsets
+
+    Token resolution runs in a thread as it queries the database on LRU
+    misses, the rest of the request never blocks the event loop.
+    """
+    http_method_names = ['get', 'head', 'options']
+    authentication_classes = [CachedTokenAuthentication]
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method != 'OPTIONS':
+                await self.authenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self, request):
+        """Set request.user and request.auth or raise NotAuthenticated"""
+        for authentication_class in self.authentication_classes:
+            authenticator = authentication_class()
+            result = await sync_to_async(authenticator.authenticate)(request)
+            if result is not None:
+                request.user, request.auth = result
+                return
+
+        raise exceptions.NotAuthenticated()
+
+    def handle_exception(self, exc):
+        detail = exc.detail
+        if not isinstance(detail, (dict, list)):
+            detail = {'detail': detail}
+        response = JsonResponse(detail, status=exc.status_code, safe=False)
+        if isinstance(exc, (exceptions.NotAuthenticated,
+                            exceptions.AuthenticationFailed)):
+            response['WWW-Authenticate'] = 'Token'
+
+        return response
+
+
+class AsyncKeysetListView(AsyncReadView):
+    """
+    Async list of `queryset` paginated by the `ordering` fields, all
+    descending
+
+    The last field must be unique. A page is fetched with one
+    `WHERE (ordering) < cursor ORDER BY ordering LIMIT n + 1` query.
+    """
+    queryset = None
+    ordering = ['id']
+    serializer_class = None
+
+    def get_queryset(self):
+        """Return a fresh copy of `queryset`, like GenericAPIView"""
+        assert self.queryset is not None, (
+            f"'{self.__class__.__name__}' should either include a "
+            f"`queryset` attribute, or override the `get_queryset()` "
+            f"method."
+        )
+
+        return self.queryset.all()
+
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.GET['page_size'])
+        except (KeyError, ValueError):
+            return settings.PAGINATION_PAGE_SIZE
+        if page_size <= 0:
+            return settings.PAGINATION_PAGE_SIZE
+
+        return min(page_size, settings.PAGINATION_MAX_PAGE_SIZE)
+
+    def _after(self, queryset, values):
+        """Filter `queryset` on the rows after the cursor `values`"""
+        try:
+            # a decoded cursor is client input, check the types it holds
+            values = [queryset.model._meta.get_field(field).to_python(value)
+                      for field, value in zip(self.ordering, values)]
+            return queryset.filter(keyset_condition(
+                [f'-{field}' for field in self.ordering], values,
+            ))
+        except (DjangoValidationError, TypeError, ValueError):
+            raise exceptions.NotFound('Invalid cursor')
+
+    def _next_link(self, values):
+        params = self.request.GET.copy()
+        params['cursor'] = _encode_cursor(values)
+
+        return self.request.build_absolute_uri(
+            f'{self.request.path}?{params.urlencode()}'
+        )
+
+    async def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset().order_by(
+            *[f'-{field}' for field in self.ordering]
+        )
+        if 'cursor' in request.GET:
+            queryset = self._after(queryset, _decode_cursor(
+                request.GET['cursor'], len(self.ordering),
+            ))
+
+        page_size = self.get_page_size()
+        page = [obj async for obj in queryset[:page_size + 1]]
+        next_link = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_link = self._next_link(
+                [getattr(page[-1], field) for field in self.ordering]
+            )
+
+        return JsonResponse({
+            'next': next_link,
+            'previous': None,
+            'results': self.serializer_class(page, many=True).data,
+        })
+
+
+def _medication_skus_with_tags():
+    return MedicationSKU.objects.defer('search_vector').prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+    )
+
+
+class MedicationSKUListView(AsyncKeysetListView):
+    """Async medication SKU list, filtered like the viewset list"""
+    queryset = _medication_skus_with_tags()
+    serializer_class = serializers.MedicationSKUSerializer
+
+    def get_queryset(self):
+        return filter_medication_skus(super().get_queryset(),
+                                      self.request.GET)
+
+
+class MedicationSKUDetailView(AsyncReadView):
+    """Async medication SKU detail"""
+
+    async def get(self, request, pk):
+        try:
+            medication_sku = await _medication_skus_with_tags().aget(pk=pk)
+        except MedicationSKU.DoesNotExist:
+            raise exceptions.NotFound()
+
+        return JsonResponse(
+            serializers.MedicationSKUDetailSerializer(medication_sku).data
+        )
+
+
+class TagListView(AsyncKeysetListView):
+    """Async tag list, by descending name"""
+    queryset = Tag.objects.only('id', 'name')
+    ordering = ['name', 'id']
+    serializer_class = serializers.TagSerializer
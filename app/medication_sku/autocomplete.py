@@ -0,0 +1,218 @@
+"""
+In-process prefix index of the medication SKU names for typeahead
+
+Each process keeps the (upper-cased name, id) pairs of every SKU in a
+sorted list, the suggestions for a prefix are found by bisection in
+O(log n + k) without a query. The index is built in a background thread
+when a gunicorn worker starts (see gunicorn.conf.py) or on the first
+lookup, lookups are answered by a prefix query, served in name order by the
+index of migration core.0014 on PostgreSQL, until it is ready.
+
+The signal handlers apply the writes of this process once committed.
+Writes of other processes are only seen after the index is rebuilt, which
+happens in the background once it is older than
+settings.AUTOCOMPLETE_INDEX_MAX_AGE seconds.
+
+Every worker holds its own copy, about 300 bytes per SKU with 24
+character names: 300 MB per million SKUs per worker, twice that while a
+rebuild loads the next copy. Above settings.AUTOCOMPLETE_INDEX_MAX_SKUS
+the index isn't built and every lookup is such a query.
+"""
+import bisect
+import logging
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.functions import (Collate,
+                                        Upper)
+
+from core.models import MedicationSKU
+
+logger = logging.getLogger(__name__)
+
+# changes applied one by one, larger batches re-sort the whole index
+INSORT_BATCH_SIZE = 64
+# ids per name lookup of refresh()
+LOOKUP_BATCH_SIZE = 1000
+
+
+class PrefixIndex:
+    """Sorted (upper-cased name, id) pairs with their names by id"""
+
+    def __init__(self):
+        self.ready = False
+        self.building = False
+        # more SKUs than AUTOCOMPLETE_INDEX_MAX_SKUS at the last build
+        self.oversized = False
+        self.built_at = None
+        self._keys = []
+        self._names = {}
+        # changes committed while building, applied once built
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def warm(self):
+        """
+        Build the index in a background thread unless it's building, a
+        ready index keeps answering meanwhile
+        """
+        with self._lock:
+            if self.building:
+                return
+            self.building = True
+            self._pending = {}
+
+        threading.Thread(target=self._build_in_background, daemon=True,
+                         name='autocomplete-index').start()
+
+    def _build_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Building the autocomplete index failed')
+            with self._lock:
+                self.building = False
+        finally:
+            # the connections of this thread aren't closed by requests
+            connections.close_all()
+
+    def build(self):
+        """Load every SKU name, then apply the changes made meanwhile"""
+        with self._lock:
+            if not self.building:
+                self.building = True
+                self._pending = {}
+
+        size_limit = settings.AUTOCOMPLETE_INDEX_MAX_SKUS
+        if size_limit and MedicationSKU.objects.count() > size_limit:
+            logger.warning('More than %s SKUs, the autocomplete index is '
+                           'disabled until the next rebuild', size_limit)
+            with self._lock:
+                self._keys, self._names, self._pending = [], {}, {}
+                self.ready, self.building = False, False
+                self.oversized = True
+                self.built_at = time.monotonic()
+            return
+
+        names = dict(MedicationSKU.objects.values_list(
+            'id', 'medication_name',
+        ).iterator(chunk_size=10_000))
+        keys = sorted((name.upper(), sku_id)
+                      for sku_id, name in names.items())
+
+        with self._lock:
+            self._keys, self._names = keys, names
+            self._apply(self._pending)
+            self._pending = {}
+            self.ready, self.building = True, False
+            self.oversized = False
+            self.built_at = time.monotonic()
+
+    def apply(self, changes):
+        """Apply a {id: name} mapping of changes, None names are deletes"""
+        with self._lock:
+            if self.building:
+                self._pending.update(changes)
+            if self.ready:
+                self._apply(changes)
+
+    def _apply(self, changes):
+        if len(changes) > INSORT_BATCH_SIZE:
+            keys = [key for key in self._keys if key[1] not in changes]
+            for sku_id, name in changes.items():
+                self._names.pop(sku_id, None)
+                if name is not None:
+                    self._names[sku_id] = name
+                    keys.append((name.upper(), sku_id))
+            # the unchanged keys are sorted already, timsort merges them
+            keys.sort()
+            self._keys = keys
+            return
+
+        for sku_id, name in changes.items():
+            previous = self._names.pop(sku_id, None)
+            if previous is not None:
+                key = (previous.upper(), sku_id)
+                position = bisect.bisect_left(self._keys, key)
+                if position < len(self._keys) \
+                        and self._keys[position] == key:
+                    del self._keys[position]
+            if name is not None:
+                self._names[sku_id] = name
+                bisect.insort(self._keys, (name.upper(), sku_id))
+
+    def is_stale(self):
+        max_age = settings.AUTOCOMPLETE_INDEX_MAX_AGE
+        return bool(max_age) and time.monotonic() - self.built_at > max_age
+
+    def suggest(self, prefix, limit):
+        """
+        Return up to `limit` (id, name) pairs whose name starts with
+        `prefix`, case insensitive, ordered by name. None until built.
+        """
+        if not (self.ready or self.oversized) or self.is_stale():
+            self.warm()
+        if not self.ready:
+            return None
+
+        prefix = prefix.upper()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            keys = self._keys[position:position + limit]
+            return [(sku_id, self._names[sku_id])
+                    for key, sku_id in keys if key.startswith(prefix)]
+
+
+index = PrefixIndex()
+
+
+def refresh(ids):
+    """Apply the current names of the SKUs with `ids`, deleted or not"""
+    if not (index.ready or index.building):
+        return
+
+    ids = list(ids)
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + LOOKUP_BATCH_SIZE]
+        names = dict(MedicationSKU.objects.filter(id__in=batch).values_list(
+            'id', 'medication_name',
+        ))
+        index.apply({sku_id: names.get(sku_id) for sku_id in batch})
+
+
+def suggest(prefix, limit):
+    """Return up to `limit` (id, name) pairs of SKUs named `prefix`*"""
+    if settings.AUTOCOMPLETE_INDEX_ENABLED:
+        suggestions = index.suggest(prefix, limit)
+        if suggestions is not None:
+            return suggestions
+
+    queryset = MedicationSKU.objects.filter(
+        medication_name__istartswith=prefix,
+    )
+    if connections[queryset.db].vendor != 'postgresql':
+        return list(queryset.order_by(Upper('medication_name'), 'id')
+                    .values_list('id', 'medication_name')[:limit])
+
+    # the byte order range of the prefix, read in order from the
+    # (UPPER(medication_name) COLLATE "C", id) index of migration core.0014
+    queryset = queryset.alias(
+        name_key=Collate(Upper('medication_name'), 'C'),
+    )
+    start = prefix.upper()
+    # special case mappings ('ß' is 'SS') don't match the database's UPPER
+    if start and len(start) == len(prefix) \
+            and start[-1] < chr(sys.maxunicode):
+        queryset = queryset.filter(
+            name_key__gte=start,
+            name_key__lt=start[:-1] + chr(ord(start[-1]) + 1),
+        )
+
+    return list(queryset.order_by('name_key', 'id')
+                .values_list('id', 'medication_name')[:limit])
@@ -0,0 +1,208 @@
+"""
+Load benchmark of the medication SKU API
+
+`seed()` creates benchmark users (bench-<n>@example.com) with tokens, tags
+and SKUs from the synthetic generator. `run()` drives one scenario with
+`concurrency` threads, each with its own test client and database
+connection, through the full middleware stack. Every request is sampled
+by PerformanceMiddleware so its query count and database time are read
+back from the Server-Timing header.
+"""
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import (dataclass,
+                         field)
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from medication_sku import (bulk,
+                            synthetic)
+
+BENCH_EMAIL = 'bench-{}@example.com'
+BENCH_PREFIX = 'Bench '
+SCENARIOS = ['list', 'detail', 'tags', 'create', 'bulk_create']
+
+_DB_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+@dataclass
+class Catalog:
+    """Seeded benchmark data"""
+    tokens: list
+    sku_ids: list
+    tag_names: dict
+    next_number: int
+
+
+@dataclass
+class Result:
+    """Measurements of one request"""
+    latency: float
+    status: int
+    queries: int = None
+    db_time: float = None
+
+
+@dataclass
+class Scenario:
+    """Requests of a scenario and their measurements"""
+    name: str
+    elapsed: float = 0.0
+    results: list = field(default_factory=list)
+
+
+def remove():
+    """Delete the benchmark users, their SKUs and tags cascade"""
+    get_user_model().objects.filter(
+        email__startswith='bench-', email__endswith='@example.com',
+    ).delete()
+
+
+def seed(rng, users, skus_per_user, tags_per_user):
+    """Replace the benchmark users and their catalog"""
+    remove()
+    tokens, sku_ids, tag_names = [], [], {}
+    names = synthetic.tag_names(tags_per_user)
+    for index in range(users):
+        user = get_user_model().objects.create_user(
+            email=BENCH_EMAIL.format(index),
+        )
+        token = Token.objects.create(user=user)
+        created = bulk.create_medication_skus(user, synthetic.sku_items(
+            rng, skus_per_user, names, offset=index * skus_per_user,
+            prefix=BENCH_PREFIX,
+        ))
+        tokens.append(token.key)
+        tag_names[token.key] = names
+        sku_ids.extend(medication_sku.pk for medication_sku in created)
+
+    return Catalog(tokens=tokens, sku_ids=sku_ids, tag_names=tag_names,
+                   next_number=users * skus_per_user)
+
+
+def _request(scenario, rng, catalog, numbers, bulk_size):
+    """Return the token, method, url and payload of a scenario request"""
+    token = rng.choice(catalog.tokens)
+    if scenario == 'list':
+        return token, 'get', reverse('medication_sku:medication_skus-list'), \
+            None
+    if scenario == 'detail':
+        return token, 'get', reverse('medication_sku:medication_skus-detail',
+                                     args=[rng.choice(catalog.sku_ids)]), None
+    if scenario == 'tags':
+        return token, 'get', reverse('medication_sku:tag-list'), None
+    if scenario == 'create':
+        return token, 'post', reverse('medication_sku:medication_skus-list'), \
+            synthetic.sku_item(rng, next(numbers), catalog.tag_names[token],
+                               prefix=BENCH_PREFIX)
+    if scenario == 'bulk_create':
+        return token, 'post', reverse(
+            'medication_sku:medication_skus-bulk-create'
+        ), [synthetic.sku_item(rng, next(numbers), catalog.tag_names[token],
+                               prefix=BENCH_PREFIX)
+            for _ in range(bulk_size)]
+
+    raise ValueError(f'Unknown scenario {scenario}')
+
+
+def run(scenario, catalog, requests, concurrency, bulk_size=100, seed=0):
+    """Send `requests` requests of `scenario` from `concurrency` threads"""
+    result = Scenario(scenario)
+    sent = itertools.count()
+    # itertools.count is atomic in CPython, names stay unique
+    numbers = itertools.count(catalog.next_number)
+
+    def worker(index):
+        rng = random.Random(f'{seed}-{scenario}-{index}')
+        client = Client()
+        try:
+            while next(sent) < requests:
+                token, method, url, payload = _request(
+                    scenario, rng, catalog, numbers, bulk_size,
+                )
+                kwargs = {'headers': {'Authorization': f'Token {token}'}}
+                if payload is not None:
+                    kwargs.update(data=json.dumps(payload),
+                                  content_type='application/json')
+                started = time.perf_counter()
+                response = getattr(client, method)(url, **kwargs)
+                latency = time.perf_counter() - started
+
+                timing = _DB_TIMING.search(response.get('Server-Timing', ''))
+                result.results.append(Result(
+                    latency=latency,
+                    status=response.status_code,
+                    queries=timing and int(timing[2]),
+                    db_time=timing and float(timing[1]) / 1000,
+                ))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(index,))
+               for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.perf_counter() - started
+    # the catalog grows with the writes, later scenarios use new numbers
+    catalog.next_number = next(numbers)
+
+    return result
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank `fraction` percentile of sorted `values`"""
+    if not values:
+        return None
+
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def summarize(scenario):
+    """Return the JSON serializable report of a scenario"""
+    results = scenario.results
+    latencies = sorted(result.latency for result in results)
+    queries = [result.queries for result in results
+               if result.queries is not None]
+    db_times = sorted(result.db_time for result in results
+                      if result.db_time is not None)
+
+    return {
+        'requests': len(results),
+        'errors': sum(result.status >= 400 for result in results),
+        'elapsed_s': round(scenario.elapsed, 3),
+        'throughput_rps': round(len(results) / scenario.elapsed, 1)
+        if scenario.elapsed else None,
+        'latency_ms': {
+            'mean': _ms(sum(latencies) / len(latencies)
+                        if latencies else None),
+            'p50': _ms(percentile(latencies, 0.50)),
+            'p95': _ms(percentile(latencies, 0.95)),
+            'p99': _ms(percentile(latencies, 0.99)),
+            'max': _ms(latencies[-1] if latencies else None),
+        },
+        'queries_per_request': {
+            'mean': round(sum(queries) / len(queries), 2)
+            if queries else None,
+            'max': max(queries, default=None),
+        },
+        'db_ms': {
+            'p50': _ms(percentile(db_times, 0.50)),
+            'p95': _ms(percentile(db_times, 0.95)),
+        },
+    }
@@ -0,0 +1,397 @@
+"""
+Set-based helpers for bulk medication SKU ingestion
+
+Every helper works on whole batches so that the number of queries depends
+on the number of batches, not on the number of SKUs or tags in a payload.
+"""
+from itertools import islice
+
+from django.db import (IntegrityError,
+                       connection,
+                       transaction)
+from django.utils import timezone
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku.signals import medication_skus_changed
+
+# Rows per INSERT / IN (...) lookup, keeps us below the bind parameter
+# limits of every supported database backend.
+BATCH_SIZE = 1000
+
+# Columns overwritten when upserting an existing medication SKU
+UPSERT_FIELDS = ['presentation', 'dose', 'unit', 'updated_at']
+
+
+class OwnershipConflict(Exception):
+    """An upsert would have modified medication SKUs of another user"""
+
+    def __init__(self, names):
+        super().__init__(
+            f'Medication SKUs owned by another user: {", ".join(names)}'
+        )
+        self.names = names
+
+
+class NameConflict(Exception):
+    """Names validated as free were taken by a concurrent write"""
+
+    def __init__(self, names):
+        super().__init__(
+            f'Medication names already in use: {", ".join(names)}'
+        )
+        self.names = names
+
+
+class MissingMedicationSKUs(Exception):
+    """Some ids don't match medication SKUs of the user"""
+
+    def __init__(self, ids):
+        super().__init__(
+            f'Medication SKUs not found: {", ".join(map(str, ids))}'
+        )
+        self.ids = ids
+
+
+def chunked(iterable, size=BATCH_SIZE):
+    """Yield lists of at most `size` items from `iterable`"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def find_skus(names):
+    """Return a {medication_name: (id, user_id)} mapping of used `names`"""
+    skus = {}
+    for batch in chunked(set(names)):
+        for name, sku_id, owner_id in MedicationSKU.objects.filter(
+            medication_name__in=batch
+        ).values_list('medication_name', 'id', 'user_id'):
+            skus[name] = (sku_id, owner_id)
+
+    return skus
+
+
+def find_owners(names):
+    """Return a {medication_name: user_id} mapping of the `names` in use"""
+    return {name: owner_id
+            for name, (_, owner_id) in find_skus(names).items()}
+
+
+def name_conflicts(names, upsert_user=None):
+    """
+    Return one conflict per name of `names`, None when there is none.
+
+    'duplicate' means the name repeats an earlier one of `names` and
+    'exists' that a medication SKU already uses it. When upserting for
+    `upsert_user` that user's SKUs are no conflict but the SKUs of other
+    users are, reported as 'foreign'.
+    """
+    owners = find_owners(names)
+    seen = set()
+    conflicts = []
+    for name in names:
+        if name in seen:
+            conflicts.append('duplicate')
+        elif name not in owners:
+            conflicts.append(None)
+        elif upsert_user is None:
+            conflicts.append('exists')
+        elif owners[name] != upsert_user.pk:
+            conflicts.append('foreign')
+        else:
+            conflicts.append(None)
+        seen.add(name)
+
+    return conflicts
+
+
+def resolve_tags(user, names):
+    """
+    Return a {name: Tag} mapping of the user's tags with the given names,
+    creating the missing ones with a single bulk insert.
+    """
+    names = set(names)
+    tags = {}
+    for batch in chunked(names):
+        for tag in Tag.objects.filter(user=user, name__in=batch):
+            tags.setdefault(tag.name, tag)
+
+    missing = [Tag(user=user, name=name)
+               for name in sorted(names - tags.keys())]
+    if missing:
+        created = Tag.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # primary keys are not set on backends that can't return them
+            created = [
+                tag for batch in chunked(tag.name for tag in missing)
+                for tag in Tag.objects.filter(user=user, name__in=batch)
+            ]
+        for tag in created:
+            tags.setdefault(tag.name, tag)
+
+    return tags
+
+
+def assign_tags(user, skus_with_tags):
+    """
+    Attach tags to medication SKUs.
+
+    `skus_with_tags` is an iterable of (medication_sku, tags) pairs where
+    `tags` is a list of validated tag dicts. All distinct tag names are
+    resolved at once and the through-table rows are written in bulk.
+    """
+    skus_with_tags = list(skus_with_tags)
+    tags = resolve_tags(user, (
+        tag['name'] for _, sku_tags in skus_with_tags for tag in sku_tags
+    ))
+
+    through = MedicationSKU.tags.through
+    links = {}
+    for medication_sku, sku_tags in skus_with_tags:
+        for tag in sku_tags:
+            tag_id = tags[tag['name']].pk
+            links[(medication_sku.pk, tag_id)] = through(
+                medicationsku_id=medication_sku.pk,
+                tag_id=tag_id,
+            )
+
+    through.objects.bulk_create(
+        links.values(),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    medication_skus_changed.send(
+        sender=MedicationSKU,
+        ids=[medication_sku.pk for medication_sku, _ in skus_with_tags],
+    )
+
+
+def create_medication_skus(user, items):
+    """
+    Create medication SKUs with their tags from validated serializer data.
+
+    The SKUs and their tag links are written in one transaction. Returns
+    the created SKUs in payload order. When a concurrent write took one of
+    the names since they were validated, the transaction is rolled back
+    and NameConflict is raised with the taken names.
+    """
+    items = [dict(item) for item in items]
+    try:
+        with transaction.atomic():
+            skus_with_tags = []
+            for item in items:
+                item = dict(item)
+                tags = item.pop('tags', [])
+                skus_with_tags.append((MedicationSKU(**item, user=user),
+                                       tags))
+
+            created_skus = MedicationSKU.objects.bulk_create(
+                [medication_sku for medication_sku, _ in skus_with_tags],
+                batch_size=BATCH_SIZE,
+            )
+            if not connection.features.can_return_rows_from_bulk_insert:
+                ids = find_skus(sku.medication_name for sku in created_skus)
+                for medication_sku in created_skus:
+                    medication_sku.pk, _ = ids[medication_sku.medication_name]
+
+            assign_tags(user, skus_with_tags)
+
+            return created_skus
+    except IntegrityError:
+        names = [item['medication_name'] for item in items]
+        taken = [name for name, conflict in zip(names, name_conflicts(names))
+                 if conflict == 'exists']
+        if not taken:
+            raise
+        raise NameConflict(taken)
+
+
+def reconcile_tags(user, skus_with_tags):
+    """
+    Make the tags of existing medication SKUs match the requested ones.
+
+    `skus_with_tags` is an iterable of (medication_sku_id, tags) pairs.
+    Only the through-table rows that differ are deleted or inserted, each
+    in bulk. Returns the ids of the SKUs whose tags changed, the caller
+    sends medication_skus_changed for them with its other changes.
+    """
+    requested = dict(skus_with_tags)
+    tags = resolve_tags(user, (
+        tag['name'] for sku_tags in requested.values() for tag in sku_tags
+    ))
+    wanted = {
+        (sku_id, tags[tag['name']].pk)
+        for sku_id, sku_tags in requested.items() for tag in sku_tags
+    }
+
+    through = MedicationSKU.tags.through
+    current = {}
+    for batch in chunked(requested):
+        current.update(
+            ((sku_id, tag_id), link_id)
+            for link_id, sku_id, tag_id in through.objects.filter(
+                medicationsku_id__in=batch,
+            ).values_list('id', 'medicationsku_id', 'tag_id')
+        )
+
+    stale = {link_id: sku_id for (sku_id, tag_id), link_id in current.items()
+             if (sku_id, tag_id) not in wanted}
+    missing = [through(medicationsku_id=sku_id, tag_id=tag_id)
+               for sku_id, tag_id in wanted if (sku_id, tag_id) not in current]
+
+    for batch in chunked(stale):
+        through.objects.filter(id__in=batch).delete()
+    through.objects.bulk_create(missing, batch_size=BATCH_SIZE,
+                                ignore_conflicts=True)
+
+    changed = set(stale.values())
+    changed.update(link.medicationsku_id for link in missing)
+
+    return changed
+
+
+def upsert_medication_skus(user, items):
+    """
+    Create or update medication SKUs by `medication_name`.
+
+    Rows are written with INSERT ... ON CONFLICT (medication_name) DO
+    UPDATE, one statement per batch. Tags are reconciled for the rows that
+    contain a `tags` key. Names owned by other users must have been
+    rejected by validation, if a concurrent write makes one slip through
+    the upsert is rolled back and OwnershipConflict is raised.
+
+    Returns (id, created) pairs in payload order, `created` is False for
+    the SKUs that existed and were updated.
+    """
+    with transaction.atomic():
+        items = [dict(item) for item in items]
+        names = [item['medication_name'] for item in items]
+        owners = find_owners(names)
+        foreign = [name for name in names
+                   if owners.get(name, user.pk) != user.pk]
+        if foreign:
+            raise OwnershipConflict(foreign)
+
+        tags = {}
+        medication_skus = []
+        for item in items:
+            if 'tags' in item:
+                tags[item['medication_name']] = item.pop('tags')
+            medication_skus.append(MedicationSKU(**item, user=user))
+
+        MedicationSKU.objects.bulk_create(
+            medication_skus,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['medication_name'],
+            update_fields=UPSERT_FIELDS,
+        )
+
+        # primary keys aren't returned for upserts, a name could also have
+        # been taken by another user since we checked
+        ids = {}
+        for name, (sku_id, owner_id) in find_skus(names).items():
+            if owner_id != user.pk:
+                raise OwnershipConflict([name])
+            ids[name] = sku_id
+
+        reconcile_tags(user, [(ids[name], name_tags)
+                              for name, name_tags in tags.items()])
+        medication_skus_changed.send(sender=MedicationSKU,
+                                     ids=list(ids.values()))
+
+        return [(ids[name], name not in owners) for name in names]
+
+
+def _owned_medication_skus(user, ids):
+    """
+    Return a {id: MedicationSKU} mapping of the user's SKUs with `ids`,
+    locked for the transaction. Raises MissingMedicationSKUs when an id
+    doesn't exist or belongs to another user.
+    """
+    medication_skus = {}
+    for batch in chunked(ids):
+        medication_skus.update(MedicationSKU.objects.filter(
+            user=user, id__in=batch,
+        ).select_for_update().in_bulk())
+
+    missing = [sku_id for sku_id in ids if sku_id not in medication_skus]
+    if missing:
+        raise MissingMedicationSKUs(missing)
+
+    return medication_skus
+
+
+def update_medication_skus(user, items):
+    """
+    Apply partial updates to medication SKUs of the user.
+
+    Each item holds the `id` of the SKU and the validated fields to change.
+    Ownership is checked with one query per batch, the changed rows are
+    written with a single UPDATE per batch and tags are reconciled for the
+    items that contain a `tags` key. Nothing is written when an id is not
+    one of the user's SKUs.
+
+    Returns the ids of the updated SKUs in payload order.
+    """
+    with transaction.atomic():
+        items = [dict(item) for item in items]
+        ids = [item.pop('id') for item in items]
+        medication_skus = _owned_medication_skus(user, ids)
+
+        tags = {}
+        fields = set()
+        changed = set()
+        for sku_id, item in zip(ids, items):
+            if 'tags' in item:
+                tags[sku_id] = item.pop('tags')
+            medication_sku = medication_skus[sku_id]
+            for attr, value in item.items():
+                if getattr(medication_sku, attr) != value:
+                    setattr(medication_sku, attr, value)
+                    fields.add(attr)
+                    changed.add(sku_id)
+
+        changed.update(reconcile_tags(user, tags.items()))
+        if changed:
+            # bulk_update() doesn't run auto_now
+            now = timezone.now()
+            for sku_id in changed:
+                medication_skus[sku_id].updated_at = now
+            MedicationSKU.objects.bulk_update(
+                [medication_skus[sku_id] for sku_id in changed],
+                fields=sorted(fields) + ['updated_at'],
+                batch_size=BATCH_SIZE,
+            )
+            medication_skus_changed.send(sender=MedicationSKU,
+                                         ids=list(changed))
+
+        return ids
+
+
+def delete_medication_skus(user, ids):
+    """
+    Delete medication SKUs of the user with their tag links.
+
+    Each batch is removed with QuerySet.delete(): one SELECT of the SKUs
+    then one DELETE of their through-table rows and one of the SKUs. Its
+    post_delete signals drop them from the autocomplete index and the
+    response cache. Nothing is deleted when an id is not one of the user's
+    SKUs.
+
+    Returns the number of deleted SKUs.
+    """
+    with transaction.atomic():
+        ids = list(dict.fromkeys(ids))
+        _owned_medication_skus(user, ids)
+
+        deleted = 0
+        for batch in chunked(ids):
+            _, counts = MedicationSKU.objects.filter(id__in=batch).delete()
+            deleted += counts.get(MedicationSKU._meta.label, 0)
+
+        return deleted
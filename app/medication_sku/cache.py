@@ -0,0 +1,168 @@
+"""
+Read-through cache of the medication SKU API responses
+
+Serialized list and detail responses are stored in the `responses` cache
+(see CACHES in settings) under keys that embed a generation number. Any
+write to a SKU or a tag bumps the generation, which invalidates every
+cached response at once without having to enumerate keys.
+
+Responses read from a replica are never stored: a lagging replica would
+cache data older than the write that started the current generation, for
+every user including the writer.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from rest_framework.response import Response
+
+from core.routers import reads_replica
+
+CACHE_ALIAS = 'responses'
+GENERATION_KEY = 'medication_sku:generation'
+
+
+class ResponseCache:
+    """Generational response cache with hit/miss counters"""
+
+    def __init__(self, alias=CACHE_ALIAS):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self):
+        return settings.RESPONSE_CACHE_ENABLED
+
+    def generation(self):
+        """Return the current generation, starting a new one if unset"""
+        generation = self.cache.get(GENERATION_KEY)
+        if generation is None:
+            self.cache.add(GENERATION_KEY, 1, timeout=None)
+            generation = self.cache.get(GENERATION_KEY, 1)
+
+        return generation
+
+    def invalidate(self):
+        """Invalidate every cached response"""
+        try:
+            self.cache.incr(GENERATION_KEY)
+        except ValueError:
+            # not set yet (or evicted), nothing can be cached under it
+            self.cache.add(GENERATION_KEY, 1, timeout=None)
+
+    def key(self, kind, request):
+        """Return the cache key of a `kind` response to `request`"""
+        # links in the response are absolute, the host is part of the key
+        digest = hashlib.md5(
+            '|'.join([
+                request.build_absolute_uri(),
+                request.accepted_renderer.format,
+            ]).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+
+        return f'medication_sku:{self.generation()}:{kind}:{digest}'
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return entry
+
+    def set(self, key, entry):
+        self.cache.set(key, entry)
+
+    def stats(self):
+        """Return the hit/miss counters of this process"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+response_cache = ResponseCache()
+
+
+class CachedResponseMixin:
+    """
+    Serve list and retrieve responses from the response cache.
+
+    Meant to wrap the conditional GET mixins: cached entries keep the
+    ETag and Last-Modified of the response so a revalidation hit is
+    answered with a 304 without touching the database.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response('list', super().list,
+                                     request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response('retrieve', super().retrieve,
+                                     request, *args, **kwargs)
+
+    def _cached_response(self, kind, handler, request, *args, **kwargs):
+        if not response_cache.enabled:
+            return handler(request, *args, **kwargs)
+
+        key = response_cache.key(kind, request)
+        entry = response_cache.get(key)
+        if entry is not None:
+            response = self._response_from_entry(request, entry)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if (isinstance(response, Response) and response.status_code == 200
+                and not reads_replica()):
+            response_cache.set(key, {
+                'data': response.data,
+                'etag': response.get('ETag'),
+                'last_modified': response.get('Last-Modified'),
+            })
+        response['X-Cache'] = 'MISS'
+
+        return response
+
+    @staticmethod
+    def _response_from_entry(request, entry):
+        last_modified = entry['last_modified']
+        response = get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=last_modified and parse_http_date_safe(
+                last_modified
+            ),
+        )
+        if response is None:
+            response = Response(entry['data'])
+
+        if entry['etag']:
+            response['ETag'] = entry['etag']
+        if last_modified:
+            response['Last-Modified'] = last_modified
+
+        return response
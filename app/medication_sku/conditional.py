@@ -0,0 +1,143 @@
+"""
+Conditional GET support for the medication SKU APIs
+"""
+import hashlib
+
+from django.db.models import (Count,
+                              Max)
+from django.utils.cache import get_conditional_response
+from django.utils.http import (http_date,
+                               quote_etag)
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+def _etag(*parts):
+    """Return a quoted ETag built from `parts`"""
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in parts).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+
+    return quote_etag(digest)
+
+
+class ConditionalGetMixin:
+    """
+    Compute ETag and Last-Modified validators from `updated_at`.
+
+    Cursor paginated lists use the ids and `updated_at` of the rows of the
+    requested page, fetched by the page query without the other columns,
+    unpaginated ones max(updated_at) and count(*) of the filtered queryset.
+    Details use the object's own `updated_at`. When the client's copy is
+    still current a 304 is returned before anything is serialized.
+    """
+
+    def get_list_validators(self, queryset):
+        """Return the (etag, last_modified) of a list response"""
+        page = self._page_rows(queryset)
+        if page is None:
+            stats = queryset.order_by().aggregate(
+                count=Count('pk'),
+                last_modified=Max('updated_at'),
+            )
+            rows, last_modified = stats['count'], stats['last_modified']
+        else:
+            rows, links = page
+            last_modified = max((updated_at for _, updated_at in rows),
+                                default=None)
+            rows = [rows, links]
+
+        # page, page size and filters are all part of the full path
+        etag = _etag(
+            self.request.get_full_path(),
+            self.request.accepted_renderer.format,
+            rows,
+            last_modified and last_modified.isoformat(),
+        )
+
+        return etag, last_modified
+
+    def _page_rows(self, queryset):
+        """
+        Return the (id, updated_at) pairs of the rows of the requested page
+        and whether pages precede and follow it, None when the list isn't
+        cursor paginated
+        """
+        paginator = self.paginator
+        if not isinstance(paginator, CursorPagination):
+            return None
+
+        ordering = paginator.get_ordering(self.request, queryset, self)
+        fields = {'pk', 'updated_at', *(field.lstrip('-')
+                                        for field in ordering)}
+        page = paginator.paginate_queryset(
+            queryset.prefetch_related(None).values(*fields),
+            self.request, view=self,
+        )
+        if page is None:
+            return None
+
+        return ([(row['pk'], row['updated_at']) for row in page],
+                (paginator.has_previous, paginator.has_next))
+
+    def get_object_validators(self, instance):
+        """Return the (etag, last_modified) of a detail response"""
+        etag = _etag(
+            instance.pk,
+            self.request.accepted_renderer.format,
+            instance.updated_at.isoformat(),
+        )
+
+        return etag, instance.updated_at
+
+    def _conditional_response(self, etag, last_modified):
+        """Return a 304/412 response if a precondition applies"""
+        timestamp = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            self.request,
+            etag=etag,
+            last_modified=timestamp,
+        )
+        if response is not None:
+            self._set_validators(response, etag, last_modified)
+
+        return response
+
+    @staticmethod
+    def _set_validators(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+
+
+class ConditionalListMixin(ConditionalGetMixin):
+    """Conditional GET for list actions"""
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.get_list_validators(queryset)
+
+        response = self._conditional_response(etag, last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+            self._set_validators(response, etag, last_modified)
+
+        return response
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+    """Conditional GET for retrieve actions"""
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validators(instance)
+
+        response = self._conditional_response(etag, last_modified)
+        if response is None:
+            serializer = self.get_serializer(instance)
+            response = Response(serializer.data)
+            self._set_validators(response, etag, last_modified)
+
+        return response
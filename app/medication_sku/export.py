@@ -0,0 +1,103 @@
+"""
+Streaming export of the medication SKU catalog
+"""
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+
+from core.models import Tag
+
+# Rows fetched per round trip of the server-side cursor, the tags of
+# each chunk are prefetched with one extra query.
+CHUNK_SIZE = 2000
+# Rows rendered before handing a block of bytes to the server
+ROWS_PER_BLOCK = 500
+
+CSV_HEADER = ['id', 'medication_name', 'presentation', 'dose', 'unit',
+              'tags']
+CSV_TAG_SEPARATOR = '|'
+
+
+def iter_medication_skus(queryset):
+    """Iterate over `queryset` with a server-side cursor, tags included"""
+    return queryset.order_by('id').prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _blocks(lines):
+    """Group rendered lines into blocks to limit the number of writes"""
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) == ROWS_PER_BLOCK:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+def iter_ndjson(queryset):
+    """Yield the SKUs of `queryset` as newline delimited JSON"""
+    def lines():
+        for medication_sku in iter_medication_skus(queryset):
+            yield json.dumps({
+                'id': medication_sku.id,
+                'medication_name': medication_sku.medication_name,
+                'presentation': medication_sku.presentation,
+                'dose': medication_sku.dose,
+                'unit': medication_sku.unit,
+                'tags': [{'id': tag.id, 'name': tag.name}
+                         for tag in medication_sku.tags.all()],
+            }, separators=(',', ':')) + '\n'
+
+    return _blocks(lines())
+
+
+class _Echo:
+    """File-like object returning what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset):
+    """Yield the SKUs of `queryset` as CSV, tag names joined by '|'"""
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(CSV_HEADER)
+        for medication_sku in iter_medication_skus(queryset):
+            yield writer.writerow([
+                medication_sku.id,
+                medication_sku.medication_name,
+                medication_sku.presentation,
+                medication_sku.dose,
+                medication_sku.unit,
+                CSV_TAG_SEPARATOR.join(
+                    tag.name for tag in medication_sku.tags.all()
+                ),
+            ])
+
+    return _blocks(lines())
+
+
+async def aiter_blocks(blocks):
+    """
+    Iterate over the rendered `blocks` from the event loop of ASGI
+    servers, which would otherwise read a sync iterator into a list first.
+    Every block is rendered in the thread running the sync code so the
+    server-side cursor stays on its connection.
+    """
+    blocks = iter(blocks)
+    done = object()
+    while (block := await sync_to_async(next)(blocks, done)) is not done:
+        yield block
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', iter_ndjson),
+    'csv': ('text/csv', iter_csv),
+}
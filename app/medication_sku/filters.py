@@ -0,0 +1,113 @@
+"""
+Query parameter filtering for the medication SKU APIs
+"""
+from django.db.models import Count
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+
+from core.models import MedicationSKU
+
+MEDICATION_SKU_FILTER_PARAMETERS = [
+    OpenApiParameter('presentation', OpenApiTypes.STR,
+                     description='Exact presentation, e.g. Tablet'),
+    OpenApiParameter('unit', OpenApiTypes.STR,
+                     description='Exact unit, e.g. mg'),
+    OpenApiParameter('dose', OpenApiTypes.INT, description='Exact dose'),
+    OpenApiParameter('dose_min', OpenApiTypes.INT,
+                     description='Minimum dose (inclusive)'),
+    OpenApiParameter('dose_max', OpenApiTypes.INT,
+                     description='Maximum dose (inclusive)'),
+    OpenApiParameter('tags', OpenApiTypes.STR,
+                     description='Comma separated list of tag IDs'),
+    OpenApiParameter('tag_names', OpenApiTypes.STR,
+                     description='Comma separated list of tag names'),
+    OpenApiParameter('tags_match', OpenApiTypes.STR, enum=['any', 'all'],
+                     description='Match any (default) or all of the tags'),
+    OpenApiParameter('search', OpenApiTypes.STR,
+                     description='Substring of the medication name'),
+    OpenApiParameter('prefix', OpenApiTypes.STR,
+                     description='Prefix of the medication name'),
+]
+
+
+class CommaSeparatedField(serializers.ListField):
+    """List field parsed from a comma separated query parameter"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [data]
+        data = [item.strip()
+                for value in data for item in str(value).split(',')
+                if item.strip()]
+
+        return super().to_internal_value(data)
+
+
+class MedicationSKUFilterSerializer(serializers.Serializer):
+    """Validate the filter query parameters of the medication SKU list"""
+    presentation = serializers.CharField(required=False)
+    unit = serializers.CharField(required=False)
+    dose = serializers.IntegerField(required=False, min_value=0)
+    dose_min = serializers.IntegerField(required=False, min_value=0)
+    dose_max = serializers.IntegerField(required=False, min_value=0)
+    tags = CommaSeparatedField(child=serializers.IntegerField(),
+                               required=False)
+    tag_names = CommaSeparatedField(child=serializers.CharField(),
+                                    required=False)
+    tags_match = serializers.ChoiceField(choices=['any', 'all'],
+                                         default='any')
+    search = serializers.CharField(required=False)
+    prefix = serializers.CharField(required=False)
+
+
+def _tagged_sku_ids(tag_filter, values, match):
+    """
+    Return a subquery of the ids of medication SKUs tagged with any or
+    all of `values`, looked up through the M2M table only.
+    """
+    through = MedicationSKU.tags.through.objects.filter(
+        **{f'{tag_filter}__in': values}
+    ).values('medicationsku_id')
+
+    if match == 'all':
+        through = through.annotate(
+            matched=Count(tag_filter, distinct=True),
+        ).filter(matched=len(set(values)))
+
+    return through.values('medicationsku_id')
+
+
+def filter_medication_skus(queryset, query_params):
+    """Apply the filters given in `query_params` to `queryset`"""
+    serializer = MedicationSKUFilterSerializer(data=query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+
+    for field in ('presentation', 'unit', 'dose'):
+        if field in params:
+            queryset = queryset.filter(**{field: params[field]})
+    if 'dose_min' in params:
+        queryset = queryset.filter(dose__gte=params['dose_min'])
+    if 'dose_max' in params:
+        queryset = queryset.filter(dose__lte=params['dose_max'])
+
+    if params.get('tags'):
+        queryset = queryset.filter(id__in=_tagged_sku_ids(
+            'tag_id', params['tags'], params['tags_match']
+        ))
+    if params.get('tag_names'):
+        queryset = queryset.filter(id__in=_tagged_sku_ids(
+            'tag__name', params['tag_names'], params['tags_match']
+        ))
+
+    # served by the upper-cased name indexes of migration core.0007
+    if 'search' in params:
+        queryset = queryset.filter(medication_name__icontains=params['search'])
+    if 'prefix' in params:
+        queryset = queryset.filter(
+            medication_name__istartswith=params['prefix']
+        )
+
+    return queryset
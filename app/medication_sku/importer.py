@@ -0,0 +1,387 @@
+"""
+Streaming import of medication SKUs from NDJSON or CSV
+"""
+import codecs
+import csv
+import json
+
+from django.db import (DEFAULT_DB_ALIAS,
+                       IntegrityError,
+                       connections,
+                       transaction)
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku import (bulk,
+                            pgcopy)
+from medication_sku.export import CSV_TAG_SEPARATOR
+from medication_sku.serializers import (CONFLICT_ERRORS,
+                                        MedicationSKUBulkSerializer)
+from medication_sku.signals import medication_skus_loaded
+
+# Only the first errors are reported, a broken feed shouldn't produce a
+# report as large as the feed itself.
+MAX_REPORTED_ERRORS = 1000
+
+
+def parse_ndjson(lines):
+    """
+    Yield (line number, row, error) for every non blank line of
+    newline delimited JSON.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError as exc:
+            yield line_number, None, f'Invalid JSON: {exc}'
+
+
+def parse_csv(lines):
+    """
+    Yield (line number, row, error) for every record of a CSV file with
+    a header line, tag names are separated by '|' in the `tags` column.
+    """
+    reader = csv.DictReader(lines)
+    for record in reader:
+        tags = record.pop('tags', None) or ''
+        record['tags'] = [{'name': name.strip()}
+                          for name in tags.split(CSV_TAG_SEPARATOR)
+                          if name.strip()]
+        yield reader.line_num, record, None
+
+
+PARSERS = {
+    'ndjson': parse_ndjson,
+    'csv': parse_csv,
+}
+
+
+def parse(stream, import_format):
+    """Parse a binary stream of UTF-8 lines in `import_format`"""
+    return PARSERS[import_format](codecs.iterdecode(stream, 'utf-8'))
+
+
+class ImportReport:
+    """Created/updated/failed counts and per-row errors of an import"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_success(self, line, sku_id, created):
+        if created:
+            self.created += 1
+        else:
+            self.updated += 1
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+class ItemReport(ImportReport):
+    """
+    Import report with the status of every item
+
+    `line` is the index of the item in the payload. Meant for request
+    payloads, which are in memory anyway, so nothing is truncated.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.results = []
+
+    def add_success(self, line, sku_id, created):
+        super().add_success(line, sku_id, created)
+        self.results.append({
+            'index': line,
+            'status': 'created' if created else 'updated',
+            'id': sku_id,
+        })
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        self.results.append({
+            'index': line,
+            'status': 'failed',
+            'errors': errors,
+        })
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'results': sorted(self.results,
+                              key=lambda result: result['index']),
+        }
+
+
+def import_medication_skus(user, rows, chunk_size=bulk.BATCH_SIZE,
+                           report=None, upsert=False):
+    """
+    Validate and insert parsed `rows` chunk by chunk.
+
+    Each chunk is inserted in its own transaction so memory is bounded by
+    `chunk_size`. Invalid rows are reported and skipped, the valid rows of
+    their chunk are still inserted. With `upsert` existing SKUs of `user`
+    are updated instead of being rejected.
+    """
+    report = report or ImportReport()
+    serializer = MedicationSKUBulkSerializer()
+    for chunk in bulk.chunked(rows, chunk_size):
+        _import_chunk(user, chunk, serializer, report, upsert)
+
+    return report
+
+
+def validate(rows, report, serializer=None):
+    """Yield (line, item) for the valid `rows`, report the invalid ones"""
+    serializer = serializer or MedicationSKUBulkSerializer()
+    for line, row, error in rows:
+        if error is not None:
+            report.add_error(line, {'non_field_errors': [error]})
+            continue
+        try:
+            yield line, serializer.run_validation(row)
+        except ValidationError as exc:
+            report.add_error(line, exc.detail)
+
+
+def _import_chunk(user, chunk, serializer, report, upsert):
+    valid = list(validate(chunk, report, serializer))
+    conflicts = bulk.name_conflicts(
+        [item['medication_name'] for _, item in valid],
+        upsert_user=user if upsert else None,
+    )
+    items = []
+    for (line, item), conflict in zip(valid, conflicts):
+        if conflict:
+            report.add_error(line,
+                             {'medication_name': [CONFLICT_ERRORS[conflict]]})
+        else:
+            items.append((line, item))
+
+    if not items:
+        return
+
+    # both helpers write the chunk in one transaction
+    try:
+        if upsert:
+            results = bulk.upsert_medication_skus(
+                user, [item for _, item in items]
+            )
+        else:
+            created_skus = bulk.create_medication_skus(
+                user, [item for _, item in items]
+            )
+            results = [(medication_sku.pk, True)
+                       for medication_sku in created_skus]
+    except (IntegrityError, bulk.NameConflict,
+            bulk.OwnershipConflict) as exc:
+        # a concurrent write took one of the names, the chunk is rolled back
+        for line, _ in items:
+            report.add_error(line, {'non_field_errors': [str(exc)]})
+    else:
+        for (line, _), (sku_id, created) in zip(items, results):
+            report.add_success(line, sku_id, created)
+
+
+# Temporary tables of copy_import_medication_skus(), dropped on commit
+STAGING_TABLE = 'medication_sku_import'
+LINKS_TABLE = 'medication_sku_import_links'
+STAGING_COLUMNS = ['line', 'medication_name', 'presentation', 'dose', 'unit',
+                   'has_tags', 'tags']
+STAGING_TYPES = ['int4', 'text', 'text', 'int8', 'text', 'bool', 'text[]']
+
+
+def _staging_rows(rows, report):
+    """Yield the staging table rows of the valid `rows`"""
+    for line, item in validate(rows, report):
+        tags = item.get('tags')
+        yield (line, item['medication_name'], item['presentation'],
+               item['dose'], item['unit'], tags is not None,
+               [tag['name'] for tag in tags or []])
+
+
+def _reject(cursor, report, sql, params, conflict):
+    """Delete the staged rows selected by `sql`, reporting `conflict`"""
+    cursor.execute(sql, params)
+    for line in sorted(line for line, in cursor.fetchall()):
+        report.add_error(line,
+                         {'medication_name': [CONFLICT_ERRORS[conflict]]})
+
+
+def copy_import_medication_skus(user, rows, report=None, upsert=False,
+                                using=DEFAULT_DB_ALIAS):
+    """
+    Import parsed `rows` through a staging table loaded with COPY.
+
+    Meant for full catalog reloads on PostgreSQL. Rows are validated in a
+    streaming pass and copied into a temporary table as they go, then
+    duplicates and names in use are rejected and the SKUs, tags and tag
+    links are merged with set-based statements, the search vectors of the
+    imported SKUs are computed by one UPDATE. Everything runs in one
+    transaction, with the SKU table locked against concurrent writes
+    during the merge. Falls back to import_medication_skus() on other
+    databases.
+    """
+    report = report or ImportReport()
+    if not pgcopy.supported(using):
+        return import_medication_skus(user, rows, report=report,
+                                      upsert=upsert)
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    tables = {
+        'staging': quote(STAGING_TABLE),
+        'links': quote(LINKS_TABLE),
+        'sku': quote(MedicationSKU._meta.db_table),
+        'tag': quote(Tag._meta.db_table),
+        'through': quote(MedicationSKU.tags.through._meta.db_table),
+    }
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE {staging} ('
+                ' line integer PRIMARY KEY,'
+                ' medication_name varchar(255) NOT NULL,'
+                ' presentation varchar(255) NOT NULL,'
+                ' dose bigint NOT NULL,'
+                ' unit varchar(50) NOT NULL,'
+                ' has_tags boolean NOT NULL,'
+                ' tags text[] NOT NULL,'
+                ' sku_id bigint,'
+                ' owner_id bigint,'
+                ' created boolean NOT NULL DEFAULT false'
+                ') ON COMMIT DROP'.format(**tables)
+            )
+            pgcopy.copy_rows(STAGING_TABLE, STAGING_COLUMNS,
+                             _staging_rows(rows, report),
+                             types=STAGING_TYPES, using=using)
+            # temporary tables are never analyzed automatically
+            cursor.execute('ANALYZE {staging}'.format(**tables))
+
+            _reject(cursor, report,
+                    'DELETE FROM {staging} s USING ('
+                    ' SELECT line, row_number() OVER ('
+                    '  PARTITION BY medication_name ORDER BY line'
+                    ' ) AS position FROM {staging}'
+                    ') d WHERE s.line = d.line AND d.position > 1 '
+                    'RETURNING s.line'.format(**tables), [], 'duplicate')
+
+            # names can't be taken or released until we commit
+            cursor.execute('LOCK TABLE {sku} IN SHARE ROW EXCLUSIVE MODE'
+                           .format(**tables))
+            cursor.execute(
+                'UPDATE {staging} s SET sku_id = m.id, owner_id = m.user_id '
+                'FROM {sku} m WHERE m.medication_name = s.medication_name'
+                .format(**tables)
+            )
+            if upsert:
+                _reject(cursor, report,
+                        'DELETE FROM {staging} WHERE owner_id <> %s '
+                        'RETURNING line'.format(**tables), [user.pk],
+                        'foreign')
+                cursor.execute(
+                    'UPDATE {sku} m SET presentation = s.presentation,'
+                    ' dose = s.dose, unit = s.unit, updated_at = %s '
+                    'FROM {staging} s WHERE m.id = s.sku_id'
+                    .format(**tables), [now],
+                )
+            else:
+                _reject(cursor, report,
+                        'DELETE FROM {staging} WHERE sku_id IS NOT NULL '
+                        'RETURNING line'.format(**tables), [], 'exists')
+
+            cursor.execute(
+                'WITH inserted AS ('
+                ' INSERT INTO {sku} (user_id, medication_name, presentation,'
+                '  dose, unit, updated_at)'
+                ' SELECT %s, medication_name, presentation, dose, unit, %s'
+                ' FROM {staging} WHERE sku_id IS NULL ORDER BY line'
+                ' RETURNING id, medication_name'
+                ') '
+                'UPDATE {staging} s SET sku_id = i.id, created = true '
+                'FROM inserted i WHERE s.medication_name = i.medication_name'
+                .format(**tables), [user.pk, now],
+            )
+
+            cursor.execute(
+                'INSERT INTO {tag} (user_id, name, updated_at) '
+                'SELECT DISTINCT %s, n.name, %s '
+                'FROM {staging} s CROSS JOIN unnest(s.tags) AS n(name) '
+                'WHERE NOT EXISTS ('
+                ' SELECT 1 FROM {tag} t WHERE t.user_id = %s'
+                ' AND t.name = n.name'
+                ')'.format(**tables), [user.pk, now, user.pk],
+            )
+            cursor.execute(
+                'CREATE TEMPORARY TABLE {links} ('
+                ' sku_id bigint NOT NULL,'
+                ' tag_id bigint NOT NULL'
+                ') ON COMMIT DROP'.format(**tables)
+            )
+            # like resolve_tags(), the first of same-named tags is used
+            cursor.execute(
+                'INSERT INTO {links} (sku_id, tag_id) '
+                'SELECT DISTINCT s.sku_id, t.id '
+                'FROM {staging} s CROSS JOIN unnest(s.tags) AS n(name) '
+                'JOIN ('
+                ' SELECT name, min(id) AS id FROM {tag} WHERE user_id = %s'
+                ' GROUP BY name'
+                ') t ON t.name = n.name'.format(**tables), [user.pk],
+            )
+            if upsert:
+                cursor.execute(
+                    'DELETE FROM {through} l USING {staging} s '
+                    'WHERE l.medicationsku_id = s.sku_id AND s.has_tags '
+                    'AND NOT s.created AND NOT EXISTS ('
+                    ' SELECT 1 FROM {links} w'
+                    ' WHERE w.sku_id = l.medicationsku_id'
+                    ' AND w.tag_id = l.tag_id'
+                    ')'.format(**tables)
+                )
+            cursor.execute(
+                'INSERT INTO {through} (medicationsku_id, tag_id) '
+                'SELECT sku_id, tag_id FROM {links} ON CONFLICT DO NOTHING'
+                .format(**tables)
+            )
+
+        medication_skus_loaded.send(
+            sender=MedicationSKU,
+            queryset=MedicationSKU.objects.using(using).filter(id__in=RawSQL(
+                'SELECT sku_id FROM {staging}'.format(**tables), [],
+            )),
+        )
+
+        with connection.chunked_cursor() as cursor:
+            cursor.execute('SELECT line, sku_id, created FROM {staging} '
+                           'ORDER BY line'.format(**tables))
+            while True:
+                results = cursor.fetchmany(bulk.BATCH_SIZE * 10)
+                if not results:
+                    break
+                for line, sku_id, created in results:
+                    report.add_success(line, sku_id, created)
+
+    return report
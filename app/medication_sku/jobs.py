@@ -0,0 +1,144 @@
+"""
+Database backed queue running large bulk writes in the background
+
+Bulk endpoints stream the rows of a request into the BulkJobChunks of a
+BulkJob and answer right away, `manage.py process_bulk_jobs` workers claim
+the queued jobs and import them chunk by chunk. Only one chunk of rows is
+in memory at a time on either side. Several workers can run in parallel,
+a job is claimed with SELECT ... FOR UPDATE SKIP LOCKED so each one runs
+once. Workers record a heartbeat after every chunk, the job of a worker
+that crashed or was stopped is taken back by another one once its lease
+has expired.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import (BulkJob,
+                         BulkJobChunk)
+from medication_sku import (bulk,
+                            importer)
+
+
+def enqueue(user, rows, upsert=False, chunk_size=bulk.BATCH_SIZE):
+    """
+    Queue the parsed (line, row, error) `rows` for import by `user`, one
+    chunk of `chunk_size` rows at a time. The job is only visible to the
+    workers once every chunk is stored, errors raised by `rows` cancel it.
+    """
+    with transaction.atomic():
+        job = BulkJob.objects.create(user=user, upsert=upsert)
+        for index, chunk in enumerate(bulk.chunked(rows, chunk_size)):
+            BulkJobChunk.objects.create(
+                job=job,
+                index=index,
+                rows=[[line, row, error] for line, row, error in chunk],
+            )
+            job.total += len(chunk)
+        job.save(update_fields=['total'])
+
+    return job
+
+
+def claim_job():
+    """
+    Mark the oldest queued job as running and return it, None when the
+    queue is empty. Jobs locked by other workers are skipped, running jobs
+    whose worker missed its heartbeat for BULK_JOB_LEASE_SECONDS are
+    taken back and resumed.
+    """
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.BULK_JOB_LEASE_SECONDS)
+    with transaction.atomic():
+        job = BulkJob.objects.select_for_update(
+            skip_locked=True,
+        ).filter(
+            Q(status=BulkJob.QUEUED)
+            | Q(status=BulkJob.RUNNING, heartbeat_at__lt=expired)
+        ).order_by('created_at', 'id').first()
+        if job is None:
+            return None
+
+        job.status = BulkJob.RUNNING
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+
+        return job
+
+
+def _report(job):
+    """Return an import report resuming the progress stored on `job`"""
+    report = importer.ImportReport()
+    report.created = job.created
+    report.updated = job.updated
+    report.failed = job.failed
+    report.errors = job.errors
+
+    return report
+
+
+def _save_progress(job, report, processed, **fields):
+    """Store the counts and errors of `report` on the job"""
+    report = report.as_dict()
+    BulkJob.objects.filter(pk=job.pk).update(
+        processed=processed,
+        created=report['created'],
+        updated=report['updated'],
+        failed=report['failed'],
+        errors=report['errors'],
+        **fields,
+    )
+
+
+def _run_chunk(job, chunk_id, chunk_size):
+    """
+    Import a stored chunk, drop it and record the progress and heartbeat
+    in one transaction. The job row stays locked meanwhile so a worker
+    taking the job back waits, then skips the chunk.
+    """
+    with transaction.atomic():
+        job = BulkJob.objects.select_for_update().get(pk=job.pk)
+        chunk = BulkJobChunk.objects.filter(pk=chunk_id).first()
+        if job.status != BulkJob.RUNNING or chunk is None:
+            return
+
+        report = _report(job)
+        importer.import_medication_skus(job.user, chunk.rows,
+                                        chunk_size=chunk_size,
+                                        report=report,
+                                        upsert=job.upsert)
+        chunk.delete()
+        _save_progress(job, report, job.processed + len(chunk.rows),
+                       heartbeat_at=timezone.now())
+
+
+def run_job(job, chunk_size=bulk.BATCH_SIZE):
+    """
+    Import the remaining chunks of a claimed job one at a time. Each
+    stored chunk is imported and recorded in one transaction, its rows
+    validated and inserted `chunk_size` at a time, so a job taken back
+    from a dead worker resumes after the last recorded chunk. The job
+    fails when an unexpected error interrupts the import, the chunks are
+    dropped once the job is finished.
+    """
+    chunk_ids = list(job.chunks.order_by('index').values_list('id',
+                                                              flat=True))
+    finished = BulkJob.objects.filter(pk=job.pk, status=BulkJob.RUNNING)
+    try:
+        for chunk_id in chunk_ids:
+            _run_chunk(job, chunk_id, chunk_size)
+    except Exception as exc:
+        finished.update(status=BulkJob.FAILED, detail=str(exc),
+                        finished_at=timezone.now())
+    else:
+        finished.update(status=BulkJob.SUCCEEDED,
+                        finished_at=timezone.now())
+    job.chunks.all().delete()
+
+    job.refresh_from_db()
+
+    return job
@@ -0,0 +1,144 @@
+"""
+Pagination for the medication SKU APIs
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (CursorPagination,
+                                       PageNumberPagination)
+
+
+def _reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}'
+                 for field in ordering)
+
+
+def keyset_condition(ordering, values):
+    """
+    Return the condition of the rows following `values` of the `ordering`
+    fields ('-name' descending, 'name' ascending)
+
+    The bound on the first field is repeated outside of the OR so that an
+    index on it starts the scan at the cursor.
+    """
+    fields = [field.lstrip('-') for field in ordering]
+    lookups = ['lt' if field.startswith('-') else 'gt' for field in ordering]
+
+    condition = Q()
+    for index, (field, lookup) in enumerate(zip(fields, lookups)):
+        condition |= Q(**dict(zip(fields[:index], values)),
+                       **{f'{field}__{lookup}': values[index]})
+
+    return Q(**{f'{fields[0]}__{lookups[0]}e': values[0]}) & condition
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination with a client selectable page size.
+
+    Pages are fetched with `WHERE key < last_seen ORDER BY key LIMIT n`
+    so deep pages cost the same as the first one. When the `ordering` has
+    several fields, the last one unique, the cursor holds all of them so
+    rows sharing the first field are paged without an OFFSET.
+    """
+    page_size = settings.PAGINATION_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if len(self.get_ordering(request, queryset, view)) == 1:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor and self.cursor.position
+
+        ordering = _reverse_ordering(self.ordering) if reverse \
+            else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(keyset_condition(
+                ordering, self._decode_position(queryset, position),
+            ))
+
+        # positions are unique, links never need an offset
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering,
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = following_position is not None
+            self.next_position = position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = position is not None
+            self.next_position = following_position
+            self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+
+        return json.dumps([
+            str(instance[field] if isinstance(instance, dict)
+                else getattr(instance, field))
+            for field in (field.lstrip('-') for field in ordering)
+        ])
+
+    def _decode_position(self, queryset, position):
+        """Return the values of a position, checked by their fields"""
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) \
+                    or len(values) != len(self.ordering):
+                raise ValueError(position)
+            return [
+                queryset.model._meta.get_field(field.lstrip('-')).to_python(
+                    value
+                )
+                for field, value in zip(self.ordering, values)
+            ]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class MedicationSKUPagination(KeysetPagination):
+    """Paginate medication SKUs by descending id"""
+    ordering = '-id'
+
+
+class TagPagination(KeysetPagination):
+    """Paginate tags by descending name, names aren't unique"""
+    ordering = ('-name', '-id')
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Paginate search results by page number, ranks can't be a cursor.
+    Relevant results are on the first pages, deep pages are rare.
+    """
+    page_size = settings.PAGINATION_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
@@ -0,0 +1,44 @@
+"""
+COPY based bulk loading for PostgreSQL
+
+COPY FROM STDIN streams the rows in a single statement without a bind
+parameter per value, which loads an order of magnitude more rows per
+second than multi-row INSERTs. Primary keys are reserved from the table's
+sequence beforehand so that the through-table rows can be copied too.
+"""
+from django.db import (DEFAULT_DB_ALIAS,
+                       connections)
+
+
+def supported(using=DEFAULT_DB_ALIAS):
+    """Return whether the database of `using` supports COPY FROM STDIN"""
+    return connections[using].vendor == 'postgresql'
+
+
+def reserve_ids(model, count, using=DEFAULT_DB_ALIAS):
+    """Return `count` new primary keys from the sequence of `model`"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+            'FROM generate_series(1, %s)',
+            [model._meta.db_table, model._meta.pk.column, count],
+        )
+        return [sku_id for sku_id, in cursor.fetchall()]
+
+
+def copy_rows(table, columns, rows, types=None, using=DEFAULT_DB_ALIAS):
+    """
+    Stream the `rows` tuples into `columns` of `table`, as the PostgreSQL
+    `types` of the columns when given
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        with cursor.copy(
+            f'COPY {quote(table)} ({", ".join(map(quote, columns))}) '
+            'FROM STDIN'
+        ) as copy:
+            if types:
+                copy.set_types(types)
+            for row in rows:
+                copy.write_row(row)
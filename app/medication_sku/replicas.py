@@ -0,0 +1,37 @@
+"""
+Read replica routing of the medication SKU APIs
+"""
+from rest_framework import permissions
+
+from core.routers import (is_sticky,
+                          mark_sticky,
+                          replica_reads)
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests from a read replica (see core.routers).
+
+    Authentication still reads the primary. Users whose last write is
+    more recent than REPLICA_STICKY_SECONDS read the primary as well, a
+    successful write request marks its user as such.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in permissions.SAFE_METHODS
+                and not is_sticky(request.user)):
+            self._replica_reads = replica_reads()
+            self._replica_reads.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        replica_reads = getattr(self, '_replica_reads', None)
+        if replica_reads is not None:
+            self._replica_reads = None
+            replica_reads.__exit__(None, None, None)
+        elif (response.status_code < 400
+              and request.method not in permissions.SAFE_METHODS
+              and request.user.is_authenticated):
+            mark_sticky(request.user)
+
+        return super().finalize_response(request, response, *args, **kwargs)
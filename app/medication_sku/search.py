@@ -0,0 +1,91 @@
+"""
+Ranked full-text search of medication SKUs
+
+On PostgreSQL every SKU stores a `search_vector` of its name (weight A),
+presentation (B) and tag names (C), GIN indexed by migration core.0010 and
+recomputed by the signal handlers whenever the SKU or its tags change.
+Every word of a query matches as a prefix of the vector's words, the name
+also matches by trigram word similarity to tolerate misspellings, served
+by the trigram index of migration core.0007. Results are ranked by both.
+
+Other databases fall back to an unranked substring match.
+"""
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery,
+                                            SearchRank,
+                                            SearchVector,
+                                            TrigramWordSimilarity)
+from django.db import (DEFAULT_DB_ALIAS,
+                       connections)
+from django.db.models import (F,
+                              OuterRef,
+                              Q,
+                              Subquery)
+from django.db.models.functions import Upper
+
+from core.models import Tag
+
+# no stemming, drug names aren't words of any language
+SEARCH_CONFIG = 'simple'
+SEARCH_MIN_LENGTH = 2
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def enabled(using=DEFAULT_DB_ALIAS):
+    """Return whether the database of `using` has the search vectors"""
+    return connections[using].vendor == 'postgresql'
+
+
+def search_vector(exclude_tag=None):
+    """
+    Return the search vector expression of a SKU, without `exclude_tag`
+    when given, a tag that is about to be deleted
+    """
+    tags = Tag.objects.filter(medicationsku=OuterRef('pk'))
+    if exclude_tag is not None:
+        tags = tags.exclude(pk=exclude_tag.pk)
+    tag_names = tags.values('medicationsku').annotate(
+        names=StringAgg('name', ' '),
+    ).values('names')
+
+    return (
+        SearchVector('medication_name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('presentation', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(tag_names), weight='C',
+                       config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """Recompute the search vectors of the SKUs in `queryset`"""
+    if enabled(queryset.db):
+        queryset.update(search_vector=search_vector())
+
+
+def search_medication_skus(queryset, text):
+    """Return the SKUs of `queryset` matching `text`, best first"""
+    if not enabled(queryset.db):
+        return queryset.filter(
+            Q(medication_name__icontains=text)
+            | Q(presentation__icontains=text)
+            | Q(tags__name__icontains=text)
+        ).distinct().order_by('medication_name', 'id')
+
+    words = _WORD.findall(text.lower())
+    if not words:
+        return queryset.none()
+
+    query = SearchQuery(' & '.join(f'{word}:*' for word in words),
+                        config=SEARCH_CONFIG, search_type='raw')
+    return queryset.annotate(
+        # the expression of the trigram index
+        upper_name=Upper('medication_name'),
+    ).filter(
+        Q(search_vector=query) | Q(upper_name__trigram_word_similar=text)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query)
+        + TrigramWordSimilarity(text, 'upper_name'),
+    ).order_by('-rank', 'id')
@@ -3,10 +3,30 @@ Serializers for medication SKU APIs
 """
 from rest_framework import serializers
 
-from core.models import MedicationSKU, Tag
+from core.instrumentation import timed_serialization
+from core.models import BulkJob, MedicationSKU, Tag
+from medication_sku import bulk
+from medication_sku.signals import medication_skus_changed
 
+UNIQUE_ERROR = 'This field must be unique.'
+OWNED_ERROR = 'This medication SKU belongs to another user.'
+# error message of each bulk.name_conflicts() conflict
+CONFLICT_ERRORS = {
+    'duplicate': UNIQUE_ERROR,
+    'exists': UNIQUE_ERROR,
+    'foreign': OWNED_ERROR,
+}
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TimedSerializerMixin:
+    """Report the serialization time of sampled requests"""
+
+    @timed_serialization
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Tag object"""
 
     class Meta:
@@ -15,7 +35,8 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class MedicationSKUSerializer(serializers.ModelSerializer):
+class MedicationSKUSerializer(TimedSerializerMixin,
+                              serializers.ModelSerializer):
     """Serializer for MedicationSKU object"""
     tags = TagSerializer(many=True, required=False)
 
@@ -28,14 +49,8 @@ class MedicationSKUSerializer(serializers.ModelSerializer):
     def _get_or_create_tags(self, tags, medication_sku):
         """Handle getting or creating tags as needed"""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                # why not using name=tag['name']?
-                # ** is future-proof in case we add more values to the Tag
-                **tag,
-            )
-            medication_sku.tags.add(tag_obj)
+        # one lookup for all the tags instead of a get_or_create per tag
+        bulk.assign_tags(auth_user, [(medication_sku, tags)])
 
     def create(self, validated_data):
         """
@@ -52,25 +67,172 @@ class MedicationSKUSerializer(serializers.ModelSerializer):
         """
         Update a medication SKU
         & allow updating of tags inside a medication sku
+
+        Only the tags that differ are added or removed and only the fields
+        that changed are saved, a no-op update doesn't write anything.
         """
         tags = validated_data.pop('tags', None)
+        tags_changed = False
         if tags is not None:
-            # we clear tags
             # if 'tags' is empty [], there won't be any tags
-            # if not empty, we call the _get_or_create_tags
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            auth_user = self.context['request'].user
+            tags_changed = bool(
+                bulk.reconcile_tags(auth_user, [(instance.pk, tags)])
+            )
 
         # everything outside the tags value
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        changed_fields = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        for attr in changed_fields:
+            setattr(instance, attr, validated_data[attr])
+
+        if changed_fields or tags_changed:
+            # `updated_at` also moves when only the tags changed, it
+            # versions the whole representation
+            instance.save(update_fields=changed_fields + ['updated_at'])
+        if tags_changed:
+            # the tags are part of the search vector
+            medication_skus_changed.send(sender=MedicationSKU,
+                                         ids=[instance.pk])
 
-        instance.save()
         return instance
 
 
+class MedicationSKUBulkListSerializer(serializers.ListSerializer):
+    """
+    List serializer for bulk medication SKU payloads
+
+    Checks `medication_name` uniqueness for the whole payload with one
+    query instead of running the unique validators once per item. When
+    the context has an `upsert_user`, names of that user's SKUs are
+    accepted and the ones of other users rejected.
+    """
+
+    def to_internal_value(self, data):
+        validated_data = super().to_internal_value(data)
+
+        names = [item['medication_name'] for item in validated_data]
+        conflicts = bulk.name_conflicts(names, self.context.get('upsert_user'))
+        errors = [
+            {'medication_name': [CONFLICT_ERRORS[conflict]]}
+            if conflict else {}
+            for conflict in conflicts
+        ]
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return validated_data
+
+
+class MedicationSKUBulkSerializer(MedicationSKUSerializer):
+    """Serializer for MedicationSKU objects in bulk payloads"""
+
+    class Meta(MedicationSKUSerializer.Meta):
+        list_serializer_class = MedicationSKUBulkListSerializer
+        # uniqueness is validated per payload by the list serializer,
+        # `medication_name` is globally unique so it covers unique_together
+        validators = []
+        extra_kwargs = {'medication_name': {'validators': []}}
+
+
+class MedicationSKUBulkUpdateListSerializer(serializers.ListSerializer):
+    """
+    List serializer for bulk medication SKU updates
+
+    Every item needs a distinct `id`. New names are checked for
+    uniqueness against the payload and the other SKUs with one query.
+    """
+
+    def to_internal_value(self, data):
+        validated_data = super().to_internal_value(data)
+
+        errors = [{} for _ in validated_data]
+        seen_ids = set()
+        for error, item in zip(errors, validated_data):
+            if 'id' not in item:
+                error['id'] = ['This field is required.']
+            elif item['id'] in seen_ids:
+                error['id'] = [UNIQUE_ERROR]
+            seen_ids.add(item.get('id'))
+
+        renamed = [(error, item) for error, item in zip(errors, validated_data)
+                   if 'medication_name' in item]
+        skus = bulk.find_skus(item['medication_name'] for _, item in renamed)
+        seen_names = set()
+        for error, item in renamed:
+            name = item['medication_name']
+            sku_id, _ = skus.get(name, (item.get('id'), None))
+            if name in seen_names or sku_id != item.get('id'):
+                error['medication_name'] = [UNIQUE_ERROR]
+            seen_names.add(name)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return validated_data
+
+
+class MedicationSKUBulkUpdateSerializer(MedicationSKUBulkSerializer):
+    """
+    Serializer for MedicationSKU patches in bulk update payloads
+
+    Meant to be used with partial=True, only the fields given are changed.
+    """
+    id = serializers.IntegerField(min_value=1)
+
+    class Meta(MedicationSKUBulkSerializer.Meta):
+        list_serializer_class = MedicationSKUBulkUpdateListSerializer
+
+
+class MedicationSKUBulkDeleteSerializer(serializers.Serializer):
+    """Serializer for bulk medication SKU deletions"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+    )
+
+
 class MedicationSKUDetailSerializer(MedicationSKUSerializer):
     """Serializer for MedicationSKU detail object"""
 
     class Meta(MedicationSKUSerializer.Meta):
         fields = MedicationSKUSerializer.Meta.fields
+
+
+class BulkJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for the status of a background bulk job"""
+    progress = serializers.SerializerMethodField()
+    errors_truncated = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BulkJob
+        fields = ['id', 'status', 'upsert', 'total', 'processed',
+                  'progress', 'created', 'updated', 'failed', 'errors',
+                  'errors_truncated', 'detail', 'created_at', 'started_at',
+                  'finished_at']
+        read_only_fields = fields
+
+    def get_progress(self, job) -> float:
+        """Return the processed share of the rows, between 0 and 1"""
+        if not job.total:
+            return 1.0 if job.finished_at else 0.0
+
+        return job.processed / job.total
+
+    def get_errors_truncated(self, job) -> bool:
+        return job.failed > len(job.errors)
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """Validate the query parameters of the autocomplete endpoint"""
+    q = serializers.CharField(max_length=255)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class MedicationSKUSuggestionSerializer(serializers.Serializer):
+    """Autocomplete suggestion, documents the endpoint's response"""
+    id = serializers.IntegerField()
+    medication_name = serializers.CharField()
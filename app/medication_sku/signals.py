@@ -0,0 +1,150 @@
+"""
+Signal handlers for the medication SKU APIs
+"""
+from django.db import transaction
+from django.db.models.signals import (m2m_changed,
+                                      post_delete,
+                                      post_save,
+                                      pre_delete)
+from django.dispatch import (Signal,
+                             receiver)
+from django.utils import timezone
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku import (autocomplete,
+                            search)
+from medication_sku.cache import response_cache
+
+# Sent by the bulk helpers, which write with bulk_create/update/delete and
+# don't trigger the model signals. `ids` are the ids of the changed SKUs.
+medication_skus_changed = Signal()
+# Sent after SKUs were loaded with COPY, `queryset` selects them. Loads are
+# too large to pass their ids, the receivers work on the whole set at once.
+medication_skus_loaded = Signal()
+
+# SKUs whose search vectors are recomputed per UPDATE
+SEARCH_BATCH_SIZE = 1000
+
+
+def touch_medication_skus(queryset, removed_tag=None):
+    """
+    Bump `updated_at` of the SKUs in `queryset` so their ETag and
+    Last-Modified change when their nested tags do. Their search vector
+    is refreshed by the same UPDATE, without `removed_tag` when given.
+    """
+    fields = {'updated_at': timezone.now()}
+    if search.enabled(queryset.db):
+        fields['search_vector'] = search.search_vector(removed_tag)
+    queryset.update(**fields)
+
+
+@receiver(post_save, sender=Tag)
+def touch_skus_of_saved_tag(sender, instance, created, **kwargs):
+    """A renamed tag changes the representation of its SKUs"""
+    if not created:
+        touch_medication_skus(MedicationSKU.objects.filter(tags=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def touch_skus_of_deleted_tag(sender, instance, **kwargs):
+    """A deleted tag disappears from its SKUs"""
+    touch_medication_skus(MedicationSKU.objects.filter(tags=instance),
+                          removed_tag=instance)
+
+
+@receiver(m2m_changed, sender=MedicationSKU.tags.through)
+def touch_skus_of_changed_tags(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    """Tags added to or removed from SKUs outside of the serializers"""
+    if reverse:
+        # `instance` is a tag, clear() doesn't tell which SKUs it had
+        if action == 'pre_clear':
+            touch_medication_skus(MedicationSKU.objects.filter(tags=instance),
+                                  removed_tag=instance)
+        elif action in ('post_add', 'post_remove') and pk_set:
+            touch_medication_skus(
+                MedicationSKU.objects.filter(pk__in=pk_set)
+            )
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        touch_medication_skus(MedicationSKU.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=MedicationSKU)
+def update_search_vector_of_saved_sku(sender, instance, raw=False,
+                                      update_fields=None, **kwargs):
+    """The name and the presentation are part of the search vector"""
+    if raw or (update_fields is not None and not {
+            'medication_name', 'presentation'} & set(update_fields)):
+        return
+
+    search.update_search_vectors(MedicationSKU.objects.filter(pk=instance.pk))
+
+
+@receiver(medication_skus_changed)
+def update_search_vectors_of_changed_skus(sender, ids, **kwargs):
+    """Bulk writes change SKUs and their tags without model signals"""
+    if not search.enabled():
+        return
+
+    ids = list(ids)
+    for start in range(0, len(ids), SEARCH_BATCH_SIZE):
+        search.update_search_vectors(MedicationSKU.objects.filter(
+            id__in=ids[start:start + SEARCH_BATCH_SIZE],
+        ))
+
+
+@receiver(medication_skus_loaded)
+def update_search_vectors_of_loaded_skus(sender, queryset, **kwargs):
+    """COPY writes no search vector, one UPDATE computes them all"""
+    search.update_search_vectors(queryset)
+
+
+@receiver(post_save, sender=MedicationSKU)
+def update_autocomplete_of_saved_sku(sender, instance, raw=False,
+                                     update_fields=None, **kwargs):
+    """Index the new name once committed"""
+    if raw or (update_fields is not None
+               and 'medication_name' not in update_fields):
+        return
+
+    changes = {instance.pk: instance.medication_name}
+    transaction.on_commit(lambda: autocomplete.index.apply(changes))
+
+
+@receiver(post_delete, sender=MedicationSKU)
+def update_autocomplete_of_deleted_sku(sender, instance, **kwargs):
+    """Drop the name from the index once committed"""
+    changes = {instance.pk: None}
+    transaction.on_commit(lambda: autocomplete.index.apply(changes))
+
+
+@receiver(medication_skus_changed)
+def update_autocomplete_of_changed_skus(sender, ids, **kwargs):
+    """Index the names written in bulk once committed"""
+    if autocomplete.index.ready or autocomplete.index.building:
+        ids = list(ids)
+        transaction.on_commit(lambda: autocomplete.refresh(ids))
+
+
+@receiver(medication_skus_loaded)
+def rebuild_autocomplete_of_loaded_skus(sender, **kwargs):
+    """Rebuilding the index once committed beats looking up every name"""
+    if autocomplete.index.ready or autocomplete.index.building:
+        # a build already running may miss them until the next rebuild
+        transaction.on_commit(autocomplete.index.warm)
+
+
+@receiver(medication_skus_changed)
+@receiver(medication_skus_loaded)
+@receiver(post_save, sender=MedicationSKU)
+@receiver(post_delete, sender=MedicationSKU)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=MedicationSKU.tags.through)
+def invalidate_response_cache(sender, **kwargs):
+    """Drop every cached response when a SKU or a tag changes"""
+    response_cache.invalidate()
+    # again once committed, a concurrent read may have cached the
+    # pre-commit state under the new generation in between
+    transaction.on_commit(response_cache.invalidate)
@@ -0,0 +1,107 @@
+"""
+Synthetic medication SKU data for benchmarks and scale tests
+
+Every generator takes a random.Random so that a seed reproduces the same
+catalog. Names are numbered from `offset` and stay globally unique as long
+as the ranges of different calls don't overlap.
+
+Popularity follows Zipf's law: a few name stems, tags and users account
+for most SKUs, like in a real catalog. Units and doses depend on the
+presentation.
+"""
+from itertools import accumulate
+
+# presentation: (relative frequency, units)
+PRESENTATIONS = {
+    'Tablet': (40, ['mg', 'mcg']),
+    'Capsule': (20, ['mg']),
+    'Syrup': (10, ['ml', 'mg']),
+    'Injection': (10, ['mg', 'ml', 'mcg']),
+    'Cream': (6, ['%', 'g']),
+    'Drops': (6, ['ml', '%']),
+    'Inhaler': (5, ['mcg']),
+    'Patch': (3, ['mcg', 'mg']),
+}
+DOSES = {
+    'mg': [5, 10, 20, 25, 50, 100, 200, 250, 400, 500, 850, 1000],
+    'mcg': [25, 50, 100, 125, 200, 250],
+    'ml': [1, 2, 5, 10, 100, 150],
+    'g': [15, 30, 50, 100],
+    '%': [1, 2, 5, 10],
+}
+# most prescribed first
+NAME_STEMS = ['Paracetamol', 'Ibuprofen', 'Amoxicillin', 'Atorvastatin',
+              'Metformin', 'Omeprazole', 'Aspirin', 'Lisinopril',
+              'Amlodipine', 'Salbutamol', 'Sertraline', 'Simvastatin',
+              'Cetirizine', 'Levothyroxine', 'Losartan', 'Prednisolone',
+              'Azithromycin', 'Pantoprazole', 'Gabapentin', 'Citalopram',
+              'Hydrochlorothiazide', 'Clopidogrel', 'Furosemide',
+              'Insulin Glargine', 'Montelukast', 'Doxycycline',
+              'Fluticasone', 'Warfarin', 'Diclofenac', 'Loratadine']
+TAG_STEMS = ['Analgesic', 'Antibiotic', 'Antihistamine', 'Generic',
+             'Pediatric', 'Prescription', 'Cardio', 'OTC']
+
+_PRESENTATION_WEIGHTS = list(accumulate(
+    weight for weight, _ in PRESENTATIONS.values()
+))
+
+
+def zipf_weights(count, exponent=1.1):
+    """Return the cumulative Zipf weights of ranks 1 to `count`"""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+_NAME_WEIGHTS = zipf_weights(len(NAME_STEMS))
+
+
+def tag_names(count):
+    """Return `count` distinct tag names"""
+    return [f'{TAG_STEMS[i % len(TAG_STEMS)]} {i}' for i in range(count)]
+
+
+def sku_item(rng, number, tags, tags_per_sku=2, prefix='', tag_weights=None):
+    """
+    Return a bulk_create payload item numbered `number`, with up to
+    `tags_per_sku` tags picked from the `tags` names, uniformly or with
+    the cumulative `tag_weights`.
+    """
+    presentation = rng.choices(list(PRESENTATIONS),
+                               cum_weights=_PRESENTATION_WEIGHTS)[0]
+    unit = rng.choice(PRESENTATIONS[presentation][1])
+    if tag_weights is None:
+        picked = rng.sample(tags, min(tags_per_sku, len(tags)))
+    else:
+        # popular tags are picked several times, keep them once
+        picked = dict.fromkeys(rng.choices(tags, cum_weights=tag_weights,
+                                           k=tags_per_sku))
+    stem = rng.choices(NAME_STEMS, cum_weights=_NAME_WEIGHTS)[0]
+
+    return {
+        'medication_name': f'{prefix}{stem} {number}',
+        'presentation': presentation,
+        'dose': rng.choice(DOSES[unit]),
+        'unit': unit,
+        'tags': [{'name': name} for name in picked],
+    }
+
+
+def sku_items(rng, count, tags, offset=0, tags_per_sku=2, prefix=''):
+    """Return `count` payload items numbered from `offset`"""
+    return [sku_item(rng, offset + index, tags, tags_per_sku, prefix)
+            for index in range(count)]
+
+
+def catalog(rng, count, users, tags, offset=0, tags_per_sku=2,
+            exponent=1.1):
+    """
+    Yield (user index, payload item) pairs of `count` SKUs numbered from
+    `offset`, owned by `users` users and tagged with their `tags` names,
+    both ranked by Zipf's law.
+    """
+    user_weights = zipf_weights(users, exponent)
+    tag_weights = zipf_weights(len(tags), exponent)
+    for index in range(count):
+        user = rng.choices(range(users), cum_weights=user_weights)[0]
+        yield user, sku_item(rng, offset + index, tags, tags_per_sku,
+                             tag_weights=tag_weights)
@@ -0,0 +1,40 @@
+"""
+Query-count budgets for the medication SKU API endpoints
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Maximum number of queries per endpoint, independent of the number of
+# objects returned. Authentication is forced in the tests so these only
+# cover the view itself.
+QUERY_BUDGETS = {
+    # ETag aggregate + SKU page + prefetch of the tags of the page
+    'medication_skus-list': 3,
+    # SKU + prefetch of its tags
+    'medication_skus-detail': 2,
+    # ETag aggregate + tag page
+    'tag-list': 2,
+}
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting endpoints stay within their query budget"""
+
+    def assertWithinQueryBudget(self, url_name, func, *args, **kwargs):
+        """Call `func` and fail if it runs more queries than budgeted"""
+        budget = QUERY_BUDGETS[url_name]
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}'
+                for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(
+                f'{url_name} executed {executed} queries, '
+                f'budget is {budget}:\n{queries}'
+            )
+
+        return result
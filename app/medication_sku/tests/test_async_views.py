@@ -0,0 +1,173 @@
+"""
+Tests for the async read path
+"""
+import base64
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import (AsyncClient,
+                         TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku.async_views import AsyncKeysetListView
+from medication_sku.serializers import (MedicationSKUDetailSerializer,
+                                        MedicationSKUSerializer)
+
+ASYNC_SKU_LIST_URL = reverse('medication_sku:async-medication-skus-list')
+ASYNC_TAG_LIST_URL = reverse('medication_sku:async-tags-list')
+
+
+def detail_url(medication_sku_id):
+    """Create and return an async medication SKU detail URL"""
+    return reverse('medication_sku:async-medication-skus-detail',
+                   args=[medication_sku_id])
+
+
+class AsyncReadPathTests(TestCase):
+    """Test the async list and detail views"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = AsyncClient()
+        self.headers = {'Authorization': f'Token {token.key}'}
+        self.analgesic = Tag.objects.create(user=self.user, name='Analgesic')
+        self.skus = []
+        for name, dose in [('Aspirin', 50), ('Ibuprofen', 200),
+                           ('Paracetamol', 500)]:
+            medication_sku = MedicationSKU.objects.create(
+                user=self.user, medication_name=name,
+                presentation='Tablet', dose=dose, unit='mg',
+            )
+            medication_sku.tags.add(self.analgesic)
+            self.skus.append(medication_sku)
+
+    def _get(self, url, data=None):
+        return self.client.get(url, data, headers=self.headers)
+
+    async def test_authentication_required(self):
+        """Test requests without a token are rejected"""
+        res = await AsyncClient().get(ASYNC_SKU_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    async def test_list_matches_sync_serialization(self):
+        """Test the async list serializes like the viewset list"""
+        res = await self._get(ASYNC_SKU_LIST_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = await sync_to_async(
+            lambda: MedicationSKUSerializer(self.skus[::-1], many=True).data
+        )()
+        self.assertEqual(res.json()['results'], expected)
+        self.assertIsNone(res.json()['next'])
+
+    @override_settings(PAGINATION_PAGE_SIZE=2)
+    async def test_list_keyset_pages(self):
+        """Test following the next links visits every SKU once"""
+        res = await self._get(ASYNC_SKU_LIST_URL)
+        first = res.json()
+        res = await self._get(first['next'])
+        second = res.json()
+
+        self.assertEqual(
+            [sku['medication_name']
+             for sku in first['results'] + second['results']],
+            ['Paracetamol', 'Ibuprofen', 'Aspirin'],
+        )
+        self.assertIsNone(second['next'])
+
+    async def test_list_filters(self):
+        """Test the list applies the viewset filters"""
+        res = await self._get(ASYNC_SKU_LIST_URL, {'dose_min': 100})
+
+        self.assertEqual(
+            [sku['medication_name'] for sku in res.json()['results']],
+            ['Paracetamol', 'Ibuprofen'],
+        )
+
+    async def test_list_invalid_filter(self):
+        """Test invalid filters answer 400 with the field errors"""
+        res = await self._get(ASYNC_SKU_LIST_URL, {'dose_min': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('dose_min', res.json())
+
+    async def test_invalid_cursor(self):
+        """Test an invalid cursor answers 404"""
+        res = await self._get(ASYNC_SKU_LIST_URL, {'cursor': '!'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_cursor_of_wrong_types(self):
+        """Test a well formed cursor holding wrong types answers 404"""
+        for values in (['abc'], [None], [[1]]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode())
+            res = await self._get(ASYNC_SKU_LIST_URL,
+                                  {'cursor': cursor.decode()})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_detail(self):
+        """Test the async detail serializes like the viewset detail"""
+        res = await self._get(detail_url(self.skus[0].id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = await sync_to_async(
+            lambda: MedicationSKUDetailSerializer(self.skus[0]).data
+        )()
+        self.assertEqual(res.json(), expected)
+
+    async def test_detail_not_found(self):
+        """Test an unknown SKU answers 404"""
+        res = await self._get(detail_url(0))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(PAGINATION_PAGE_SIZE=1)
+    async def test_tag_list_pages_same_names(self):
+        """Test tags sharing a name are all listed across pages"""
+        await Tag.objects.acreate(user=self.user, name='Analgesic')
+        await Tag.objects.acreate(user=self.user, name='Generic')
+
+        names = []
+        url = ASYNC_TAG_LIST_URL
+        while url:
+            page = (await self._get(url)).json()
+            names += [tag['name'] for tag in page['results']]
+            url = page['next']
+
+        self.assertEqual(names, ['Generic', 'Analgesic', 'Analgesic'])
+
+    async def test_head(self):
+        """Test HEAD answers like GET without a body"""
+        res = await self.client.head(ASYNC_SKU_LIST_URL, headers=self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res.content, b'')
+
+    def test_list_requires_queryset(self):
+        """Test a list view without a queryset is misconfigured"""
+        view = AsyncKeysetListView()
+
+        with self.assertRaises(AssertionError):
+            view.get_queryset()
+
+    async def test_post_not_allowed(self):
+        """Test the async views are read only"""
+        res = await self.client.post(ASYNC_TAG_LIST_URL, {'name': 'New'},
+                                     headers=self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
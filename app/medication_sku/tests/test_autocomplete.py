@@ -0,0 +1,181 @@
+"""
+Tests for the medication name autocomplete
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import MedicationSKU
+from medication_sku import (autocomplete,
+                            bulk)
+from medication_sku.autocomplete import PrefixIndex
+from medication_sku.signals import medication_skus_loaded
+
+AUTOCOMPLETE_URL = reverse('medication_sku:medication_skus-autocomplete')
+BULK_CREATE_URL = reverse('medication_sku:medication_skus-bulk-create')
+
+
+def sku_row(name):
+    """Return a payload item of a medication SKU"""
+    return {'medication_name': name, 'presentation': 'Tablet', 'dose': 50,
+            'unit': 'mg'}
+
+
+class PrefixIndexTests(TestCase):
+    """Test looking up names in the in-process index"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='user@example.com')
+        self.skus = {
+            name: MedicationSKU.objects.create(user=user, **sku_row(name))
+            for name in ['amlodipine', 'Amoxicillin', 'Aspirin', 'Atenolol']
+        }
+        self.index = PrefixIndex()
+        self.index.build()
+
+    def test_suggest(self):
+        """Test names are matched case insensitively, ordered by name"""
+        self.assertEqual(
+            [name for _, name in self.index.suggest('AM', 10)],
+            ['amlodipine', 'Amoxicillin'],
+        )
+        self.assertEqual(len(self.index.suggest('a', 3)), 3)
+        self.assertEqual(self.index.suggest('b', 10), [])
+
+    def test_apply_changes(self):
+        """Test renames, deletes and inserts, one by one and in bulk"""
+        aspirin = self.skus['Aspirin']
+        self.index.apply({aspirin.pk: 'Baclofen',
+                          self.skus['Atenolol'].pk: None})
+        self.assertEqual([name for _, name in self.index.suggest('a', 10)],
+                         ['amlodipine', 'Amoxicillin'])
+        self.assertEqual(self.index.suggest('bac', 10),
+                         [(aspirin.pk, 'Baclofen')])
+
+        self.index.apply({-i: f'Azithromycin {i}' for i in range(1, 100)})
+        self.assertEqual(len(self.index.suggest('azi', 100)), 99)
+        self.assertEqual(len(self.index), 102)
+
+    def test_changes_while_building(self):
+        """Test changes made during a build are applied after it"""
+        index = PrefixIndex()
+        index.building = True
+        index.apply({-1: 'Abacavir'})
+
+        index.build()
+
+        self.assertEqual(index.suggest('aba', 10), [(-1, 'Abacavir')])
+
+    @override_settings(AUTOCOMPLETE_INDEX_MAX_SKUS=3)
+    @patch.object(PrefixIndex, 'warm')
+    def test_too_many_skus(self, patched_warm):
+        """Test the index isn't built above the size limit"""
+        self.index.build()
+
+        self.assertFalse(self.index.ready)
+        self.assertEqual(len(self.index), 0)
+        self.assertIsNone(self.index.suggest('a', 10))
+        # not retried on every lookup, only once stale
+        patched_warm.assert_not_called()
+        with self.settings(AUTOCOMPLETE_INDEX_MAX_AGE=1):
+            self.index.built_at -= 2
+            self.index.suggest('a', 10)
+        patched_warm.assert_called_once()
+
+
+class AutocompleteApiTests(TestCase):
+    """Test the autocomplete endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.aspirin = MedicationSKU.objects.create(user=self.user,
+                                                    **sku_row('Aspirin'))
+        MedicationSKU.objects.create(user=self.user, **sku_row('Ibuprofen'))
+        self.index = PrefixIndex()
+        self.index.build()
+        patcher = patch.object(autocomplete, 'index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_autocomplete_from_index(self):
+        """Test suggestions are served without querying the database"""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(AUTOCOMPLETE_URL, {'q': 'asp'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': self.aspirin.pk,
+                                     'medication_name': 'Aspirin'}])
+        self.assertEqual(len(context.captured_queries), 0)
+
+    @override_settings(AUTOCOMPLETE_INDEX_ENABLED=False)
+    def test_autocomplete_without_index(self):
+        """Test suggestions are queried when the index is disabled"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'IBU'})
+
+        self.assertEqual([item['medication_name'] for item in res.data],
+                         ['Ibuprofen'])
+
+    @patch.object(PrefixIndex, 'warm')
+    def test_autocomplete_cold_index(self, patched_warm):
+        """Test a cold index starts building and the database answers"""
+        self.index.ready = False
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'asp'})
+
+        self.assertEqual([item['medication_name'] for item in res.data],
+                         ['Aspirin'])
+        patched_warm.assert_called_once()
+
+    def test_autocomplete_invalid_params(self):
+        """Test a blank prefix or a too large limit is rejected"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': ' ', 'limit': 500})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('q', res.data)
+        self.assertIn('limit', res.data)
+
+    def test_index_follows_writes(self):
+        """Test saved, bulk created and deleted SKUs are indexed"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aspirin.medication_name = 'Acetylsalicylic acid'
+            self.aspirin.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.create_medication_skus(self.user, [sku_row('Aspartame')])
+        with self.captureOnCommitCallbacks(execute=True):
+            MedicationSKU.objects.get(medication_name='Ibuprofen').delete()
+
+        self.assertEqual([name for _, name in self.index.suggest('a', 10)],
+                         ['Acetylsalicylic acid', 'Aspartame'])
+        self.assertEqual(self.index.suggest('ibu', 10), [])
+
+    def test_index_rebuilt_after_load(self):
+        """Test SKUs loaded without model signals are indexed once"""
+        MedicationSKU.objects.bulk_create([
+            MedicationSKU(user=self.user, **sku_row(name))
+            for name in ['Aspartame', 'Asparaginase']
+        ])
+
+        with patch.object(self.index, 'warm',
+                          side_effect=self.index.build) as patched_warm, \
+                self.captureOnCommitCallbacks(execute=True):
+            medication_skus_loaded.send(
+                sender=MedicationSKU,
+                queryset=MedicationSKU.objects.all(),
+            )
+
+        patched_warm.assert_called_once()
+        self.assertEqual([name for _, name in self.index.suggest('asp', 10)],
+                         ['Asparaginase', 'Aspartame', 'Aspirin'])
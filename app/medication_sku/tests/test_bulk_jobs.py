@@ -0,0 +1,205 @@
+"""
+Tests for the background bulk jobs
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (BulkJob,
+                         MedicationSKU,
+                         Tag)
+from medication_sku import (importer,
+                            jobs)
+from medication_sku.tests.test_import import (ndjson,
+                                              sku_row)
+
+BULK_CREATE_URL = reverse('medication_sku:medication_skus-bulk-create')
+IMPORT_URL = reverse('medication_sku:medication_skus-import-skus')
+
+
+def job_url(job_id):
+    """Create and return a bulk job status URL"""
+    return reverse('medication_sku:bulk_jobs-detail', args=[job_id])
+
+
+class BulkJobApiTests(TestCase):
+    """Test queuing bulk writes and polling their status"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_async_bulk_create_queues_job(self):
+        """Test ?async=true answers 202 without writing the SKUs"""
+        payload = [sku_row('Aspirin', tags=[{'name': 'Analgesic'}]),
+                   sku_row('Ibuprofen')]
+
+        res = self.client.post(BULK_CREATE_URL + '?async=true', payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], BulkJob.QUEUED)
+        self.assertEqual(res.data['total'], 2)
+        self.assertEqual(res['Location'], job_url(res.data['id']))
+        self.assertFalse(MedicationSKU.objects.exists())
+
+    def test_async_bulk_create_rejects_non_list(self):
+        """Test queuing a payload that isn't a list fails"""
+        res = self.client.post(BULK_CREATE_URL + '?async=true',
+                               sku_row('Aspirin'), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BulkJob.objects.exists())
+
+    def test_job_status_after_run(self):
+        """Test the status endpoint reports progress and row errors"""
+        payload = [sku_row('Aspirin', tags=[{'name': 'Analgesic'}]),
+                   sku_row('Aspirin'),
+                   sku_row('Ibuprofen', dose=-1)]
+        res = self.client.post(BULK_CREATE_URL + '?async=true', payload,
+                               format='json')
+
+        jobs.run_job(jobs.claim_job(), chunk_size=2)
+        res = self.client.get(res['Location'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], BulkJob.SUCCEEDED)
+        self.assertEqual(res.data['processed'], 3)
+        self.assertEqual(res.data['progress'], 1.0)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual([error['line'] for error in res.data['errors']],
+                         [1, 2])
+        self.assertTrue(Tag.objects.filter(user=self.user,
+                                           name='Analgesic').exists())
+
+    def test_async_import(self):
+        """Test ?async=true on the import endpoint queues the lines"""
+        MedicationSKU.objects.create(user=self.user, **sku_row('Aspirin'))
+
+        res = self.client.generic(
+            'POST', IMPORT_URL + '?async=true&mode=upsert',
+            ndjson(sku_row('Aspirin', dose=100), sku_row('Ibuprofen')),
+            content_type='application/x-ndjson',
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        job = jobs.run_job(jobs.claim_job())
+
+        self.assertEqual(job.status, BulkJob.SUCCEEDED)
+        self.assertEqual((job.created, job.updated), (1, 1))
+        self.assertFalse(job.chunks.exists())
+        self.assertEqual(
+            MedicationSKU.objects.get(medication_name='Aspirin').dose, 100
+        )
+
+    def test_async_import_chunked(self):
+        """Test the queued lines are stored and imported in chunks"""
+        rows = importer.parse(
+            ndjson(*(sku_row(f'Drug {index}') for index in range(5)))
+            .splitlines(keepends=True),
+            'ndjson',
+        )
+
+        job = jobs.enqueue(self.user, rows, chunk_size=2)
+
+        self.assertEqual(job.total, 5)
+        self.assertEqual([len(chunk.rows) for chunk in job.chunks.all()],
+                         [2, 2, 1])
+        job = jobs.run_job(jobs.claim_job())
+        self.assertEqual((job.processed, job.created), (5, 5))
+        self.assertFalse(job.chunks.exists())
+
+    def test_async_import_invalid_utf8(self):
+        """Test queuing a body that isn't UTF-8 fails"""
+        res = self.client.generic('POST', IMPORT_URL + '?async=true',
+                                  b'\xff\xfe\n',
+                                  content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BulkJob.objects.exists())
+
+    def test_job_of_other_user_not_found(self):
+        """Test users can't see the jobs of other users"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        job = jobs.enqueue(other, [(0, sku_row('Aspirin'), None)])
+
+        res = self.client.get(job_url(job.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkJobQueueTests(TestCase):
+    """Test claiming and running queued jobs"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def test_claim_oldest_queued_job(self):
+        """Test jobs are claimed once, oldest first"""
+        first = jobs.enqueue(self.user, [])
+        second = jobs.enqueue(self.user, [])
+
+        self.assertEqual(jobs.claim_job().pk, first.pk)
+        self.assertEqual(jobs.claim_job().pk, second.pk)
+        self.assertIsNone(jobs.claim_job())
+        self.assertEqual(BulkJob.objects.get(pk=first.pk).status,
+                         BulkJob.RUNNING)
+
+    def test_running_job_not_claimed(self):
+        """Test a job with a recent heartbeat isn't claimed again"""
+        jobs.enqueue(self.user, [])
+        jobs.claim_job()
+
+        self.assertIsNone(jobs.claim_job())
+
+    def test_expired_job_resumed(self):
+        """Test a job of a dead worker is taken back after the lease"""
+        jobs.enqueue(self.user, [(line, sku_row(f'Drug {line}'), None)
+                                 for line in range(3)], chunk_size=1)
+        job = jobs.claim_job()
+        # the worker dies after importing the first chunk
+        jobs._run_chunk(job, job.chunks.order_by('index').first().pk,
+                        chunk_size=1)
+        BulkJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(
+                seconds=settings.BULK_JOB_LEASE_SECONDS + 1,
+            ),
+        )
+
+        resumed = jobs.claim_job()
+        self.assertEqual(resumed.pk, job.pk)
+        resumed = jobs.run_job(resumed)
+
+        self.assertEqual(resumed.status, BulkJob.SUCCEEDED)
+        self.assertEqual((resumed.processed, resumed.created), (3, 3))
+        self.assertEqual(MedicationSKU.objects.count(), 3)
+
+    def test_unexpected_error_fails_job(self):
+        """Test an error interrupting the import fails the job"""
+        jobs.enqueue(self.user, [(0, sku_row('Aspirin'), None)])
+
+        with patch('medication_sku.importer.import_medication_skus',
+                   side_effect=RuntimeError('boom')):
+            job = jobs.run_job(jobs.claim_job())
+
+        self.assertEqual(job.status, BulkJob.FAILED)
+        self.assertEqual(job.detail, 'boom')
+        self.assertIsNotNone(job.finished_at)
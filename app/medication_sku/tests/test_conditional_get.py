@@ -0,0 +1,140 @@
+"""
+Tests for conditional GET on the medication SKU APIs
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (MedicationSKU,
+                         Tag)
+
+MEDICATION_SKU_LIST_URL = reverse('medication_sku:medication_skus-list')
+TAGS_URL = reverse('medication_sku:tag-list')
+
+
+def detail_url(medication_sku_id):
+    """Create and return a medication SKU detail URL"""
+    return reverse('medication_sku:medication_skus-detail',
+                   args=[medication_sku_id])
+
+
+def create_medication_sku(user, **params):
+    """Create a new medication SKU"""
+    defaults = {
+        'medication_name': 'Amoxicillin',
+        'presentation': 'Tablet',
+        'dose': 50,
+        'unit': 'mg',
+    }
+    defaults.update(params)
+
+    return MedicationSKU.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified validators"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.medication_sku = create_medication_sku(user=self.user)
+
+    def test_list_not_modified(self):
+        """Test the list returns 304 for a current ETag"""
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', res)
+
+        res = self.client.get(MEDICATION_SKU_LIST_URL,
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_list_modified_after_create(self):
+        """Test the list ETag changes when a SKU is added"""
+        etag = self.client.get(MEDICATION_SKU_LIST_URL)['ETag']
+        create_medication_sku(user=self.user, medication_name='Ibuprofen')
+
+        res = self.client.get(MEDICATION_SKU_LIST_URL,
+                              HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_etag_depends_on_query(self):
+        """Test filtered lists have their own ETag"""
+        etag = self.client.get(MEDICATION_SKU_LIST_URL)['ETag']
+
+        res = self.client.get(MEDICATION_SKU_LIST_URL, {'unit': 'mg'},
+                              HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_from_page(self):
+        """Test the ETag covers the page only, without an aggregate"""
+        ibuprofen = create_medication_sku(user=self.user,
+                                          medication_name='Ibuprofen')
+        create_medication_sku(user=self.user, medication_name='Naproxen')
+        etag = self.client.get(MEDICATION_SKU_LIST_URL,
+                               {'page_size': 2})['ETag']
+        # the first SKU is on the second page
+        self.medication_sku.presentation = 'Capsule'
+        self.medication_sku.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(MEDICATION_SKU_LIST_URL, {'page_size': 2},
+                                  HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse([query for query in queries
+                          if 'COUNT(' in query['sql'].upper()])
+
+        ibuprofen.presentation = 'Capsule'
+        ibuprofen.save()
+        res = self.client.get(MEDICATION_SKU_LIST_URL, {'page_size': 2},
+                              HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_not_modified(self):
+        """Test the detail returns 304 without serializing"""
+        url = detail_url(self.medication_sku.id)
+        res = self.client.get(url)
+
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_after_tag_rename(self):
+        """Test renaming a tag changes the ETag of its SKUs"""
+        tag = Tag.objects.create(user=self.user, name='Antibiotic')
+        self.medication_sku.tags.add(tag)
+        url = detail_url(self.medication_sku.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.patch(reverse('medication_sku:tag-detail',
+                                        args=[tag.id]),
+                                {'name': 'Antiviral'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Antiviral')
+
+    def test_tag_list_not_modified(self):
+        """Test the tag list returns 304 for a current ETag"""
+        Tag.objects.create(user=self.user, name='Antibiotic')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
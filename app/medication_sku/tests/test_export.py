@@ -0,0 +1,127 @@
+"""
+Tests for the medication SKU catalog export
+"""
+import csv
+import io
+import json
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (AsyncClient,
+                         TestCase)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import (MedicationSKU,
+                         Tag)
+
+EXPORT_URL = reverse('medication_sku:medication_skus-export')
+
+
+def create_medication_skus(user, count, tags=()):
+    """Create `count` medication SKUs tagged with `tags`"""
+    medication_skus = []
+    for i in range(count):
+        medication_sku = MedicationSKU.objects.create(
+            user=user,
+            medication_name=f'Medication {i}',
+            presentation='Tablet' if i % 2 else 'Capsule',
+            dose=50 + i,
+            unit='mg',
+        )
+        medication_sku.tags.set(tags)
+        medication_skus.append(medication_sku)
+
+    return medication_skus
+
+
+class ExportTests(TestCase):
+    """Test streaming the catalog"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [Tag.objects.create(user=self.user, name=name)
+                     for name in ('Antibiotic', 'Generic')]
+
+    def _content(self, res):
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test exporting the catalog as NDJSON"""
+        medication_skus = create_medication_skus(self.user, 3, self.tags)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line)
+                for line in self._content(res).splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [sku.id for sku in medication_skus])
+        self.assertEqual(rows[0]['medication_name'], 'Medication 0')
+        self.assertCountEqual([tag['name'] for tag in rows[0]['tags']],
+                              ['Antibiotic', 'Generic'])
+
+    def test_export_csv(self):
+        """Test exporting the catalog as CSV"""
+        create_medication_skus(self.user, 2, self.tags[:1])
+
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self._content(res))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1]['medication_name'], 'Medication 1')
+        self.assertEqual(rows[1]['tags'], 'Antibiotic')
+
+    def test_export_filtered(self):
+        """Test the export honours the list filters"""
+        create_medication_skus(self.user, 4)
+
+        res = self.client.get(EXPORT_URL, {'presentation': 'Tablet'})
+
+        rows = self._content(res).splitlines()
+        self.assertEqual(len(rows), 2)
+
+    async def test_export_asgi(self):
+        """Test ASGI servers get the blocks from an async iterator"""
+        await sync_to_async(create_medication_skus)(self.user, 3)
+        token = await Token.objects.acreate(user=self.user)
+
+        res = await AsyncClient().get(
+            EXPORT_URL, headers={'Authorization': f'Token {token.key}'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.is_async)
+        content = b''.join([block async for block in res.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 3)
+
+    def test_export_invalid_format(self):
+        """Test an unknown export format is rejected"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('medication_sku.export.CHUNK_SIZE', 2)
+    def test_export_queries_per_chunk(self):
+        """Test tags are loaded once per chunk, not once per row"""
+        create_medication_skus(self.user, 6, self.tags)
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(EXPORT_URL)
+            self._content(res)
+
+        # one cursor over the SKUs + one tag prefetch per chunk of 2
+        self.assertEqual(len(context.captured_queries), 4)
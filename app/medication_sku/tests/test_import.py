@@ -0,0 +1,243 @@
+"""
+Tests for the streaming medication SKU import
+"""
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku import importer
+
+IMPORT_URL = reverse('medication_sku:medication_skus-import-skus')
+
+
+def ndjson(*rows):
+    """Return `rows` as newline delimited JSON bytes"""
+    return ''.join(json.dumps(row) + '\n' for row in rows).encode()
+
+
+def sku_row(name, **params):
+    """Return an import row for a medication SKU"""
+    row = {
+        'medication_name': name,
+        'presentation': 'Tablet',
+        'dose': 50,
+        'unit': 'mg',
+    }
+    row.update(params)
+
+    return row
+
+
+class ImportApiTests(TestCase):
+    """Test importing medication SKUs through the API"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _post(self, content, content_type='application/x-ndjson',
+              **params):
+        url = IMPORT_URL
+        if params:
+            url += '?' + '&'.join(f'{k}={v}' for k, v in params.items())
+
+        return self.client.generic('POST', url, content,
+                                   content_type=content_type)
+
+    def test_import_ndjson(self):
+        """Test importing an NDJSON body"""
+        res = self._post(ndjson(
+            sku_row('Aspirin', tags=[{'name': 'Analgesic'}]),
+            sku_row('Ibuprofen', tags=[{'name': 'Analgesic'}]),
+        ))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 0)
+        tag = Tag.objects.get(user=self.user, name='Analgesic')
+        self.assertEqual(tag.medicationsku_set.count(), 2)
+
+    def test_import_csv(self):
+        """Test importing a CSV body"""
+        content = (
+            'medication_name,presentation,dose,unit,tags\n'
+            'Aspirin,Tablet,50,mg,Analgesic|Generic\n'
+            '"Paracetamol, Syrup",Syrup,120,ml,\n'
+        ).encode()
+
+        res = self._post(content, 'text/csv', import_format='csv')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        aspirin = MedicationSKU.objects.get(medication_name='Aspirin')
+        self.assertEqual(aspirin.tags.count(), 2)
+        self.assertTrue(MedicationSKU.objects.filter(
+            medication_name='Paracetamol, Syrup', user=self.user,
+        ).exists())
+
+    def test_import_reports_row_errors(self):
+        """Test invalid rows are reported and the valid ones imported"""
+        MedicationSKU.objects.create(user=self.user, **sku_row('Aspirin'))
+        content = ndjson(sku_row('Ibuprofen')) + b'{not json}\n' + ndjson(
+            sku_row('Aspirin'),
+            sku_row('Naproxen', dose='high'),
+            sku_row('Ibuprofen'),
+        )
+
+        res = self._post(content)
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['failed'], 4)
+        errors = {error['line']: error['errors']
+                  for error in res.data['errors']}
+        self.assertIn('non_field_errors', errors[2])
+        self.assertIn('medication_name', errors[3])
+        self.assertIn('dose', errors[4])
+        self.assertIn('medication_name', errors[5])
+
+    def test_import_in_chunks(self):
+        """Test rows are inserted chunk by chunk"""
+        rows = [sku_row(f'Medication {i}') for i in range(5)]
+        user = self.user
+
+        report = importer.import_medication_skus(
+            user,
+            importer.parse(ndjson(*rows).splitlines(True), 'ndjson'),
+            chunk_size=2,
+        )
+
+        self.assertEqual(report.created, 5)
+        self.assertEqual(MedicationSKU.objects.count(), 5)
+
+    def test_import_upsert(self):
+        """Test importing in upsert mode updates existing SKUs"""
+        MedicationSKU.objects.create(user=self.user, **sku_row('Aspirin'))
+
+        res = self._post(ndjson(sku_row('Aspirin', dose=75),
+                                sku_row('Ibuprofen')),
+                         mode='upsert')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['updated'], 1)
+        self.assertEqual(
+            MedicationSKU.objects.get(medication_name='Aspirin').dose, 75
+        )
+
+    def test_import_nothing_valid(self):
+        """Test a body without any valid row is rejected"""
+        res = self._post(b'[1, 2]\n')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['failed'], 1)
+
+    def test_import_invalid_format(self):
+        """Test an unknown import format is rejected"""
+        res = self._post(b'', import_format='xml')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CopyImportTests(TestCase):
+    """
+    Test importing through the COPY staging table, the ORM import on
+    databases other than PostgreSQL
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+
+    def _import(self, *rows, upsert=False):
+        return importer.copy_import_medication_skus(
+            self.user,
+            importer.parse(ndjson(*rows).splitlines(True), 'ndjson'),
+            upsert=upsert,
+        )
+
+    def test_copy_import(self):
+        """Test SKUs and tags are created and conflicts reported"""
+        MedicationSKU.objects.create(user=self.user, **sku_row('Aspirin'))
+        Tag.objects.create(user=self.user, name='Analgesic')
+
+        report = self._import(
+            sku_row('Ibuprofen', tags=[{'name': 'Analgesic'},
+                                       {'name': 'Generic'}]),
+            sku_row('Aspirin'),
+            sku_row('Naproxen', dose='high'),
+            sku_row('Ibuprofen'),
+            sku_row('Paracetamol', tags=[{'name': 'Analgesic'}]),
+        )
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual(report.failed, 3)
+        self.assertEqual(
+            sorted(error['line'] for error in report.errors), [2, 3, 4],
+        )
+        ibuprofen = MedicationSKU.objects.get(medication_name='Ibuprofen')
+        self.assertEqual(ibuprofen.user, self.user)
+        self.assertEqual(
+            sorted(ibuprofen.tags.values_list('name', flat=True)),
+            ['Analgesic', 'Generic'],
+        )
+        self.assertEqual(Tag.objects.filter(name='Analgesic').count(), 1)
+        self.assertEqual(Tag.objects.get(
+            name='Analgesic').medicationsku_set.count(), 2)
+
+    def test_copy_import_upsert(self):
+        """Test SKUs of the user are updated and their tags reconciled"""
+        tagged = MedicationSKU.objects.create(user=self.user,
+                                              **sku_row('Aspirin'))
+        tagged.tags.add(Tag.objects.create(user=self.user, name='Generic'))
+        untouched = MedicationSKU.objects.create(user=self.user,
+                                                 **sku_row('Ibuprofen'))
+        untouched.tags.add(Tag.objects.create(user=self.user, name='OTC'))
+        MedicationSKU.objects.create(user=self.other_user,
+                                     **sku_row('Naproxen'))
+
+        report = self._import(
+            sku_row('Aspirin', dose=75, tags=[{'name': 'Analgesic'}]),
+            sku_row('Ibuprofen', dose=400),
+            sku_row('Naproxen', dose=250),
+            sku_row('Paracetamol'),
+            upsert=True,
+        )
+
+        self.assertEqual((report.created, report.updated, report.failed),
+                         (1, 2, 1))
+        self.assertEqual(report.errors[0]['line'], 3)
+        tagged.refresh_from_db()
+        self.assertEqual(tagged.dose, 75)
+        self.assertEqual(list(tagged.tags.values_list('name', flat=True)),
+                         ['Analgesic'])
+        self.assertEqual(list(untouched.tags.values_list('name', flat=True)),
+                         ['OTC'])
+        self.assertEqual(
+            MedicationSKU.objects.get(medication_name='Naproxen').dose, 50,
+        )
+
+    @patch('medication_sku.importer.pgcopy.supported', return_value=False)
+    @patch('medication_sku.importer.import_medication_skus')
+    def test_copy_import_fallback(self, patched_import, patched_supported):
+        """Test other databases use the chunked ORM import"""
+        self._import(sku_row('Aspirin'))
+
+        patched_import.assert_called_once()
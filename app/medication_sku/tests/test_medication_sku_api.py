@@ -2,18 +2,29 @@
 Test for medication SKU API
 """
 
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.db import (DatabaseError,
+                       connection)
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import (MedicationSKU,
                          Tag)
+from medication_sku import bulk
+from medication_sku.pagination import MedicationSKUPagination
+from medication_sku.signals import medication_skus_changed
 from medication_sku.serializers import (MedicationSKUSerializer,
                                         MedicationSKUDetailSerializer)
 
 MEDICATION_SKU_LIST_URL = reverse('medication_sku:medication_skus-list')
+BULK_CREATE_URL = reverse('medication_sku:medication_skus-bulk-create')
+BULK_UPDATE_URL = reverse('medication_sku:medication_skus-bulk-update')
+BULK_DELETE_URL = reverse('medication_sku:medication_skus-bulk-delete')
 
 
 def detail_url(medication_sku_id):
@@ -88,7 +99,38 @@ class PrivateMedicationSkuApiTests(TestCase):
         serializer = MedicationSKUSerializer(medication_skus, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertCountEqual(res.data, serializer.data)
+        self.assertCountEqual(res.data['results'], serializer.data)
+
+    def test_medication_sku_list_paginated(self):
+        """Test the medication sku list is paginated with a cursor"""
+        for i in range(5):
+            create_medication_sku(user=self.user,
+                                  medication_name=f'Medication {i}')
+
+        res = self.client.get(MEDICATION_SKU_LIST_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in res.data['results']]
+        self.assertIsNotNone(res.data['next'])
+
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids.extend(item['id'] for item in res.data['results'])
+
+        expected = MedicationSKU.objects.order_by('-id')
+        self.assertEqual(ids, [sku.id for sku in expected])
+
+    def test_medication_sku_list_max_page_size(self):
+        """Test the requested page size is capped"""
+        for i in range(3):
+            create_medication_sku(user=self.user,
+                                  medication_name=f'Medication {i}')
+
+        with patch.object(MedicationSKUPagination, 'max_page_size', 2):
+            res = self.client.get(MEDICATION_SKU_LIST_URL,
+                                  {'page_size': 100})
+
+        self.assertEqual(len(res.data['results']), 2)
 
     def test_create_medication_sku(self):
         """Test creating a new medication SKU"""
@@ -316,6 +358,580 @@ class PrivateMedicationSkuApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         self.assertEqual(len(res.data), 2)
 
+    def test_bulk_create_assigns_tags(self):
+        """Test bulk create reuses existing tags and links the new ones"""
+        tag_existing = Tag.objects.create(user=self.user, name='Antibiotic')
+        payload = [
+            {
+                'medication_name': f'Bulk Medication {i}',
+                'presentation': 'Tablet',
+                'dose': 50,
+                'unit': 'mg',
+                'tags': [{'name': 'Antibiotic'}, {'name': 'Generic'}],
+            }
+            for i in range(3)
+        ]
+
+        res = self.client.post(
+            '/api/medication_sku/medication_skus/bulk_create/',
+            payload,
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        for item in res.data:
+            medication_sku = MedicationSKU.objects.get(id=item['id'])
+            self.assertIn(tag_existing, medication_sku.tags.all())
+            self.assertEqual(medication_sku.tags.count(), 2)
+            self.assertEqual(len(item['tags']), 2)
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test bulk create query count does not grow with payload size"""
+        def payload(prefix, count):
+            return [
+                {
+                    'medication_name': f'{prefix} {i}',
+                    'presentation': 'Tablet',
+                    'dose': 50,
+                    'unit': 'mg',
+                    'tags': [{'name': f'{prefix} tag {i}'},
+                             {'name': 'Shared'}],
+                }
+                for i in range(count)
+            ]
+
+        url = '/api/medication_sku/medication_skus/bulk_create/'
+        with CaptureQueriesContext(connection) as small:
+            res = self.client.post(url, payload('Small', 2), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.post(url, payload('Large', 30), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_create_duplicate_names_fails(self):
+        """Test bulk create rejects names that already exist or repeat"""
+        create_medication_sku(user=self.user, medication_name='Ibuprofen')
+        payload = [
+            {
+                'medication_name': 'Ibuprofen',
+                'presentation': 'Tablet',
+                'dose': 50,
+                'unit': 'mg',
+            },
+            {
+                'medication_name': 'Aspirin',
+                'presentation': 'Tablet',
+                'dose': 50,
+                'unit': 'mg',
+            },
+            {
+                'medication_name': 'Aspirin',
+                'presentation': 'Capsule',
+                'dose': 100,
+                'unit': 'mg',
+            },
+        ]
+
+        res = self.client.post(
+            '/api/medication_sku/medication_skus/bulk_create/',
+            payload,
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('medication_name', res.data[0])
+        self.assertEqual(res.data[1], {})
+        self.assertIn('medication_name', res.data[2])
+        self.assertEqual(MedicationSKU.objects.count(), 1)
+
+
+class BulkUpsertTests(TestCase):
+    """Test upserting medication SKUs in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.url = BULK_CREATE_URL + '?mode=upsert'
+
+    def test_upsert_creates_and_updates(self):
+        """Test existing SKUs are updated and new ones created"""
+        tag_old = Tag.objects.create(user=self.user, name='Old')
+        tag_kept = Tag.objects.create(user=self.user, name='Kept')
+        existing = create_medication_sku(user=self.user,
+                                         medication_name='Aspirin')
+        existing.tags.add(tag_old, tag_kept)
+        payload = [
+            {
+                'medication_name': 'Aspirin',
+                'presentation': 'Capsule',
+                'dose': 100,
+                'unit': 'mg',
+                'tags': [{'name': 'Kept'}, {'name': 'New'}],
+            },
+            {
+                'medication_name': 'Ibuprofen',
+                'presentation': 'Tablet',
+                'dose': 200,
+                'unit': 'mg',
+            },
+        ]
+
+        res = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['updated'], 1)
+        self.assertEqual(res.data['results'][0]['id'], existing.id)
+        existing.refresh_from_db()
+        self.assertEqual(existing.presentation, 'Capsule')
+        self.assertEqual(existing.dose, 100)
+        self.assertCountEqual(
+            [tag.name for tag in existing.tags.all()], ['Kept', 'New']
+        )
+        self.assertTrue(MedicationSKU.objects.filter(
+            medication_name='Ibuprofen', user=self.user,
+        ).exists())
+
+    def test_upsert_without_tags_keeps_tags(self):
+        """Test tags are left alone when the payload has none"""
+        tag = Tag.objects.create(user=self.user, name='Analgesic')
+        existing = create_medication_sku(user=self.user,
+                                         medication_name='Aspirin')
+        existing.tags.add(tag)
+        payload = [{
+            'medication_name': 'Aspirin',
+            'presentation': 'Tablet',
+            'dose': 75,
+            'unit': 'mg',
+        }]
+
+        res = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(existing.tags.all()), [tag])
+
+    def test_upsert_other_users_sku_fails(self):
+        """Test SKUs of another user can't be upserted"""
+        other_user = create_user(email='other@example.com',
+                                 password='testpass123')
+        create_medication_sku(user=other_user, medication_name='Aspirin',
+                              dose=50)
+        payload = [{
+            'medication_name': 'Aspirin',
+            'presentation': 'Tablet',
+            'dose': 75,
+            'unit': 'mg',
+        }]
+
+        res = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('medication_name', res.data[0])
+        self.assertEqual(
+            MedicationSKU.objects.get(medication_name='Aspirin').dose, 50
+        )
+
+    def test_upsert_repeated_name_fails(self):
+        """Test a name can only appear once per upsert"""
+        item = {
+            'medication_name': 'Aspirin',
+            'presentation': 'Tablet',
+            'dose': 75,
+            'unit': 'mg',
+        }
+
+        res = self.client.post(self.url, [item, item], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('medication_name', res.data[1])
+
+    def test_invalid_mode(self):
+        """Test an unknown bulk mode is rejected"""
+        res = self.client.post(BULK_CREATE_URL + '?mode=merge', [],
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkCreateChunkedTests(TestCase):
+    """Test atomic and chunked bulk creation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _item(self, name, **fields):
+        item = {
+            'medication_name': name,
+            'presentation': 'Tablet',
+            'dose': 50,
+            'unit': 'mg',
+            'tags': [{'name': 'Generic'}],
+        }
+        item.update(fields)
+        return item
+
+    def test_failed_tag_assignment_rolls_back(self):
+        """Test SKUs aren't kept without their tags"""
+        payload = [self._item('Aspirin'), self._item('Ibuprofen')]
+
+        with patch('medication_sku.bulk.assign_tags',
+                   side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                self.client.post(BULK_CREATE_URL, payload, format='json')
+
+        self.assertFalse(MedicationSKU.objects.exists())
+
+    def test_concurrent_insert_reports_item(self):
+        """Test a name taken after the validation is an item error"""
+        create_medication_sku(user=self.user, medication_name='Ibuprofen')
+        payload = [self._item('Aspirin'), self._item('Ibuprofen')]
+        name_conflicts = bulk.name_conflicts
+        calls = []
+
+        def taken_after_validation(names, *args):
+            # the validation runs before the concurrent insert
+            calls.append(names)
+            if len(calls) == 1:
+                return [None] * len(names)
+            return name_conflicts(names, *args)
+
+        with patch('medication_sku.bulk.name_conflicts',
+                   side_effect=taken_after_validation):
+            res = self.client.post(BULK_CREATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, [
+            {}, {'medication_name': ['This field must be unique.']},
+        ])
+        self.assertEqual(MedicationSKU.objects.count(), 1)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_non_atomic_reports_item_status(self):
+        """Test the valid items are created and the invalid reported"""
+        create_medication_sku(user=self.user, medication_name='Existing')
+        payload = [
+            self._item('Aspirin'),
+            self._item('Existing'),
+            self._item('Ibuprofen', dose='not a number'),
+            self._item('Paracetamol'),
+        ]
+
+        res = self.client.post(BULK_CREATE_URL + '?atomic=false', payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual(
+            [result['status'] for result in res.data['results']],
+            ['created', 'failed', 'failed', 'created'],
+        )
+        self.assertIn('medication_name', res.data['results'][1]['errors'])
+        self.assertIn('dose', res.data['results'][2]['errors'])
+        aspirin = MedicationSKU.objects.get(id=res.data['results'][0]['id'])
+        self.assertEqual(aspirin.medication_name, 'Aspirin')
+        self.assertEqual(aspirin.tags.get().name, 'Generic')
+
+    def test_non_atomic_all_valid(self):
+        """Test a fully valid chunked payload returns 201"""
+        payload = [self._item('Aspirin'), self._item('Ibuprofen')]
+
+        res = self.client.post(BULK_CREATE_URL + '?atomic=false', payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(MedicationSKU.objects.count(), 2)
+
+    def test_non_atomic_upsert(self):
+        """Test chunked upserts report updated items"""
+        create_medication_sku(user=self.user, medication_name='Aspirin')
+        payload = [self._item('Aspirin', dose=75), self._item('Ibuprofen')]
+
+        res = self.client.post(BULK_CREATE_URL + '?atomic=false&mode=upsert',
+                               payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [result['status'] for result in res.data['results']],
+            ['updated', 'created'],
+        )
+
+    def test_non_atomic_nothing_valid(self):
+        """Test a chunked payload without valid items returns 400"""
+        res = self.client.post(BULK_CREATE_URL + '?atomic=false',
+                               [{'medication_name': 'Aspirin'}],
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['failed'], 1)
+
+    def test_invalid_atomic(self):
+        """Test an invalid atomic flag is rejected"""
+        res = self.client.post(BULK_CREATE_URL + '?atomic=maybe', [],
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('atomic', res.data)
+
+
+class BulkUpdateDeleteTests(TestCase):
+    """Test updating and deleting medication SKUs in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.other_user = create_user(email='other@example.com',
+                                      password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _create_skus(self, prefix, count, user=None):
+        return [
+            create_medication_sku(user=user or self.user,
+                                  medication_name=f'{prefix} {i}')
+            for i in range(count)
+        ]
+
+    def test_bulk_update(self):
+        """Test fields and tags of several SKUs are updated"""
+        sku1, sku2 = self._create_skus('Medication', 2)
+        sku2.tags.add(Tag.objects.create(user=self.user, name='Old'))
+        payload = [
+            {'id': sku1.id, 'dose': 75, 'tags': [{'name': 'New'}]},
+            {'id': sku2.id, 'medication_name': 'Renamed', 'tags': []},
+        ]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data],
+                         [sku1.id, sku2.id])
+        sku1.refresh_from_db()
+        sku2.refresh_from_db()
+        self.assertEqual(sku1.dose, 75)
+        self.assertEqual([tag.name for tag in sku1.tags.all()], ['New'])
+        self.assertEqual(sku2.medication_name, 'Renamed')
+        self.assertEqual(sku2.tags.count(), 0)
+
+    def test_bulk_update_sends_changes_once(self):
+        """Test changed fields and tags are announced in one signal"""
+        sku1, sku2 = self._create_skus('Medication', 2)
+        payload = [
+            {'id': sku1.id, 'dose': 75},
+            {'id': sku2.id, 'tags': [{'name': 'New'}]},
+        ]
+        sent = []
+
+        def receiver(sender, ids, **kwargs):
+            sent.append(sorted(ids))
+
+        medication_skus_changed.connect(receiver)
+        self.addCleanup(medication_skus_changed.disconnect, receiver)
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sent, [sorted([sku1.id, sku2.id])])
+
+    def test_bulk_update_other_users_sku_fails(self):
+        """Test nothing is updated when an id belongs to another user"""
+        own_sku, = self._create_skus('Own', 1)
+        other_sku, = self._create_skus('Other', 1, user=self.other_user)
+        payload = [
+            {'id': own_sku.id, 'dose': 75},
+            {'id': other_sku.id, 'dose': 75},
+        ]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(res.data['ids'], [other_sku.id])
+        own_sku.refresh_from_db()
+        other_sku.refresh_from_db()
+        self.assertNotEqual(own_sku.dose, 75)
+        self.assertNotEqual(other_sku.dose, 75)
+
+    def test_bulk_update_invalid_items(self):
+        """Test ids are required and ids and names must be unique"""
+        sku1, sku2 = self._create_skus('Medication', 2)
+        payload = [
+            {'id': sku2.id, 'medication_name': sku2.medication_name},
+            {'id': sku1.id, 'medication_name': sku2.medication_name},
+            {'id': sku2.id},
+            {'dose': 75},
+        ]
+
+        res = self.client.patch(BULK_UPDATE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('medication_name', res.data[1])
+        self.assertIn('id', res.data[2])
+        self.assertIn('id', res.data[3])
+
+    def test_bulk_update_query_count_is_constant(self):
+        """Test bulk update query count does not grow with payload size"""
+        def payload(medication_skus):
+            return [{'id': sku.id, 'dose': 75, 'tags': [{'name': 'Shared'}]}
+                    for sku in medication_skus]
+
+        Tag.objects.create(user=self.user, name='Shared')
+        small_skus = self._create_skus('Small', 2)
+        large_skus = self._create_skus('Large', 30)
+        with CaptureQueriesContext(connection) as small:
+            res = self.client.patch(BULK_UPDATE_URL, payload(small_skus),
+                                    format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.patch(BULK_UPDATE_URL, payload(large_skus),
+                                    format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_delete(self):
+        """Test SKUs and their tag links are deleted"""
+        sku1, sku2, sku3 = self._create_skus('Medication', 3)
+        tag = Tag.objects.create(user=self.user, name='Tag')
+        sku1.tags.add(tag)
+        sku3.tags.add(tag)
+
+        res = self.client.post(BULK_DELETE_URL, {'ids': [sku1.id, sku2.id]},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(MedicationSKU.objects.all()), [sku3])
+        self.assertEqual(MedicationSKU.tags.through.objects.count(), 1)
+        self.assertTrue(Tag.objects.filter(id=tag.id).exists())
+
+    def test_bulk_delete_other_users_sku_fails(self):
+        """Test nothing is deleted when an id belongs to another user"""
+        own_sku, = self._create_skus('Own', 1)
+        other_sku, = self._create_skus('Other', 1, user=self.other_user)
+
+        res = self.client.post(BULK_DELETE_URL,
+                               {'ids': [own_sku.id, other_sku.id]},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(res.data['ids'], [other_sku.id])
+        self.assertEqual(MedicationSKU.objects.count(), 2)
+
+    def test_bulk_delete_query_count_is_constant(self):
+        """Test bulk delete query count does not grow with payload size"""
+        small_skus = self._create_skus('Small', 2)
+        large_skus = self._create_skus('Large', 30)
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(BULK_DELETE_URL,
+                             {'ids': [sku.id for sku in small_skus]},
+                             format='json')
+
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(BULK_DELETE_URL,
+                             {'ids': [sku.id for sku in large_skus]},
+                             format='json')
+
+        self.assertEqual(MedicationSKU.objects.count(), 0)
+        self.assertEqual(len(small), len(large))
+
+
+class MedicationSKUFilterTests(TestCase):
+    """Test filtering the medication SKU list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpass123')
+        self.client.force_authenticate(self.user)
+
+        self.tag_antibiotic = Tag.objects.create(user=self.user,
+                                                 name='Antibiotic')
+        self.tag_generic = Tag.objects.create(user=self.user, name='Generic')
+        self.amoxicillin = create_medication_sku(
+            user=self.user, medication_name='Amoxicillin',
+            presentation='Capsule', dose=500, unit='mg',
+        )
+        self.amoxicillin.tags.add(self.tag_antibiotic, self.tag_generic)
+        self.azithromycin = create_medication_sku(
+            user=self.user, medication_name='Azithromycin',
+            presentation='Tablet', dose=250, unit='mg',
+        )
+        self.azithromycin.tags.add(self.tag_antibiotic)
+        self.ibuprofen = create_medication_sku(
+            user=self.user, medication_name='Ibuprofen',
+            presentation='Tablet', dose=400, unit='mg',
+        )
+        self.ibuprofen.tags.add(self.tag_generic)
+        self.syrup = create_medication_sku(
+            user=self.user, medication_name='Paracetamol Syrup',
+            presentation='Syrup', dose=120, unit='ml',
+        )
+
+    def assertListed(self, params, expected):
+        """Assert the list filtered by `params` returns `expected`"""
+        res = self.client.get(MEDICATION_SKU_LIST_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            [item['id'] for item in res.data['results']],
+            [medication_sku.id for medication_sku in expected],
+        )
+
+    def test_filter_by_presentation_and_unit(self):
+        """Test filtering by exact presentation and unit"""
+        self.assertListed({'presentation': 'Tablet', 'unit': 'mg'},
+                          [self.azithromycin, self.ibuprofen])
+
+    def test_filter_by_dose_range(self):
+        """Test filtering by a dose range"""
+        self.assertListed({'dose_min': 200, 'dose_max': 450},
+                          [self.azithromycin, self.ibuprofen])
+
+    def test_filter_by_any_tag(self):
+        """Test filtering by any of the tag ids"""
+        tags = f'{self.tag_antibiotic.id},{self.tag_generic.id}'
+        self.assertListed(
+            {'tags': tags},
+            [self.amoxicillin, self.azithromycin, self.ibuprofen],
+        )
+
+    def test_filter_by_all_tags(self):
+        """Test filtering by all of the tag ids"""
+        tags = f'{self.tag_antibiotic.id},{self.tag_generic.id}'
+        self.assertListed({'tags': tags, 'tags_match': 'all'},
+                          [self.amoxicillin])
+
+    def test_filter_by_tag_names(self):
+        """Test filtering by tag names"""
+        self.assertListed({'tag_names': 'Antibiotic'},
+                          [self.amoxicillin, self.azithromycin])
+
+    def test_search_medication_name(self):
+        """Test searching a substring of the medication name"""
+        self.assertListed({'search': 'CIL'}, [self.amoxicillin])
+
+    def test_prefix_medication_name(self):
+        """Test searching a prefix of the medication name"""
+        self.assertListed({'prefix': 'a'},
+                          [self.amoxicillin, self.azithromycin])
+
+    def test_invalid_filter_returns_error(self):
+        """Test invalid filter values are rejected"""
+        res = self.client.get(MEDICATION_SKU_LIST_URL, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
 
 class MedicationSKUOwnershipTests(TestCase):
     """Test ownership permissions for medication SKU CRUD operations"""
@@ -510,6 +1126,54 @@ class MedicationSKUOwnershipTests(TestCase):
         self.assertIn(tag_sedative, medication_sku.tags.all())
         self.assertNotIn(tag_vaccine, medication_sku.tags.all())
 
+    def test_noop_update_writes_nothing(self):
+        """Test resending the current values doesn't write anything"""
+        self.client.force_authenticate(user=self.user1)
+        medication_sku = create_medication_sku(user=self.user1)
+        for name in ['Analgesic', 'Oral', 'Generic']:
+            medication_sku.tags.add(
+                Tag.objects.create(user=self.user1, name=name)
+            )
+        payload = {
+            'presentation': medication_sku.presentation,
+            'tags': [{'name': 'Analgesic'}, {'name': 'Oral'},
+                     {'name': 'Generic'}],
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(medication_sku.id), payload,
+                                    format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        writes = [query['sql'] for query in queries
+                  if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+
+    def test_update_tags_only_changes_diff(self):
+        """Test only the added and removed tags are written"""
+        self.client.force_authenticate(user=self.user1)
+        medication_sku = create_medication_sku(user=self.user1)
+        tag_kept = Tag.objects.create(user=self.user1, name='Kept')
+        tag_removed = Tag.objects.create(user=self.user1, name='Removed')
+        medication_sku.tags.add(tag_kept, tag_removed)
+        kept_link = MedicationSKU.tags.through.objects.get(tag=tag_kept)
+        updated_at = MedicationSKU.objects.get(
+            id=medication_sku.id
+        ).updated_at
+
+        payload = {'tags': [{'name': 'Kept'}, {'name': 'Added'}]}
+        res = self.client.patch(detail_url(medication_sku.id), payload,
+                                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual([tag['name'] for tag in res.data['tags']],
+                              ['Kept', 'Added'])
+        self.assertTrue(MedicationSKU.tags.through.objects.filter(
+            id=kept_link.id, tag=tag_kept,
+        ).exists())
+        medication_sku.refresh_from_db()
+        self.assertGreater(medication_sku.updated_at, updated_at)
+
 
 def test_clear_medication_sku_tags(self):
     """Test clearing medication SKU tags"""
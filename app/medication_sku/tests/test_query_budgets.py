@@ -0,0 +1,82 @@
+"""
+Tests for the query-count budgets of the medication SKU APIs
+"""
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku.tests.query_budget import QueryBudgetMixin
+
+MEDICATION_SKU_LIST_URL = reverse('medication_sku:medication_skus-list')
+TAGS_URL = reverse('medication_sku:tag-list')
+
+
+def detail_url(medication_sku_id):
+    """Create and return a medication SKU detail URL"""
+    return reverse('medication_sku:medication_skus-detail',
+                   args=[medication_sku_id])
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test endpoints do not issue a query per object"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}')
+                for i in range(3)]
+        self.medication_skus = []
+        for i in range(10):
+            medication_sku = MedicationSKU.objects.create(
+                user=self.user,
+                medication_name=f'Medication {i}',
+                presentation='Tablet',
+                dose=50,
+                unit='mg',
+            )
+            medication_sku.tags.set(tags)
+            self.medication_skus.append(medication_sku)
+
+    def test_medication_sku_list_budget(self):
+        """Test listing SKUs with tags stays within budget"""
+        res = self.assertWithinQueryBudget(
+            'medication_skus-list',
+            self.client.get, MEDICATION_SKU_LIST_URL,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 10)
+        for item in res.data['results']:
+            self.assertEqual(len(item['tags']), 3)
+
+    def test_medication_sku_detail_budget(self):
+        """Test retrieving a SKU with tags stays within budget"""
+        url = detail_url(self.medication_skus[0].id)
+        res = self.assertWithinQueryBudget(
+            'medication_skus-detail',
+            self.client.get, url,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 3)
+
+    def test_tag_list_budget(self):
+        """Test listing tags stays within budget"""
+        res = self.assertWithinQueryBudget(
+            'tag-list',
+            self.client.get, TAGS_URL,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 3)
@@ -0,0 +1,134 @@
+"""
+Tests for the read replica routing
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (SimpleTestCase,
+                         TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import MedicationSKU
+from medication_sku.cache import response_cache
+
+MEDICATION_SKU_LIST_URL = reverse('medication_sku:medication_skus-list')
+TAG_LIST_URL = reverse('medication_sku:tag-list')
+
+
+@override_settings(REPLICA_DATABASES=['replica_0'])
+class ReadReplicaRouterTests(SimpleTestCase):
+    """Test the database router"""
+
+    def setUp(self):
+        self.router = routers.ReadReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        """Test reads outside replica_reads() go to the primary"""
+        self.assertIsNone(self.router.db_for_read(MedicationSKU))
+
+    def test_replica_reads(self):
+        """Test reads inside replica_reads() go to a replica"""
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(MedicationSKU),
+                             'replica_0')
+
+        self.assertIsNone(self.router.db_for_read(MedicationSKU))
+
+    def test_write_pins_primary(self):
+        """Test reads after a write stay on the primary"""
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_write(MedicationSKU),
+                             'default')
+            self.assertIsNone(self.router.db_for_read(MedicationSKU))
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas(self):
+        """Test reads go to the primary when there are no replicas"""
+        with routers.replica_reads():
+            self.assertIsNone(self.router.db_for_read(MedicationSKU))
+
+    def test_migrations_on_primary_only(self):
+        """Test replicas are never migrated"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+
+
+@override_settings(REPLICA_DATABASES=['replica_0'])
+@patch('medication_sku.replicas.replica_reads')
+class ReplicaReadViewTests(TestCase):
+    """Test which requests of the viewsets read replicas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_safe_requests_read_replicas(self, replica_reads):
+        """Test the list endpoints read a replica"""
+        for url in (MEDICATION_SKU_LIST_URL, TAG_LIST_URL):
+            self.client.get(url)
+
+        self.assertEqual(replica_reads.call_count, 2)
+        self.assertEqual(replica_reads.return_value.__exit__.call_count, 2)
+
+    def test_write_sticks_to_primary(self, replica_reads):
+        """Test users read the primary right after writing"""
+        res = self.client.post(MEDICATION_SKU_LIST_URL, {
+            'medication_name': 'Aspirin',
+            'presentation': 'Tablet',
+            'dose': 50,
+            'unit': 'mg',
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertTrue(routers.is_sticky(self.user))
+        self.client.get(MEDICATION_SKU_LIST_URL)
+        replica_reads.assert_not_called()
+
+    def test_failed_write_not_sticky(self, replica_reads):
+        """Test rejected writes don't keep the user on the primary"""
+        res = self.client.post(MEDICATION_SKU_LIST_URL, {}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertFalse(routers.is_sticky(self.user))
+
+
+# the primary stands in for the replica, its alias is all the cache sees
+@override_settings(REPLICA_DATABASES=['default'], RESPONSE_CACHE_ENABLED=True)
+class ReplicaResponseCacheTests(TestCase):
+    """Test responses read from replicas never fill the response cache"""
+
+    def setUp(self):
+        cache.clear()
+        response_cache.cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_replica_reads_not_cached(self):
+        """Test list responses read from a replica aren't stored"""
+        for _ in range(2):
+            res = self.client.get(MEDICATION_SKU_LIST_URL)
+            self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_primary_reads_cached(self):
+        """Test responses of sticky users, read from the primary, are"""
+        routers.mark_sticky(self.user)
+        self.client.get(MEDICATION_SKU_LIST_URL)
+
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
@@ -0,0 +1,119 @@
+"""
+Tests for the medication SKU response cache
+"""
+
+from django.contrib.auth import get_user_model
+from django.test import (TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku.cache import response_cache
+
+MEDICATION_SKU_LIST_URL = reverse('medication_sku:medication_skus-list')
+BULK_CREATE_URL = reverse('medication_sku:medication_skus-bulk-create')
+
+
+def detail_url(medication_sku_id):
+    """Create and return a medication SKU detail URL"""
+    return reverse('medication_sku:medication_skus-detail',
+                   args=[medication_sku_id])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTests(TestCase):
+    """Test responses are cached and invalidated on writes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.medication_sku = MedicationSKU.objects.create(
+            user=self.user,
+            medication_name='Amoxicillin',
+            presentation='Tablet',
+            dose=50,
+            unit='mg',
+        )
+        response_cache.reset_stats()
+
+    def test_list_served_from_cache(self):
+        """Test the second list request doesn't query the database"""
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(MEDICATION_SKU_LIST_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, res.data)
+        self.assertEqual(cached['ETag'], res['ETag'])
+        self.assertEqual(response_cache.stats()['hits'], 1)
+        self.assertEqual(response_cache.stats()['misses'], 1)
+
+    def test_cached_revalidation_not_modified(self):
+        """Test a cached response is revalidated without queries"""
+        url = detail_url(self.medication_sku.id)
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_update_invalidates(self):
+        """Test updating a SKU invalidates the cached detail"""
+        url = detail_url(self.medication_sku.id)
+        self.client.get(url)
+
+        self.client.patch(url, {'presentation': 'Capsule'})
+        res = self.client.get(url)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['presentation'], 'Capsule')
+
+    def test_tag_rename_invalidates(self):
+        """Test renaming a tag invalidates the cached list"""
+        tag = Tag.objects.create(user=self.user, name='Antibiotic')
+        self.medication_sku.tags.add(tag)
+        self.client.get(MEDICATION_SKU_LIST_URL)
+
+        tag.name = 'Antiviral'
+        tag.save()
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'],
+                         'Antiviral')
+
+    def test_bulk_create_invalidates(self):
+        """Test bulk creating SKUs invalidates the cached list"""
+        self.client.get(MEDICATION_SKU_LIST_URL)
+
+        self.client.post(BULK_CREATE_URL, [{
+            'medication_name': 'Ibuprofen',
+            'presentation': 'Tablet',
+            'dose': 200,
+            'unit': 'mg',
+        }], format='json')
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data['results']), 2)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_cache_disabled(self):
+        """Test responses are not cached when disabled"""
+        self.client.get(MEDICATION_SKU_LIST_URL)
+        res = self.client.get(MEDICATION_SKU_LIST_URL)
+
+        self.assertNotIn('X-Cache', res)
+        self.assertEqual(response_cache.stats()['hits'], 0)
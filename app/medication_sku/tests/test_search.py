@@ -0,0 +1,159 @@
+"""
+Tests for the medication SKU search
+"""
+import io
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (MedicationSKU,
+                         Tag)
+from medication_sku import (bulk,
+                            importer)
+
+SEARCH_URL = reverse('medication_sku:medication_skus-search')
+
+postgresql_only = skipUnless(connection.vendor == 'postgresql',
+                             'ranked search needs PostgreSQL')
+
+
+def create_medication_sku(user, name, presentation='Tablet', tags=()):
+    """Create a medication SKU tagged with `tags` names"""
+    medication_sku = MedicationSKU.objects.create(
+        user=user, medication_name=name, presentation=presentation,
+        dose=50, unit='mg',
+    )
+    for tag in tags:
+        medication_sku.tags.add(Tag.objects.get_or_create(
+            user=user, name=tag,
+        )[0])
+
+    return medication_sku
+
+
+def names(res):
+    """Return the names of the SKUs of a search response"""
+    return [item['medication_name'] for item in res.data['results']]
+
+
+class SearchApiTests(TestCase):
+    """Test searching medication SKUs"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        create_medication_sku(self.user, 'Amoxicillin 500',
+                              presentation='Capsule', tags=['Antibiotic'])
+        create_medication_sku(self.user, 'Ibuprofen 200',
+                              tags=['Analgesic'])
+        create_medication_sku(self.user, 'Paracetamol 500',
+                              presentation='Syrup', tags=['Analgesic'])
+
+    def test_search_name_prefix(self):
+        """Test the start of a name finds the SKU"""
+        res = self.client.get(SEARCH_URL, {'q': 'amox'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(names(res), ['Amoxicillin 500'])
+        self.assertEqual(res.data['count'], 1)
+
+    def test_search_tag_and_presentation(self):
+        """Test tag names and presentations are searched"""
+        res = self.client.get(SEARCH_URL, {'q': 'analgesic'})
+        self.assertEqual(sorted(names(res)),
+                         ['Ibuprofen 200', 'Paracetamol 500'])
+
+        res = self.client.get(SEARCH_URL, {'q': 'syrup'})
+        self.assertEqual(names(res), ['Paracetamol 500'])
+
+    def test_search_with_filters(self):
+        """Test the list filters apply to the results"""
+        res = self.client.get(SEARCH_URL, {'q': 'analgesic',
+                                           'presentation': 'Tablet'})
+
+        self.assertEqual(names(res), ['Ibuprofen 200'])
+
+    def test_search_query_required(self):
+        """Test searching without a query is rejected"""
+        res = self.client.get(SEARCH_URL, {'q': ' a '})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('q', res.data)
+
+    @postgresql_only
+    def test_search_misspelled_name(self):
+        """Test a misspelled name finds the SKU"""
+        res = self.client.get(SEARCH_URL, {'q': 'amoxicilin'})
+
+        self.assertEqual(names(res), ['Amoxicillin 500'])
+
+    @postgresql_only
+    def test_search_ranking(self):
+        """Test name matches rank above tag matches"""
+        create_medication_sku(self.user, 'Naproxen',
+                              tags=['Paracetamol alternative'])
+
+        res = self.client.get(SEARCH_URL, {'q': 'paracetamol'})
+
+        self.assertEqual(names(res), ['Paracetamol 500', 'Naproxen'])
+
+    @postgresql_only
+    def test_search_vector_follows_writes(self):
+        """Test renames, tag changes and bulk writes are searchable"""
+        medication_sku = MedicationSKU.objects.get(
+            medication_name='Ibuprofen 200',
+        )
+        medication_sku.medication_name = 'Naproxen 250'
+        medication_sku.save()
+        Tag.objects.filter(name='Antibiotic').get().delete()
+        bulk.create_medication_skus(self.user, [{
+            'medication_name': 'Cetirizine 10', 'presentation': 'Tablet',
+            'dose': 10, 'unit': 'mg', 'tags': [{'name': 'Antihistamine'}],
+        }])
+
+        self.assertEqual(
+            names(self.client.get(SEARCH_URL, {'q': 'naproxen'})),
+            ['Naproxen 250'],
+        )
+        self.assertEqual(
+            names(self.client.get(SEARCH_URL, {'q': 'antibiotic'})), [],
+        )
+        self.assertEqual(
+            names(self.client.get(SEARCH_URL, {'q': 'antihistamine'})),
+            ['Cetirizine 10'],
+        )
+
+    @postgresql_only
+    def test_search_generated_catalog(self):
+        """Test the SKUs loaded by generate_catalog with COPY are searchable"""
+        call_command('generate_catalog', skus=20, users=1, tags_per_user=2,
+                     chunk_size=8, stdout=io.StringIO())
+
+        self.assertFalse(
+            MedicationSKU.objects.filter(search_vector__isnull=True).exists()
+        )
+
+    @postgresql_only
+    def test_search_copy_imported(self):
+        """Test the SKUs imported through the staging table are searchable"""
+        importer.copy_import_medication_skus(self.user, [
+            (1, {'medication_name': 'Cetirizine 10', 'presentation': 'Tablet',
+                 'dose': 10, 'unit': 'mg',
+                 'tags': [{'name': 'Antihistamine'}]}, None),
+        ])
+
+        self.assertEqual(
+            names(self.client.get(SEARCH_URL, {'q': 'antihistamine'})),
+            ['Cetirizine 10'],
+        )
@@ -0,0 +1,44 @@
+"""
+Tests for the synthetic catalog generator
+"""
+import random
+from collections import Counter
+
+from django.test import SimpleTestCase
+
+from medication_sku import synthetic
+
+
+class SyntheticCatalogTests(SimpleTestCase):
+    """Test generating reproducible, realistic catalogs"""
+
+    def test_seed_reproduces_catalog(self):
+        """Test the same seed generates the same SKUs"""
+        tags = synthetic.tag_names(10)
+
+        first = list(synthetic.catalog(random.Random(1), 50, 5, tags))
+        second = list(synthetic.catalog(random.Random(1), 50, 5, tags))
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            len({item['medication_name'] for _, item in first}), 50,
+        )
+
+    def test_zipf_popularity(self):
+        """Test the first ranked users and tags own most SKUs"""
+        tags = synthetic.tag_names(20)
+
+        rows = list(synthetic.catalog(random.Random(0), 2000, 10, tags,
+                                      tags_per_sku=1))
+
+        users = Counter(user for user, _ in rows)
+        picked = Counter(item['tags'][0]['name'] for _, item in rows)
+        self.assertGreater(users[0], 3 * users[9])
+        self.assertGreater(picked[tags[0]], 3 * picked[tags[-1]])
+
+    def test_units_match_presentation(self):
+        """Test units and doses are plausible for the presentation"""
+        for _, item in synthetic.catalog(random.Random(0), 200, 1, ['OTC']):
+            units = synthetic.PRESENTATIONS[item['presentation']][1]
+            self.assertIn(item['unit'], units)
+            self.assertIn(item['dose'], synthetic.DOSES[item['unit']])
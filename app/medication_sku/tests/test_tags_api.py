@@ -1,10 +1,13 @@
 """
 Tests for the tags API
 """
+import base64
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -53,11 +56,59 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL)
 
-        tags = Tag.objects.all().order_by('-name')
+        tags = Tag.objects.all().order_by('-name', '-id')
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_retrieve_tags_paginated(self):
+        """Test tags are paginated by descending name"""
+        for name in ['Antibiotic', 'Pain relief', 'Sedative', 'Vaccine']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 3})
+        names = [tag['name'] for tag in res.data['results']]
+        res = self.client.get(res.data['next'])
+        names.extend(tag['name'] for tag in res.data['results'])
+
+        self.assertEqual(names,
+                         ['Vaccine', 'Sedative', 'Pain relief', 'Antibiotic'])
+        self.assertIsNone(res.data['next'])
+
+    def test_paginate_duplicate_names(self):
+        """Test tags sharing a name are paged by id, without an offset"""
+        for email in ['other1@example.com', 'other2@example.com']:
+            user = create_user(email=email)
+            for name in ['Antibiotic', 'Vaccine']:
+                Tag.objects.create(user=user, name=name)
+        expected = list(Tag.objects.order_by('-name', '-id').values_list(
+            'id', flat=True,
+        ))
+
+        ids, pages = [], []
+        url = TAGS_URL + '?page_size=3'
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                res = self.client.get(url)
+            pages.append([tag['id'] for tag in res.data['results']])
+            ids.extend(pages[-1])
+            url = res.data['next']
+            self.assertFalse(any('OFFSET' in query['sql']
+                                 for query in context.captured_queries))
+
+        self.assertEqual(ids, expected)
+        res = self.client.get(res.data['previous'])
+        self.assertEqual([tag['id'] for tag in res.data['results']],
+                         pages[-2])
+
+    def test_invalid_cursor(self):
+        """Test a cursor holding wrong values answers 404"""
+        cursor = base64.b64encode(b'p=%5B%22abc%22%5D').decode()
+
+        res = self.client.get(TAGS_URL, {'cursor': cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_update_tag(self):
         """Test updating tag"""
@@ -8,15 +8,27 @@ from django.urls import (
 
 from rest_framework.routers import DefaultRouter
 
-from medication_sku import views as medication_sku_views
+from medication_sku import (async_views,
+                            views as medication_sku_views)
 
 router = DefaultRouter()
 router.register('medication_skus', medication_sku_views.MedicationSKUViewSet,
                 basename='medication_skus')
 router.register('tags', medication_sku_views.TagViewSet)
+router.register('bulk_jobs', medication_sku_views.BulkJobViewSet,
+                basename='bulk_jobs')
 
 app_name = 'medication_sku'
 
 urlpatterns = [
     path('', include(router.urls)),
+    # async variants of the read path, for ASGI deployments
+    path('async/medication_skus/',
+         async_views.MedicationSKUListView.as_view(),
+         name='async-medication-skus-list'),
+    path('async/medication_skus/<int:pk>/',
+         async_views.MedicationSKUDetailView.as_view(),
+         name='async-medication-skus-detail'),
+    path('async/tags/', async_views.TagListView.as_view(),
+         name='async-tags-list'),
 ]
@@ -1,18 +1,75 @@
 """
 Views for the recipe APIs
 """
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (OpenApiParameter,
+                                   extend_schema,
+                                   extend_schema_view)
 from rest_framework import (viewsets,
                             status,
                             permissions,
                             mixins)
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import BooleanField
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from core.models import (MedicationSKU,
+from core.models import (BulkJob,
+                         MedicationSKU,
                          Tag)
-from medication_sku import serializers
+from medication_sku import (autocomplete,
+                            bulk,
+                            importer,
+                            jobs,
+                            search,
+                            serializers)
+from medication_sku.cache import CachedResponseMixin
+from medication_sku.conditional import (ConditionalListMixin,
+                                        ConditionalRetrieveMixin)
+from medication_sku.export import (EXPORT_FORMATS,
+                                   aiter_blocks)
+from medication_sku.filters import (MEDICATION_SKU_FILTER_PARAMETERS,
+                                    filter_medication_skus)
+from medication_sku.pagination import (MedicationSKUPagination,
+                                       SearchPagination,
+                                       TagPagination)
+from medication_sku.replicas import ReplicaReadMixin
+from user.authentication import CachedTokenAuthentication
+
+
+BULK_MODES = ['create', 'upsert']
+BULK_MODE_PARAMETER = OpenApiParameter(
+    'mode', OpenApiTypes.STR, enum=BULK_MODES,
+    description='create (default) rejects existing names, upsert updates '
+                'the SKUs of the user with the same name',
+)
+ATOMIC_PARAMETER = OpenApiParameter(
+    'atomic', OpenApiTypes.BOOL,
+    description='true (default) writes all items or none, false writes '
+                'the valid items in chunks and reports the status of each',
+)
+ASYNC_PARAMETER = OpenApiParameter(
+    'async', OpenApiTypes.BOOL,
+    description='true queues the write as a background job processed in '
+                'chunks and answers 202 with the job, false (default) '
+                'writes during the request',
+)
+
+
+def _report_status(report):
+    """Return the response status of an import report"""
+    if not report.failed:
+        return status.HTTP_201_CREATED
+    if report.created or report.updated:
+        return status.HTTP_207_MULTI_STATUS
+
+    return status.HTTP_400_BAD_REQUEST
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -31,15 +88,40 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.user == request.user
 
 
-class MedicationSKUViewSet(viewsets.ModelViewSet):
+@extend_schema_view(
+    list=extend_schema(parameters=MEDICATION_SKU_FILTER_PARAMETERS),
+)
+class MedicationSKUViewSet(ReplicaReadMixin,
+                           CachedResponseMixin,
+                           ConditionalListMixin,
+                           ConditionalRetrieveMixin,
+                           viewsets.ModelViewSet):
     """View for manage the medication sku APIs"""
-    queryset = MedicationSKU.objects.all()
-    authentication_classes = [TokenAuthentication]
+    # the search vector is only read by the database
+    queryset = MedicationSKU.objects.defer('search_vector')
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = MedicationSKUPagination
+
+    def get_queryset(self):
+        """Return medication SKUs with the relations the action serializes"""
+        queryset = self.queryset
+        if self.action in ('list', 'export', 'search'):
+            queryset = filter_medication_skus(queryset,
+                                              self.request.query_params)
+
+        if self.action in ('list', 'retrieve', 'update', 'partial_update',
+                           'search'):
+            # load every tag of the page/object in one extra query
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+            )
+
+        return queryset
 
     def get_serializer_class(self):
         """Return serializer class for request"""
-        if self.action == 'list':
+        if self.action in ('list', 'search'):
             # For listing all medication SKUs
             return serializers.MedicationSKUSerializer
 
@@ -50,50 +132,395 @@ class MedicationSKUViewSet(viewsets.ModelViewSet):
         """Create a new medication sku"""
         serializer.save(user=self.request.user)
 
+    def _get_bulk_mode(self):
+        """Return the `mode` query parameter of bulk writes"""
+        mode = self.request.query_params.get('mode', 'create')
+        if mode not in BULK_MODES:
+            raise ValidationError({
+                'mode': [f'Must be one of: {", ".join(BULK_MODES)}.'],
+            })
+
+        return mode
+
+    def _get_flag(self, name, default):
+        """Return the boolean query parameter `name` of bulk writes"""
+        field = BooleanField()
+        try:
+            return field.to_internal_value(
+                self.request.query_params.get(name, default)
+            )
+        except ValidationError as exc:
+            raise ValidationError({name: exc.detail})
+
+    def _get_items(self, request):
+        """Return the list of items of a bulk payload"""
+        if not isinstance(request.data, list):
+            raise ValidationError({
+                'non_field_errors': [
+                    f'Expected a list of items but got type '
+                    f'"{type(request.data).__name__}".'
+                ],
+            })
+
+        return request.data
+
+    def _enqueue(self, request, rows, upsert):
+        """Queue parsed rows as a background job, answer with the job"""
+        job = jobs.enqueue(request.user, rows, upsert=upsert)
+        location = reverse('medication_sku:bulk_jobs-detail', args=[job.pk])
+
+        return Response(serializers.BulkJobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
+
+    def _serialize_skus(self, ids):
+        """Serialize the SKUs with `ids` in that order, tags prefetched"""
+        medication_skus = MedicationSKU.objects.filter(
+            id__in=ids
+        ).prefetch_related('tags').in_bulk()
+
+        return serializers.MedicationSKUSerializer(
+            [medication_skus[sku_id] for sku_id in ids],
+            many=True,
+        ).data
+
+    @extend_schema(parameters=[BULK_MODE_PARAMETER, ATOMIC_PARAMETER,
+                               ASYNC_PARAMETER])
     @action(detail=False, methods=['post'], url_path='bulk_create')
     def bulk_create(self, request):
-        """Bulk create medication SKUs with tags"""
-        data = request.data
-        serializer = self.get_serializer(data=data, many=True)
-
-        if serializer.is_valid():
-            skus_data = serializer.validated_data
-            medication_skus = []
-
-            # Create MedicationSKU instances
-            for item in skus_data:
-                tags = item.pop('tags', [])
-                medication_sku = MedicationSKU(**item, user=request.user)
-                medication_skus.append((medication_sku, tags))
-
-            # Bulk create SKUs without tags first
-            created_skus = MedicationSKU.objects.bulk_create(
-                [sku for sku, _ in medication_skus]
+        """
+        Bulk create medication SKUs with tags
+
+        With ?mode=upsert SKUs of the user with an existing name are
+        updated instead, their tags replaced when `tags` is given.
+
+        By default the payload is written in one transaction, any invalid
+        item fails the whole request. With ?atomic=false the valid items
+        are written chunk by chunk, each chunk in its own transaction, and
+        the response reports the status of every item.
+
+        With ?async=true the items are queued as a background job written
+        chunk by chunk like with ?atomic=false, the response is 202 with
+        the job whose status is polled at its Location.
+        """
+        upsert = self._get_bulk_mode() == 'upsert'
+        if self._get_flag('async', False):
+            return self._enqueue(
+                request,
+                ((index, item, None)
+                 for index, item in enumerate(self._get_items(request))),
+                upsert,
             )
+        if not self._get_flag('atomic', True):
+            return self._bulk_create_chunked(request, upsert)
 
-            # Assign tags to created SKUs
-            for medication_sku, tags in zip(created_skus, medication_skus):
-                self.get_serializer()._get_or_create_tags(
-                    tags[1],
-                    medication_sku
+        context = self.get_serializer_context()
+        if upsert:
+            context['upsert_user'] = request.user
+        serializer = serializers.MedicationSKUBulkSerializer(
+            data=request.data,
+            many=True,
+            context=context,
+        )
+
+        if not serializer.is_valid():
+            return Response(serializer.errors,
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if upsert:
+            try:
+                upserted = bulk.upsert_medication_skus(
+                    request.user,
+                    serializer.validated_data,
                 )
+            except bulk.OwnershipConflict as exc:
+                return Response({'detail': str(exc)},
+                                status=status.HTTP_409_CONFLICT)
+
+            created = sum(was_created for _, was_created in upserted)
+            return Response({
+                'created': created,
+                'updated': len(upserted) - created,
+                'results': self._serialize_skus(
+                    [sku_id for sku_id, _ in upserted]
+                ),
+            }, status=status.HTTP_200_OK)
+
+        try:
+            created_skus = bulk.create_medication_skus(
+                request.user,
+                serializer.validated_data,
+            )
+        except bulk.NameConflict as exc:
+            # taken by a concurrent request since the validation
+            return Response(
+                [{'medication_name': [serializers.UNIQUE_ERROR]}
+                 if item['medication_name'] in exc.names else {}
+                 for item in serializer.validated_data],
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(self._serialize_skus([sku.id for sku in created_skus]),
+                        status=status.HTTP_201_CREATED)
 
-            # Return serialized response
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def _bulk_create_chunked(self, request, upsert):
+        """Write the valid items of a bulk payload chunk by chunk"""
+        items = self._get_items(request)
+        report = importer.ItemReport()
+        importer.import_medication_skus(
+            request.user,
+            ((index, item, None) for index, item in enumerate(items)),
+            report=report,
+            upsert=upsert,
+        )
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict(), status=_report_status(report))
 
+    @extend_schema(
+        request=serializers.MedicationSKUBulkUpdateSerializer(many=True),
+        responses=serializers.MedicationSKUSerializer(many=True),
+    )
+    @action(detail=False, methods=['patch'], url_path='bulk_update')
+    def bulk_update(self, request):
+        """
+        Bulk update medication SKUs of the user
 
-class TagViewSet(mixins.DestroyModelMixin,
+        Takes a list of patches with the `id` of the SKU and the fields to
+        change. Nothing is updated when one of the ids isn't found among
+        the SKUs of the user.
+        """
+        serializer = serializers.MedicationSKUBulkUpdateSerializer(
+            data=request.data,
+            many=True,
+            partial=True,
+            context=self.get_serializer_context(),
+        )
+
+        if not serializer.is_valid():
+            return Response(serializer.errors,
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            ids = bulk.update_medication_skus(request.user,
+                                              serializer.validated_data)
+        except bulk.MissingMedicationSKUs as exc:
+            return Response({'detail': str(exc), 'ids': exc.ids},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        return Response(self._serialize_skus(ids), status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=serializers.MedicationSKUBulkDeleteSerializer,
+        responses={204: None},
+    )
+    @action(detail=False, methods=['post'], url_path='bulk_delete')
+    def bulk_delete(self, request):
+        """
+        Bulk delete medication SKUs of the user by id
+
+        Nothing is deleted when one of the ids isn't found among the SKUs
+        of the user.
+        """
+        serializer = serializers.MedicationSKUBulkDeleteSerializer(
+            data=request.data,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            bulk.delete_medication_skus(request.user,
+                                        serializer.validated_data['ids'])
+        except bulk.MissingMedicationSKUs as exc:
+            return Response({'detail': str(exc), 'ids': exc.ids},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(
+        parameters=MEDICATION_SKU_FILTER_PARAMETERS + [
+            OpenApiParameter('export_format', OpenApiTypes.STR,
+                             enum=list(EXPORT_FORMATS),
+                             description='ndjson (default) or csv'),
+        ],
+        responses={(200, 'application/x-ndjson'): OpenApiTypes.STR,
+                   (200, 'text/csv'): OpenApiTypes.STR},
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream the (filtered) catalog as NDJSON or CSV
+
+        Rows are read with a server-side cursor and written as they are
+        rendered, so memory use doesn't grow with the catalog size. Under
+        ASGI the blocks are handed to the server by an async iterator.
+        """
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({
+                'export_format': [f'Must be one of: '
+                                  f'{", ".join(EXPORT_FORMATS)}.'],
+            })
+
+        content_type, render = EXPORT_FORMATS[export_format]
+        queryset = self.get_queryset()
+        # rows are read after the view returned, keep the database it chose
+        content = render(queryset.using(queryset.db))
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_blocks(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="medication_skus.{export_format}"'
+        )
+
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, required=True,
+                             description='Words of the medication name, '
+                                         'presentation or tag names, '
+                                         'prefixes and misspellings of '
+                                         'the name match too'),
+        ] + MEDICATION_SKU_FILTER_PARAMETERS,
+        responses=serializers.MedicationSKUSerializer(many=True),
+    )
+    @action(detail=False, methods=['get'], url_path='search',
+            pagination_class=SearchPagination)
+    def search(self, request):
+        """
+        Search medication SKUs, best matches first
+
+        Ranked full-text search on PostgreSQL, see medication_sku.search.
+        The list filters apply to the results.
+        """
+        text = request.query_params.get('q', '').strip()
+        if len(text) < search.SEARCH_MIN_LENGTH:
+            raise ValidationError({
+                'q': [f'Ensure this field has at least '
+                      f'{search.SEARCH_MIN_LENGTH} characters.'],
+            })
+
+        queryset = search.search_medication_skus(self.get_queryset(), text)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, required=True,
+                             description='Start of the medication name, '
+                                         'case insensitive'),
+            OpenApiParameter('limit', OpenApiTypes.INT,
+                             description='Suggestions to return, 10 by '
+                                         'default and at most 50'),
+        ],
+        responses=serializers.MedicationSKUSuggestionSerializer(many=True),
+    )
+    @action(detail=False, methods=['get'], url_path='autocomplete',
+            pagination_class=None)
+    def autocomplete(self, request):
+        """
+        Suggest medication names starting with `q`, ordered by name
+
+        Meant to be called on every keystroke: names are looked up in an
+        in-process index without querying the database once it is built,
+        see medication_sku.autocomplete.
+        """
+        params = serializers.AutocompleteQuerySerializer(
+            data=request.query_params,
+        )
+        params.is_valid(raise_exception=True)
+
+        return Response([
+            {'id': sku_id, 'medication_name': name}
+            for sku_id, name in autocomplete.suggest(
+                params.validated_data['q'], params.validated_data['limit'],
+            )
+        ])
+
+    @extend_schema(
+        request={'application/x-ndjson': OpenApiTypes.BINARY,
+                 'text/csv': OpenApiTypes.BINARY},
+        parameters=[
+            BULK_MODE_PARAMETER,
+            ASYNC_PARAMETER,
+            OpenApiParameter('import_format', OpenApiTypes.STR,
+                             enum=list(importer.PARSERS),
+                             description='ndjson (default) or csv'),
+        ],
+        responses={(201, 'application/json'): OpenApiTypes.OBJECT,
+                   (202, 'application/json'): serializers.BulkJobSerializer,
+                   (207, 'application/json'): OpenApiTypes.OBJECT,
+                   (400, 'application/json'): OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_skus(self, request):
+        """
+        Import medication SKUs from an NDJSON or CSV request body
+
+        The body is read line by line and inserted in chunks, each in its
+        own transaction, so memory use is bounded by the chunk size. The
+        response reports the created/updated/failed counts and per-line
+        errors. With ?async=true the parsed lines are streamed into a
+        background job instead, chunk by chunk, the response is 202 with
+        the job.
+        """
+        upsert = self._get_bulk_mode() == 'upsert'
+        import_format = request.query_params.get('import_format', 'ndjson')
+        if import_format not in importer.PARSERS:
+            raise ValidationError({
+                'import_format': [f'Must be one of: '
+                                  f'{", ".join(importer.PARSERS)}.'],
+            })
+
+        # request.stream is None for an empty body
+        rows = importer.parse(request.stream or [], import_format)
+        if self._get_flag('async', False):
+            try:
+                return self._enqueue(request, rows, upsert)
+            except UnicodeDecodeError:
+                raise ValidationError({
+                    'non_field_errors': ['The file is not valid UTF-8.'],
+                })
+
+        report = importer.ImportReport()
+        try:
+            importer.import_medication_skus(request.user, rows,
+                                            report=report, upsert=upsert)
+        except UnicodeDecodeError:
+            report.add_error(None, {
+                'non_field_errors': ['The file is not valid UTF-8.'],
+            })
+
+        return Response(report.as_dict(), status=_report_status(report))
+
+
+class TagViewSet(ReplicaReadMixin,
+                 ConditionalListMixin,
+                 mixins.DestroyModelMixin,
                  mixins.UpdateModelMixin,
                  mixins.ListModelMixin,
                  viewsets.GenericViewSet):
     """View for manage the tag APIs"""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = TagPagination
 
     def get_queryset(self):
         """Return all tags, ordered by descending name"""
-        return self.queryset.order_by('-name')
+        return self.queryset.order_by('-name', '-id')
+
+
+class BulkJobViewSet(mixins.RetrieveModelMixin,
+                     viewsets.GenericViewSet):
+    """View for the status of the background bulk jobs of the user"""
+    serializer_class = serializers.BulkJobSerializer
+    queryset = BulkJob.objects.all()
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Return the jobs of the user"""
+        return self.queryset.filter(user=self.request.user)
@@ -0,0 +1,178 @@
+"""
+Authentication classes for the APIs
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def _token_data(token):
+    """Return what is cached of a token: its fields and its user's, but
+    never the password hash"""
+    user = token.user
+    return {
+        'key': token.key,
+        'created': token.created,
+        'user': {field.attname: getattr(user, field.attname)
+                 for field in user._meta.concrete_fields
+                 if field.attname != 'password'},
+    }
+
+
+def _token_from_data(data):
+    """Build a token and its user from cached data, every call returns new
+    instances so requests never share them. The password stays deferred,
+    it is loaded from the database if ever read."""
+    user_data = data['user']
+    user = get_user_model().from_db(None, list(user_data),
+                                    list(user_data.values()))
+    token = Token.from_db(None, ['key', 'user_id', 'created'],
+                          [data['key'], user.pk, data['created']])
+    token.user = user
+
+    return token
+
+
+class TokenCache:
+    """
+    Bounded in-process LRU of token key -> Token (with its user loaded)
+
+    When `backend` names a cache from the CACHES setting, shared between
+    the processes, misses of the LRU are looked up there as well and every
+    token has a version in it, changed by delete(). Hits of the LRU are
+    only used while the version they were cached with is current, so an
+    invalidation reaches every process at once, for one cache lookup per
+    request. Without a backend invalidations only reach the process
+    handling the change, entries then live `local_ttl` seconds.
+    """
+
+    def __init__(self, max_size, ttl, backend=None, local_ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self.local_ttl = ttl if backend is not None or local_ttl is None \
+            else min(ttl, local_ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _backend_key(key, kind='auth-token'):
+        """Never store raw tokens as keys of a shared cache"""
+        return f'{kind}:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def version(self, key):
+        """
+        Return the current version of `key`, read it before loading the
+        token that is cached under it
+        """
+        if self.backend is None:
+            return None
+
+        return caches[self.backend].get(
+            self._backend_key(key, 'auth-token-version')
+        )
+
+    def get(self, key):
+        """Return a new instance of the cached token for `key` or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                data, version, expires_at = entry
+                if expires_at <= time.monotonic():
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+
+        if entry is not None:
+            if version == self.version(key):
+                return _token_from_data(data)
+            with self._lock:
+                self._entries.pop(key, None)
+        if self.backend is None:
+            return None
+
+        stored = caches[self.backend].get(self._backend_key(key))
+        if stored is None:
+            return None
+        data, version = stored
+        if version != self.version(key):
+            return None
+
+        self._store(key, data, version)
+        return _token_from_data(data)
+
+    def set(self, key, token, version=None):
+        """Cache `token` under `key`, loaded when `key` had `version`"""
+        data = _token_data(token)
+        self._store(key, data, version)
+        if self.backend is not None:
+            caches[self.backend].set(self._backend_key(key),
+                                     (data, version), self.ttl)
+
+    def _store(self, key, data, version):
+        with self._lock:
+            self._entries[key] = (data, version,
+                                  time.monotonic() + self.local_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Drop the cached resolution of `key` in every process"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.backend is not None:
+            cache = caches[self.backend]
+            cache.delete(self._backend_key(key))
+            # entries older than the TTL are expired anyway
+            cache.set(self._backend_key(key, 'auth-token-version'),
+                      uuid.uuid4().hex, self.ttl)
+
+    def clear(self):
+        """Drop every entry of the in-process LRU"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_AUTH_CACHE['MAX_SIZE'],
+    ttl=settings.TOKEN_AUTH_CACHE['TTL'],
+    backend=settings.TOKEN_AUTH_CACHE['BACKEND'],
+    local_ttl=settings.TOKEN_AUTH_CACHE['LOCAL_TTL'],
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication caching the token -> user resolution
+
+    Drop-in replacement for TokenAuthentication, the Token + User query is
+    only run on cache misses. Entries are invalidated by the signal
+    handlers in `user.signals` when a token is deleted or its user is
+    deactivated or changes password.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is not None:
+            return (token.user, token)
+
+        # an invalidation racing the query below changes the version
+        version = token_cache.version(key)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, token, version)
+
+        return (user, token)
@@ -0,0 +1,43 @@
+"""
+Signal handlers keeping the token authentication cache consistent
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete,
+                                      post_save)
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache
+
+# user fields checked when authenticating a cached token
+AUTH_FIELDS = {'password', 'is_active'}
+
+
+def _invalidate(key):
+    """
+    Forget `key` now and again once committed, a process loading it in
+    between read the version before the change was visible
+    """
+    token_cache.delete(key)
+    transaction.on_commit(partial(token_cache.delete, key))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Forget a token as soon as it is deleted"""
+    _invalidate(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """Forget the tokens of a user whose password or status may change"""
+    if update_fields is not None and not AUTH_FIELDS & set(update_fields):
+        return
+
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    for key in keys:
+        _invalidate(key)
@@ -0,0 +1,203 @@
+"""
+Tests for the cached token authentication
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import (TokenCache,
+                                 token_cache)
+
+ME_URL = reverse('user:me')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(email=email,
+                                                password=password)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token resolutions are cached and invalidated"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_token_resolution_cached(self):
+        """Test the token is only looked up once"""
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        # only the user is reloaded by the view, not the token
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_invalidated(self):
+        """Test a deleted token stops authenticating"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test the tokens of a deactivated user stop authenticating"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        """Test a password change drops the cached resolution"""
+        self.client.get(ME_URL)
+
+        self.user.set_password('newpass123')
+        self.user.save(update_fields=['password'])
+
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_stale_user_not_written_back(self):
+        """Test updates apply to the stored user, not the cached copy"""
+        self.client.get(ME_URL)
+        # changed by another process, the signal doesn't reach this LRU
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False,
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'New name'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.name, '')
+
+    def test_stale_password_not_written_back(self):
+        """Test an update keeps a password changed elsewhere"""
+        self.client.get(ME_URL)
+        self.user.set_password('newpass123')
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=self.user.password,
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'New name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'New name')
+        self.assertTrue(self.user.check_password('newpass123'))
+
+    def test_unrelated_update_keeps_cache(self):
+        """Test saving fields not used to authenticate keeps the entry"""
+        self.client.get(ME_URL)
+
+        self.user.name = 'New name'
+        self.user.save(update_fields=['name'])
+
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+
+class TokenCacheTests(TestCase):
+    """Test the token LRU"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used entry is evicted when full"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', self.token)
+        cache.set('b', self.token)
+        cache.get('a')
+        cache.set('c', self.token)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped after the TTL"""
+        patched_monotonic.return_value = 100
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', self.token)
+
+        patched_monotonic.return_value = 161
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_shared_backend(self):
+        """Test misses of the LRU fall back to the shared cache"""
+        writer = TokenCache(max_size=2, ttl=60, backend='default')
+        reader = TokenCache(max_size=2, ttl=60, backend='default')
+        writer.set('a', self.token)
+
+        token = reader.get('a')
+
+        self.assertEqual(token.user, self.user)
+        writer.delete('a')
+        reader.clear()
+        self.assertIsNone(reader.get('a'))
+
+    def test_shared_invalidation(self):
+        """Test a delete in one process drops the entries of the others"""
+        writer = TokenCache(max_size=2, ttl=60, backend='default')
+        reader = TokenCache(max_size=2, ttl=60, backend='default')
+        reader.set('a', self.token, reader.version('a'))
+        self.assertIsNotNone(reader.get('a'))
+
+        writer.delete('a')
+
+        self.assertIsNone(reader.get('a'))
+
+    def test_password_not_cached(self):
+        """Test the password hash isn't stored, only loaded if read"""
+        cache = TokenCache(max_size=2, ttl=60, backend='default')
+        cache.set('a', self.token)
+
+        data, _ = caches['default'].get(TokenCache._backend_key('a'))
+        self.assertNotIn('password', data['user'])
+        user = cache.get('a').user
+        self.assertEqual(user.email, self.user.email)
+        self.assertTrue(user.check_password('testpass123'))
+
+    @patch('user.authentication.time.monotonic')
+    def test_local_ttl_without_backend(self, patched_monotonic):
+        """Test entries of a process-local cache expire after LOCAL_TTL"""
+        patched_monotonic.return_value = 100
+        cache = TokenCache(max_size=2, ttl=60, local_ttl=5)
+        cache.set('a', self.token)
+
+        patched_monotonic.return_value = 106
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_copies_returned(self):
+        """Test cached users are not shared between callers"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', self.token)
+
+        cache.get('a').user.name = 'Changed'
+
+        self.assertNotEqual(cache.get('a').user.name, 'Changed')
@@ -2,10 +2,14 @@
 Views for the user API
 """
 
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions, generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from user.authentication import CachedTokenAuthentication
 from user.serializers import (UserSerializer,
                               AuthTokenSerializer)
 
@@ -26,9 +30,19 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     Manage the authenticated user
     """
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        """Retrieve and return the authenticated user"""
-        return self.request.user
+        """
+        Retrieve and return the authenticated user, reloaded since the
+        cached authentication may hand out a stale copy that updates would
+        write back
+        """
+        try:
+            return get_user_model().objects.get(pk=self.request.user.pk,
+                                                is_active=True)
+        except get_user_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'),
+            )